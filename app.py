@@ -1,21 +1,30 @@
-import pandas as pd
-import numpy as np
+import os
+import time
 import streamlit as st
-import matplotlib.pyplot as plt
 from datetime import datetime
-from rag.intent import detect_intent
+
+# Heavy dependencies (pandas, matplotlib, OpenAI, torch/faiss) are imported only once
+# the selected mode needs them; see dashboard/import_budget.py for the cold-start check.
 
 st.set_page_config(page_title="Marketplace Performance Dashboard", layout="wide")
 
 # ---- Navigation (Dashboard vs RAG Chatbot) ----
 mode = st.sidebar.radio("Mode", ["Dashboard", "RAG Chatbot"], index=0)
 
+# Warm the RAG model and index in the background (once per process) as soon as the
+# chatbot is opened, or at startup with RAG_PRELOAD=1, so the first question doesn't wait
+if mode == "RAG Chatbot" or os.getenv("RAG_PRELOAD") == "1":
+    from rag.rag_core import preload
+    preload()
+
 if mode == "RAG Chatbot":
     st.title("📊 Marketplace RAG Chatbot")
     st.caption("Ask questions grounded in REPORT.md, tables, and AI recommendation outputs. Answers include sources.")
 
     # Import only when needed (keeps dashboard fast)
-    from rag.rag_core import answer
+    from rag.turn import start_turn
+    from rag import retrieval_client
+    from rag.rag_core import answer_cache_stats, stream_stats, resource_status
     from rag.add_data import add_vendor, add_product
     from rag.db_config import get_last_vendor, get_last_product_raw
     from rag.db_config import get_all_categories, get_subcategories_for_category, vendor_exists, product_exists, category_exists, subcategory_exists
@@ -29,6 +38,47 @@ if mode == "RAG Chatbot":
     if "show_add_product_form" not in st.session_state:
         st.session_state.show_add_product_form = False
 
+    res = resource_status()
+    loaded = {name: r for name, r in res["resources"].items() if r["state"] == "ready"}
+    if retrieval_client.RETRIEVAL_URL:
+        # The model & index live in the retrieval service; nothing is preloaded in this process
+        health = retrieval_client.health()
+        if health is None:
+            st.sidebar.caption(f"Retrieval service {retrieval_client.RETRIEVAL_URL} unreachable · "
+                               "using in-process retrieval")
+        else:
+            st.sidebar.caption(
+                f"Retrieval service {'ready' if health.get('ready') else 'loading…'} · "
+                f"{health.get('queries', 0)} queries in {health.get('batches', 0)} batches "
+                f"(mean {health.get('mean_batch', 0.0):.1f}, {health.get('queued', 0)} queued)"
+            )
+    elif res["ready"]:
+        st.sidebar.caption(
+            "RAG model & index ready · "
+            + ", ".join(f"{name} {r['mb']:.0f} MB" for name, r in loaded.items() if r["mb"] is not None)
+            + (f" · process RSS {res['rss_mb']:.0f} MB" if res["rss_mb"] is not None else "")
+        )
+    else:
+        st.sidebar.caption(
+            "Loading RAG model & index… "
+            + ", ".join(f"{name}: {r['state']}" for name, r in res["resources"].items())
+        )
+
+    cache_stats = answer_cache_stats()
+    if cache_stats is not None:
+        st.sidebar.caption(
+            f"Answer cache: {cache_stats['entries']} answers · hit rate {cache_stats['hit_rate']:.0%} "
+            f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']})"
+        )
+    ttft = stream_stats()
+    if ttft is not None:
+        st.sidebar.caption(
+            f"Time to first token: last {ttft['last_ms']:.0f} ms · p50 {ttft['p50_ms']:.0f} ms · "
+            f"p95 {ttft['p95_ms']:.0f} ms ({ttft['count']} answers)"
+            + (f" · cache hits p50 {ttft['cached']['p50_ms']:.0f} ms ({ttft['cached']['count']})"
+               if ttft["cached"] else "")
+        )
+
     # Show chat history
     for m in st.session_state.rag_messages:
         with st.chat_message(m["role"]):
@@ -71,8 +121,9 @@ if mode == "RAG Chatbot":
                 st.markdown(out)
             st.stop()
 
-        # ✅ Detect intent ONCE
-        intent_out = detect_intent(prompt)
+        # ✅ Detect intent ONCE (retrieval starts alongside it, see rag/turn.py)
+        turn = start_turn(prompt)
+        intent_out = turn.intent()
         intent = intent_out.get("intent", "qa")
 
         with st.chat_message("assistant"):
@@ -87,17 +138,17 @@ if mode == "RAG Chatbot":
             elif intent == "ambiguous":
                 st.markdown("Do you want to add a **vendor** or a **product**?")
             else:
-                # ✅ QA -> run RAG immediately here
-                with st.spinner("Retrieving and answering..."):
-                    out, contexts = answer(prompt)
-                    st.markdown(out)
+                # ✅ QA -> run RAG immediately here; the answer renders as tokens arrive
+                with st.spinner("Retrieving..."):
+                    tokens, contexts = turn.answer_stream()
+                out = st.write_stream(tokens)
 
-                    with st.expander("Sources used"):
-                        for i, c in enumerate(contexts or [], start=1):
-                            st.write(f"[{i}] {c['source']} (score={c['score']:.3f})")
-                            st.code(c["text"][:800] + ("..." if len(c["text"]) > 800 else ""))
+                with st.expander("Sources used"):
+                    for i, c in enumerate(contexts or [], start=1):
+                        st.write(f"[{i}] {c['source']} (score={c['score']:.3f})")
+                        st.code(c["text"][:800] + ("..." if len(c["text"]) > 800 else ""))
 
-                    st.session_state.rag_messages.append({"role": "assistant", "content": out})
+                st.session_state.rag_messages.append({"role": "assistant", "content": out})
 
 
     
@@ -292,10 +343,37 @@ if mode == "RAG Chatbot":
     st.stop()
 
 
+# ---- Dashboard mode: its dependencies are imported only past this point ----
+script_t0 = time.perf_counter()  # for the "script ms" readout next to the fragment timings
+
+import pandas as pd
 
-@st.cache_data
+from dashboard.charts import bar_png, new_chart_cache, scatter_png
+from dashboard.columnar import data_version, load_clean
+from dashboard.fragments import render_timings, timed_fragment
+from dashboard.index import sort_by_date
+from dashboard.result_cache import LRUCache, filter_key
+from dashboard.rollup import build_rollup, compute_view
+
+# "csv" (Parquet cache / CSV + in-memory rollup) or "postgres" (dashboard/db_source.py)
+DATA_SOURCES = ("csv", "postgres")
+DATA_SOURCE = os.getenv("DASHBOARD_DATA_SOURCE", "csv").strip().lower()
+if DATA_SOURCE not in DATA_SOURCES:
+    st.error(f"DASHBOARD_DATA_SOURCE must be one of {', '.join(DATA_SOURCES)}, got {DATA_SOURCE!r}")
+    st.stop()
+
+# cache_resource (not cache_data): the frames are shared read-only, so reruns don't
+# pay for unpickling a fresh copy of the fact table and rollup every time
+@st.cache_resource
 def load_data():
-    clean = pd.read_csv("synthetic_marketplace_daily_clean.csv", parse_dates=["date"])
+    clean = rollup = version = None
+    if DATA_SOURCE != "postgres":
+        # Typed Parquet cache when available, CSV otherwise
+        clean = sort_by_date(load_clean())
+        # Rollup store: every rerun is answered from these pre-aggregated tables
+        rollup = build_rollup(clean)
+        version = data_version()
+
     vendors = pd.read_csv("vendors_master.csv")
 
     # Optional files (if present)
@@ -317,17 +395,46 @@ def load_data():
     except Exception:
         pass
 
-    return clean, vendors, ai_discount, ai_promo, summary_txt
+    return clean, vendors, ai_discount, ai_promo, summary_txt, rollup, version
+
+@st.cache_resource
+def get_result_cache():
+    # One bounded cache per process, shared by all sessions
+    return LRUCache()
+
+@st.cache_resource
+def get_chart_cache():
+    # Rendered PNGs keyed by the content hash of the plotted aggregate
+    return new_chart_cache()
+
+@st.cache_data(ttl=300)
+def load_db_filter_options():
+    from dashboard.db_source import filter_options
+    return filter_options()
 
-clean, vendors, ai_discount, ai_promo, summary_txt = load_data()
+clean, vendors, ai_discount, ai_promo, summary_txt, rollup, version = load_data()
+result_cache = get_result_cache()
+chart_cache = get_chart_cache()
 
 # ---------------------------
 # Sidebar filters
 # ---------------------------
 st.sidebar.title("Filters")
 
-min_date = clean["date"].min().date()
-max_date = clean["date"].max().date()
+if DATA_SOURCE == "postgres":
+    # psycopg2 is only needed (and imported) for this source
+    from dashboard.db_source import compute_view as db_compute_view, data_version as db_data_version
+    options = load_db_filter_options()
+    min_date, max_date = options["min_date"], options["max_date"]
+    category_options, vendor_options = options["categories"], options["vendors"]
+    version = db_data_version()
+else:
+    # clean is sorted by date
+    min_date = clean["date"].iloc[0].date()
+    max_date = clean["date"].iloc[-1].date()
+    category_options = sorted(clean["category"].unique().tolist())
+    vendor_options = sorted(clean["vendor_id"].unique().tolist())
+
 date_range = st.sidebar.date_input("Date range", (min_date, max_date))
 
 if isinstance(date_range, tuple) and len(date_range) == 2:
@@ -335,123 +442,127 @@ if isinstance(date_range, tuple) and len(date_range) == 2:
 else:
     start_date, end_date = min_date, max_date
 
-categories = ["All"] + sorted(clean["category"].unique().tolist())
+categories = ["All"] + category_options
 category = st.sidebar.selectbox("Category", categories)
 
-vendors_list = ["All"] + sorted(clean["vendor_id"].unique().tolist())
+vendors_list = ["All"] + vendor_options
 vendor = st.sidebar.selectbox("Vendor", vendors_list)
 
-df = clean[(clean["date"].dt.date >= start_date) & (clean["date"].dt.date <= end_date)].copy()
-if category != "All":
-    df = df[df["category"] == category]
-if vendor != "All":
-    df = df[df["vendor_id"] == vendor]
+view_key = filter_key(version, start_date, end_date, category, vendor, min_date, max_date)
+if DATA_SOURCE == "postgres":
+    view = result_cache.get_or_compute(
+        view_key, lambda: db_compute_view(start_date, end_date, category, vendor)
+    )
+else:
+    view = result_cache.get_or_compute(
+        view_key, lambda: compute_view(rollup, start_date, end_date, category, vendor)
+    )
+
+stats = result_cache.stats()
+st.sidebar.caption(
+    f"Result cache: {stats['hits']} hits / {stats['misses']} misses "
+    f"({stats['hit_rate']*100:.0f}%) · {stats['entries']} entries · {stats['bytes']/1e6:.1f} MB"
+)
+if DATA_SOURCE == "postgres":
+    from rag.db_pool import pool_stats
+    pool = pool_stats()
+    st.sidebar.caption(
+        f"DB pool: {pool['in_use']}/{pool['size']} in use (max {pool['max']}) · "
+        f"{pool['checkouts']} checkouts · {pool['created']} connects · "
+        f"wait avg {pool['wait_ms_avg']:.1f} ms, max {pool['wait_ms_max']:.0f} ms"
+    )
 
 # ---------------------------
-# KPI header
+# Dashboard sections (fragments)
+#
+# Each section is a fragment that only gets the data it renders, so an interaction
+# inside one section reruns that section alone. Sidebar filter changes still rerun
+# the whole script (every section depends on them).
 # ---------------------------
+@timed_fragment("KPI header")
+def kpi_header(k):
+    c1, c2, c3, c4, c5, c6 = st.columns(6)
+    c1.metric("Views", f"{k['total_views']:,}")
+    c2.metric("Orders", f"{k['total_orders']:,}")
+    c3.metric("Net Revenue", f"${k['net_rev']:,.0f}")
+    c4.metric("Conversion", f"{k['conv']*100:.2f}%")
+    c5.metric("Return Rate", f"{k['ret_rate']*100:.2f}%")
+    c6.metric("Avg Fulfillment (days)", f"{k['avg_fulfill']:.1f}")
+
+@timed_fragment("Top vendors by revenue")
+def top_revenue_panel(data):
+    st.subheader("Top Vendors by Net Revenue")
+    st.image(bar_png(chart_cache, data, "vendor_id", "net_revenue_usd", "Net Revenue (USD)"))
+
+@timed_fragment("Top vendors by conversion")
+def top_conversion_panel(data):
+    st.subheader("Top Vendors by Conversion Rate (min views)")
+    st.image(bar_png(chart_cache, data, "vendor_id", "conversion_rate", "Conversion Rate"))
+
+@timed_fragment("Revenue by category")
+def category_panel(data):
+    st.subheader("Net Revenue by Category")
+    st.image(bar_png(chart_cache, data, "category", "net_revenue_usd", "Net Revenue (USD)", rotation=35))
+
+@timed_fragment("Products views vs conversion")
+def products_panel(data):
+    st.subheader("Products: Views vs Conversion (sample)")
+    st.image(scatter_png(chart_cache, data, "views", "conversion_rate", "Total Views", "Conversion Rate"))
+
+@timed_fragment("AI recommendations")
+def recommendations_panel(ai_discount, ai_promo):
+    st.subheader("AI Recommendations")
+
+    tab1, tab2 = st.tabs(["Products to discount", "Vendors to promote"])
+
+    with tab1:
+        if ai_discount is None:
+            st.warning("ai_discount_recommendations.csv not found. Run your recommendation script to generate it.")
+        else:
+            st.dataframe(ai_discount, use_container_width=True)
+
+    with tab2:
+        if ai_promo is None:
+            st.warning("ai_vendor_promotion_recommendations.csv not found. Run your recommendation script to generate it.")
+        else:
+            st.dataframe(ai_promo, use_container_width=True)
+
+@timed_fragment("Management summary")
+def management_summary_panel(summary_txt):
+    st.subheader("Management Summary")
+    if summary_txt:
+        st.text_area("AI-generated summary", summary_txt, height=250)
+    else:
+        st.info("AI_management_summary.txt not found (optional). Add it to show a narrative summary.")
+
+
+# Filled in after the last fragment has run, so it shows this run's timings
+timings_slot = st.sidebar.empty()
+
 st.title("Marketplace Vendor & Product Performance Dashboard")
 
-total_views = int(df["views"].sum())
-total_orders = int(df["orders"].sum())
-net_rev = float(df["net_revenue_usd"].sum())
-conv = (total_orders / total_views) if total_views else 0.0
-returns = int(df["returns"].sum())
-ret_rate = (returns / total_orders) if total_orders else 0.0
-avg_fulfill = float(df["avg_fulfillment_days"].mean())
-
-c1, c2, c3, c4, c5, c6 = st.columns(6)
-c1.metric("Views", f"{total_views:,}")
-c2.metric("Orders", f"{total_orders:,}")
-c3.metric("Net Revenue", f"${net_rev:,.0f}")
-c4.metric("Conversion", f"{conv*100:.2f}%")
-c5.metric("Return Rate", f"{ret_rate*100:.2f}%")
-c6.metric("Avg Fulfillment (days)", f"{avg_fulfill:.1f}")
+kpi_header(view["kpis"])
 
 st.divider()
 
-# ---------------------------
-# Charts: Top vendors & categories
-# ---------------------------
 left, right = st.columns(2)
-
 with left:
-    st.subheader("Top Vendors by Net Revenue")
-    vend = df.groupby("vendor_id", as_index=False)["net_revenue_usd"].sum().sort_values("net_revenue_usd", ascending=False).head(10)
-    fig = plt.figure(figsize=(7,4))
-    plt.bar(vend["vendor_id"], vend["net_revenue_usd"])
-    plt.xticks(rotation=45, ha="right")
-    plt.ylabel("Net Revenue (USD)")
-    plt.tight_layout()
-    st.pyplot(fig)
-
+    top_revenue_panel(view["top_revenue"])
 with right:
-    st.subheader("Top Vendors by Conversion Rate (min views)")
-    vend2 = df.groupby("vendor_id", as_index=False).agg(views=("views","sum"), orders=("orders","sum"))
-    vend2 = vend2[vend2["views"] > 2000].copy()
-    vend2["conversion_rate"] = vend2["orders"] / vend2["views"]
-    vend2 = vend2.sort_values("conversion_rate", ascending=False).head(10)
-
-    fig = plt.figure(figsize=(7,4))
-    plt.bar(vend2["vendor_id"], vend2["conversion_rate"])
-    plt.xticks(rotation=45, ha="right")
-    plt.ylabel("Conversion Rate")
-    plt.tight_layout()
-    st.pyplot(fig)
+    top_conversion_panel(view["top_conversion"])
 
 left2, right2 = st.columns(2)
-
 with left2:
-    st.subheader("Net Revenue by Category")
-    cat = df.groupby("category", as_index=False)["net_revenue_usd"].sum().sort_values("net_revenue_usd", ascending=False)
-    fig = plt.figure(figsize=(7,4))
-    plt.bar(cat["category"], cat["net_revenue_usd"])
-    plt.xticks(rotation=35, ha="right")
-    plt.ylabel("Net Revenue (USD)")
-    plt.tight_layout()
-    st.pyplot(fig)
-
+    category_panel(view["category_revenue"])
 with right2:
-    st.subheader("Products: Views vs Conversion (sample)")
-    prod = df.groupby(["product_id","category"], as_index=False).agg(views=("views","sum"), orders=("orders","sum"))
-    prod["conversion_rate"] = prod["orders"] / prod["views"].replace(0, np.nan)
-    sample = prod.sample(min(len(prod), 1200), random_state=42) if len(prod) else prod
-
-    fig = plt.figure(figsize=(7,4))
-    plt.scatter(sample["views"], sample["conversion_rate"].fillna(0), s=10, alpha=0.6)
-    plt.xlabel("Total Views")
-    plt.ylabel("Conversion Rate")
-    plt.tight_layout()
-    st.pyplot(fig)
+    products_panel(view["products"])
 
 st.divider()
 
-# ---------------------------
-# Tables: AI recommendations
-# ---------------------------
-st.subheader("AI Recommendations")
-
-tab1, tab2 = st.tabs(["Products to discount", "Vendors to promote"])
-
-with tab1:
-    if ai_discount is None:
-        st.warning("ai_discount_recommendations.csv not found. Run your recommendation script to generate it.")
-    else:
-        st.dataframe(ai_discount, use_container_width=True)
-
-with tab2:
-    if ai_promo is None:
-        st.warning("ai_vendor_promotion_recommendations.csv not found. Run your recommendation script to generate it.")
-    else:
-        st.dataframe(ai_promo, use_container_width=True)
+recommendations_panel(ai_discount, ai_promo)
 
 st.divider()
 
-# ---------------------------
-# Management Summary panel
-# ---------------------------
-st.subheader("Management Summary")
-if summary_txt:
-    st.text_area("AI-generated summary", summary_txt, height=250)
-else:
-    st.info("AI_management_summary.txt not found (optional). Add it to show a narrative summary.")
+management_summary_panel(summary_txt)
+
+render_timings(timings_slot.container(), script_ms=(time.perf_counter() - script_t0) * 1000)
@@ -7,4 +7,9 @@ rm -rf ~/.streamlit/cache/
 echo "📦 Installing dependencies..."
 pip install -q -r requirements.txt
 
+echo "🗂️  Building Parquet cache for the clean data..."
+if [ -f synthetic_marketplace_daily_clean.csv ]; then
+    python -m dashboard.columnar
+fi
+
 echo "✅ Build complete!"
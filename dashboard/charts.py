@@ -0,0 +1,79 @@
+"""
+Chart rendering for the dashboard.
+
+Charts are rasterized to PNG bytes and cached by the content hash of the aggregate
+that feeds them, so an unchanged chart is never drawn twice. Figures are created with
+matplotlib's object API (not registered with pyplot) and cleared right after saving,
+so long-lived workers don't accumulate open figures. matplotlib itself is only
+imported on the first cache miss.
+"""
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+from dashboard.result_cache import LRUCache
+
+FIGSIZE = (7, 4)
+DPI = 100
+DEFAULT_MAX_BYTES = int(float(os.getenv("DASHBOARD_CHART_CACHE_MB", "32")) * 1024 * 1024)
+
+
+def new_chart_cache() -> LRUCache:
+    return LRUCache(max_entries=256, max_bytes=DEFAULT_MAX_BYTES)
+
+
+def content_key(kind: str, data: pd.DataFrame, columns: list, **spec) -> str:
+    """Hash of the plotted columns plus the chart spec."""
+    h = hashlib.sha1(kind.encode())
+    h.update(pd.util.hash_pandas_object(data[columns], index=False).to_numpy().tobytes())
+    h.update(repr(sorted(spec.items())).encode())
+    return h.hexdigest()
+
+
+def _new_figure():
+    from matplotlib.figure import Figure
+    return Figure(figsize=FIGSIZE)
+
+
+def _to_png(fig) -> bytes:
+    buf = io.BytesIO()
+    try:
+        # bbox_inches="tight" replaces fig.tight_layout() and is only paid on a cache miss
+        fig.savefig(buf, format="png", dpi=DPI, bbox_inches="tight")
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+def bar_png(cache: LRUCache, data: pd.DataFrame, x: str, y: str, ylabel: str, rotation: int = 45) -> bytes:
+    """Bar chart of data[y] by data[x] as PNG bytes."""
+    key = content_key("bar", data, [x, y], ylabel=ylabel, rotation=rotation)
+
+    def draw():
+        fig = _new_figure()
+        ax = fig.add_subplot()
+        ax.bar(data[x].astype(str), data[y])
+        ax.tick_params(axis="x", labelrotation=rotation)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment("right")
+        ax.set_ylabel(ylabel)
+        return _to_png(fig)
+
+    return cache.get_or_compute(key, draw)
+
+
+def scatter_png(cache: LRUCache, data: pd.DataFrame, x: str, y: str, xlabel: str, ylabel: str) -> bytes:
+    """Scatter of data[y] against data[x] (missing y plotted as 0) as PNG bytes."""
+    key = content_key("scatter", data, [x, y], xlabel=xlabel, ylabel=ylabel)
+
+    def draw():
+        fig = _new_figure()
+        ax = fig.add_subplot()
+        ax.scatter(data[x], data[y].fillna(0), s=10, alpha=0.6)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        return _to_png(fig)
+
+    return cache.get_or_compute(key, draw)
@@ -0,0 +1,131 @@
+"""
+Column-typed Parquet cache for synthetic_marketplace_daily_clean.csv
+
+The CSV is converted once into a Parquet file with dictionary-encoded id/category
+columns, downcast integers and float32 measures. The cache is tied to the CSV's
+mtime and size, so editing or replacing the CSV invalidates it automatically.
+
+Usage:
+    python -m dashboard.columnar          # (re)build the cache if stale
+    python -m dashboard.columnar --force  # always rebuild
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+CLEAN_CSV = ROOT / "synthetic_marketplace_daily_clean.csv"
+CLEAN_PARQUET = ROOT / "synthetic_marketplace_daily_clean.parquet"
+CLEAN_META = ROOT / "synthetic_marketplace_daily_clean.parquet.json"
+
+CATEGORICAL_COLUMNS = ["vendor_id", "product_id", "category", "sub_category"]
+INT_COLUMNS = ["views", "orders", "returns", "rating_count", "stock_units"]
+FLOAT_COLUMNS = [
+    "price_usd", "discount_rate", "ad_spend_usd", "gross_revenue_usd", "rating",
+    "avg_fulfillment_days", "conversion_rate", "return_rate", "net_revenue_usd",
+]
+
+
+def source_stamp(csv_path: Path = CLEAN_CSV) -> dict:
+    """Identity of the CSV the cache was built from (mtime + size)."""
+    st = os.stat(csv_path)
+    return {"source": csv_path.name, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def data_version(csv_path: Path = CLEAN_CSV, meta_path: Path = CLEAN_META) -> str:
+    """Short stamp identifying the current clean data (changes whenever the CSV does)."""
+    if csv_path.exists():
+        stamp = source_stamp(csv_path)
+    elif meta_path.exists():
+        stamp = json.loads(meta_path.read_text(encoding="utf-8"))
+    else:
+        return "unknown"
+    return f"{stamp['mtime_ns']}-{stamp['size']}"
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Dictionary-encode ids/categories, downcast ints and store measures as float32."""
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in INT_COLUMNS:
+        if col in df.columns and df[col].notna().all():
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("float32")
+    return df
+
+
+def is_fresh(csv_path: Path = CLEAN_CSV, parquet_path: Path = CLEAN_PARQUET, meta_path: Path = CLEAN_META) -> bool:
+    """True when the Parquet cache exists and was built from the current CSV."""
+    if not parquet_path.exists() or not meta_path.exists():
+        return False
+    if not csv_path.exists():
+        # No CSV to compare against (e.g. only the Parquet file was deployed)
+        return True
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except Exception:
+        return False
+    return meta == source_stamp(csv_path)
+
+
+def _write_cache(df: pd.DataFrame, stamp: dict, parquet_path: Path, meta_path: Path):
+    # Write to temp files first so readers never see a half-written cache
+    tmp_parquet = parquet_path.with_suffix(parquet_path.suffix + ".tmp")
+    df.to_parquet(tmp_parquet, engine="pyarrow", index=False)
+    os.replace(tmp_parquet, parquet_path)
+
+    tmp_meta = meta_path.with_suffix(meta_path.suffix + ".tmp")
+    tmp_meta.write_text(json.dumps(stamp), encoding="utf-8")
+    os.replace(tmp_meta, meta_path)
+
+
+def convert(csv_path: Path = CLEAN_CSV, parquet_path: Path = CLEAN_PARQUET, meta_path: Path = CLEAN_META) -> Path:
+    """Convert the clean CSV into the typed Parquet cache."""
+    stamp = source_stamp(csv_path)
+    df = optimize_dtypes(pd.read_csv(csv_path, parse_dates=["date"]))
+    df = df.sort_values("date", kind="stable", ignore_index=True)
+    _write_cache(df, stamp, parquet_path, meta_path)
+    return parquet_path
+
+
+def load_clean(csv_path: Path = CLEAN_CSV, parquet_path: Path = CLEAN_PARQUET, meta_path: Path = CLEAN_META) -> pd.DataFrame:
+    """
+    Load the clean fact table, preferring the Parquet cache (stored sorted by date).
+
+    Falls back to the CSV when the cache is missing/stale or pyarrow is not installed,
+    and tries to (re)write the cache so the next cold start can skip the CSV.
+    """
+    if is_fresh(csv_path, parquet_path, meta_path):
+        try:
+            return pd.read_parquet(parquet_path, engine="pyarrow")
+        except Exception as e:
+            print(f"[WARN] Could not read {parquet_path.name}, falling back to CSV: {e}")
+
+    stamp = source_stamp(csv_path)
+    df = optimize_dtypes(pd.read_csv(csv_path, parse_dates=["date"]))
+    df = df.sort_values("date", kind="stable", ignore_index=True)
+    try:
+        _write_cache(df, stamp, parquet_path, meta_path)
+    except Exception as e:
+        print(f"[WARN] Parquet cache not written: {e}")
+    return df
+
+
+if __name__ == "__main__":
+    force = "--force" in sys.argv[1:]
+    if not CLEAN_CSV.exists():
+        print(f"❌ Clean CSV not found: {CLEAN_CSV}")
+        sys.exit(1)
+    if not force and is_fresh():
+        print(f"✅ {CLEAN_PARQUET.name} is up to date")
+    else:
+        print(f"🔄 Converting {CLEAN_CSV.name} -> {CLEAN_PARQUET.name}...")
+        convert()
+        print(f"✅ Saved {CLEAN_PARQUET.name}")
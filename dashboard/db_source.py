@@ -0,0 +1,171 @@
+"""
+Postgres-backed data source for the dashboard.
+
+Instead of loading the fact table, every KPI and chart is a parameterized GROUP BY on
+marketplace_daily_clean, so only the aggregated rows cross the wire. The composite
+(date, vendor_id) / (date, category) covering indexes created in init_database() let
+Postgres answer these with index-only scans (after VACUUM has set the visibility map).
+When the filters allow it, the KPI header and vendor/category charts read the trigger-
+maintained vendor_daily_summary / category_daily_summary tables instead, so they scan
+days x entities rather than daily product rows.
+
+Enable with DASHBOARD_DATA_SOURCE=postgres (DATABASE_URL as for the rest of the app).
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from dashboard.rollup import MIN_VIEWS_FOR_CONVERSION, PRODUCT_SAMPLE_SIZE
+from rag.db_pool import pooled_connection
+
+TABLE = "marketplace_daily_clean"
+VENDOR_SUMMARY = "vendor_daily_summary"      # grain: date x vendor_id
+CATEGORY_SUMMARY = "category_daily_summary"  # grain: date x category
+
+# Average fulfillment per source: summaries keep it as sum + non-null count
+_FULFILL_AVG = {
+    TABLE: "AVG(avg_fulfillment_days)",
+    VENDOR_SUMMARY: "SUM(fulfill_sum) / NULLIF(SUM(fulfill_n), 0)",
+    CATEGORY_SUMMARY: "SUM(fulfill_sum) / NULLIF(SUM(fulfill_n), 0)",
+}
+
+# NULL categories are reported as 'Unknown', as the summary tables store them (rag/db_config.py)
+UNKNOWN_CATEGORY = "Unknown"
+_CATEGORY = f"COALESCE(category, '{UNKNOWN_CATEGORY}')"
+
+# Aggregates are re-read from the database at most once per TTL window
+DB_TTL_SECONDS = int(os.getenv("DASHBOARD_DB_TTL", "300"))
+
+
+def data_version() -> str:
+    """Version stamp for the result cache: changes every DB_TTL_SECONDS."""
+    return f"db-{int(time.time() // DB_TTL_SECONDS)}"
+
+
+def _where(start_date, end_date, category: str, vendor: str) -> tuple:
+    clauses = ["date BETWEEN %s AND %s"]
+    params = [start_date, end_date]
+    if category == UNKNOWN_CATEGORY:
+        # Matches the raw table's NULLs too, without hiding category from its index
+        clauses.append("(category = %s OR category IS NULL)")
+        params.append(category)
+    elif category != "All":
+        clauses.append("category = %s")
+        params.append(category)
+    if vendor != "All":
+        clauses.append("vendor_id = %s")
+        params.append(vendor)
+    return " AND ".join(clauses), params
+
+
+def _sources(category: str, vendor: str) -> tuple:
+    """Smallest table that can answer (KPIs, vendor charts, category chart) for these filters."""
+    vendor_src = VENDOR_SUMMARY if category == "All" else TABLE
+    category_src = CATEGORY_SUMMARY if vendor == "All" else TABLE
+    if category == "All":
+        kpi_src = VENDOR_SUMMARY
+    elif vendor == "All":
+        kpi_src = CATEGORY_SUMMARY
+    else:
+        kpi_src = TABLE
+    return kpi_src, vendor_src, category_src
+
+
+def _frame(cur, sql: str, params: list, columns: list) -> pd.DataFrame:
+    cur.execute(sql, params)
+    return pd.DataFrame(cur.fetchall(), columns=columns)
+
+
+def filter_options() -> dict:
+    """Date range, categories and vendors for the sidebar."""
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT MIN(date), MAX(date) FROM {TABLE}")
+            min_date, max_date = cur.fetchone()
+            cur.execute(f"SELECT DISTINCT {_CATEGORY} FROM {TABLE} ORDER BY 1")
+            categories = [r[0] for r in cur.fetchall()]
+            cur.execute(f"SELECT DISTINCT vendor_id FROM {TABLE} ORDER BY vendor_id")
+            vendors = [r[0] for r in cur.fetchall()]
+            return {"min_date": min_date, "max_date": max_date, "categories": categories, "vendors": vendors}
+        finally:
+            cur.close()
+
+
+def compute_view(start_date, end_date, category: str = "All", vendor: str = "All") -> dict:
+    """Same result shape as dashboard.rollup.compute_view(), computed in Postgres."""
+    where, params = _where(start_date, end_date, category, vendor)
+    kpi_src, vendor_src, category_src = _sources(category, vendor)
+
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"""
+                SELECT COALESCE(SUM(views), 0)::bigint, COALESCE(SUM(orders), 0)::bigint,
+                       COALESCE(SUM(net_revenue_usd), 0), COALESCE(SUM(returns), 0)::bigint,
+                       {_FULFILL_AVG[kpi_src]}
+                FROM {kpi_src}
+                WHERE {where}
+            """, params)
+            total_views, total_orders, net_rev, returns, avg_fulfill = cur.fetchone()
+            total_views, total_orders, returns = int(total_views), int(total_orders), int(returns)
+
+            top_revenue = _frame(cur, f"""
+                SELECT vendor_id, SUM(net_revenue_usd) AS net_revenue_usd
+                FROM {vendor_src}
+                WHERE {where}
+                GROUP BY vendor_id
+                ORDER BY net_revenue_usd DESC
+                LIMIT 10
+            """, params, ["vendor_id", "net_revenue_usd"])
+
+            top_conversion = _frame(cur, f"""
+                SELECT vendor_id, SUM(views)::bigint AS views, SUM(orders)::bigint AS orders,
+                       SUM(orders)::float / SUM(views) AS conversion_rate
+                FROM {vendor_src}
+                WHERE {where}
+                GROUP BY vendor_id
+                HAVING SUM(views) > %s
+                ORDER BY conversion_rate DESC
+                LIMIT 10
+            """, params + [MIN_VIEWS_FOR_CONVERSION], ["vendor_id", "views", "orders", "conversion_rate"])
+
+            category_revenue = _frame(cur, f"""
+                SELECT {_CATEGORY} AS category, SUM(net_revenue_usd) AS net_revenue_usd
+                FROM {category_src}
+                WHERE {where}
+                GROUP BY 1
+                ORDER BY net_revenue_usd DESC
+            """, params, ["category", "net_revenue_usd"])
+
+            # Deterministic sample: ordering by a hash of the id instead of random()
+            products = _frame(cur, f"""
+                SELECT product_id, {_CATEGORY} AS category, SUM(views) AS views, SUM(orders) AS orders
+                FROM {TABLE}
+                WHERE {where}
+                GROUP BY product_id, 2
+                ORDER BY md5(product_id)
+                LIMIT %s
+            """, params + [PRODUCT_SAMPLE_SIZE], ["product_id", "category", "views", "orders"])
+        finally:
+            cur.close()
+
+    products["conversion_rate"] = products["orders"] / products["views"].replace(0, np.nan)
+
+    return {
+        "kpis": {
+            "total_views": total_views,
+            "total_orders": total_orders,
+            "net_rev": float(net_rev),
+            "conv": (total_orders / total_views) if total_views else 0.0,
+            "returns": returns,
+            "ret_rate": (returns / total_orders) if total_orders else 0.0,
+            "avg_fulfill": float(avg_fulfill) if avg_fulfill is not None else float("nan"),
+        },
+        "top_revenue": top_revenue,
+        "top_conversion": top_conversion,
+        "category_revenue": category_revenue,
+        "products": products,
+    }
@@ -0,0 +1,44 @@
+"""
+Helpers for splitting the dashboard into independently re-executing Streamlit fragments.
+
+A fragment only receives the data it renders (passed as arguments), so when one of its
+own widgets changes Streamlit reruns just that function with the same arguments instead
+of the whole script. Each fragment also records how long its last run took.
+"""
+import functools
+import time
+
+import streamlit as st
+
+TIMINGS_KEY = "fragment_timings"
+
+
+def timed_fragment(name: str):
+    """Decorator: st.fragment + a per-fragment "last run" timing caption."""
+    def decorator(fn):
+        @st.fragment
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            result = fn(*args, **kwargs)
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+
+            timings = st.session_state.setdefault(TIMINGS_KEY, {})
+            runs = timings.get(name, {}).get("runs", 0) + 1
+            timings[name] = {"last_ms": elapsed_ms, "runs": runs}
+            st.caption(f"⏱ {name}: {elapsed_ms:.1f} ms (run #{runs})")
+            return result
+        return wrapper
+    return decorator
+
+
+def render_timings(container, script_ms: float = None):
+    """Show the latest timing of every fragment (plus the full-script time) in a container."""
+    timings = st.session_state.get(TIMINGS_KEY, {})
+    with container.expander("Rerun timings", expanded=False):
+        if script_ms is not None:
+            st.write(f"Full rerun (data, filters and every fragment): {script_ms:.1f} ms")
+        if not timings:
+            st.write("No fragment has run yet.")
+        for name, t in timings.items():
+            st.write(f"{name}: {t['last_ms']:.1f} ms · {t['runs']} runs")
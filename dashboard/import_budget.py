@@ -0,0 +1,211 @@
+"""
+Cold-start import budget check.
+
+Imports what each app.py mode needs in a fresh interpreter under `python -X importtime`,
+prints the slowest imports, and fails (exit code 1) when the import time or peak RSS
+goes over budget, or when a heavy dependency leaks into a mode that shouldn't load it.
+
+Because deferred imports are easy to lose, it also checks app.py itself:
+- statically, for names that are used but never imported or assigned;
+- by running each mode once with streamlit's AppTest in a fresh interpreter, failing
+  on any exception the page raises.
+The dashboard run needs the marketplace data files. Skip the runs with --no-run.
+
+Usage:
+    python -m dashboard.import_budget                 # check all modes
+    python -m dashboard.import_budget dashboard --top 30
+    python -m dashboard.import_budget --report-only   # never fail, just print
+
+Budgets can be overridden with IMPORT_BUDGET_<MODE>_MS / IMPORT_BUDGET_<MODE>_RSS_MB.
+"""
+import argparse
+import ast
+import builtins
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP = ROOT / "app.py"
+APP_TIMEOUT_S = 120
+
+# What each mode imports before it can render its first frame
+MODES = {
+    "dashboard": {
+        "radio": "Dashboard",
+        "imports": [
+            "streamlit",
+            "pandas",
+            "dashboard.columnar",
+            "dashboard.index",
+            "dashboard.rollup",
+            "dashboard.result_cache",
+            "dashboard.charts",
+        ],
+        "forbidden": ["torch", "sentence_transformers", "onnxruntime", "faiss", "openai", "matplotlib.pyplot"],
+        "budget_ms": 2500,
+        "budget_rss_mb": 250,
+    },
+    # RAG Chatbot mode up to the point where the page and forms render;
+    # the model/index are loaded on the first question
+    "chat": {
+        "radio": "RAG Chatbot",
+        "imports": ["streamlit", "rag.turn", "rag.intent", "rag.rag_core", "rag.add_data", "rag.db_config"],
+        "forbidden": ["torch", "sentence_transformers", "onnxruntime", "faiss", "matplotlib"],
+        "budget_ms": 2000,
+        "budget_rss_mb": 200,
+    },
+}
+
+_PROBE = """
+import importlib, json, resource, sys
+for name in {imports!r}:
+    importlib.import_module(name)
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"rss_mb": rss_kb / 1024, "modules": sorted(sys.modules)}}))
+"""
+
+
+# Runs one app.py mode the way `streamlit run` would and reports what it raised
+_APP_PROBE = """
+import json
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout={timeout})
+at.run()
+if {radio!r} != at.sidebar.radio[0].value:
+    at.sidebar.radio[0].set_value({radio!r}).run()
+print(json.dumps([e.message for e in at.exception]))
+"""
+
+
+def unbound_names(source: str) -> list:
+    """Names read somewhere in the module but never imported, assigned or defined."""
+    tree = ast.parse(source)
+    bound = set(dir(builtins))
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            bound.update((a.asname or a.name).split(".")[0] for a in node.names)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+    used = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+    return sorted(used - bound)
+
+
+def check_app(modes: list, run: bool = True) -> list:
+    """Problems found in app.py: unbound names, and exceptions when running each mode."""
+    problems = [f"app.py: name used but never defined: {name}" for name in unbound_names(APP.read_text())]
+    if not run:
+        return problems
+    for mode in modes:
+        code = _APP_PROBE.format(app=str(APP), timeout=APP_TIMEOUT_S, radio=MODES[mode]["radio"])
+        try:
+            proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                                  timeout=APP_TIMEOUT_S + 30)
+        except subprocess.TimeoutExpired:
+            problems.append(f"{mode}: app.py did not finish within {APP_TIMEOUT_S}s")
+            continue
+        if proc.returncode != 0:
+            problems.append(f"{mode}: could not run app.py\n{proc.stderr[-2000:]}")
+            continue
+        for message in json.loads(proc.stdout.strip().splitlines()[-1]):
+            problems.append(f"{mode}: app.py raised: {message}")
+    return problems
+
+
+def parse_importtime(stderr: str) -> list:
+    """Rows of (self_us, cumulative_us, module) from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((int(self_us), int(cum_us), name.rstrip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def measure(mode: str) -> dict:
+    """Import one mode's modules in a fresh interpreter and collect timings / RSS."""
+    spec = MODES[mode]
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(imports=spec["imports"])],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode}: import failed\n{proc.stderr[-2000:]}")
+
+    rows = parse_importtime(proc.stderr)
+    probe = json.loads(proc.stdout.strip().splitlines()[-1])
+    # Top-level imports (no leading indentation) add up to the total import time
+    total_us = sum(cum for _, cum, name in rows if not name.startswith("  "))
+    loaded = set(probe["modules"])
+    return {
+        "mode": mode,
+        "total_ms": total_us / 1000,
+        "rss_mb": probe["rss_mb"],
+        "rows": rows,
+        "leaked": [m for m in spec["forbidden"] if m in loaded],
+    }
+
+
+def budget(mode: str, key: str) -> float:
+    env = f"IMPORT_BUDGET_{mode.upper()}_{'MS' if key == 'budget_ms' else 'RSS_MB'}"
+    return float(os.getenv(env, MODES[mode][key]))
+
+
+def report(result: dict, top: int = 20) -> list:
+    """Print the report for one mode and return the list of budget violations."""
+    mode = result["mode"]
+    max_ms, max_rss = budget(mode, "budget_ms"), budget(mode, "budget_rss_mb")
+
+    print(f"\n=== {mode} ===")
+    print(f"Import time: {result['total_ms']:.0f} ms (budget {max_ms:.0f} ms)")
+    print(f"Peak RSS:    {result['rss_mb']:.0f} MB (budget {max_rss:.0f} MB)")
+    print("Slowest imports (cumulative):")
+    for self_us, cum_us, name in sorted(result["rows"], key=lambda r: r[1], reverse=True)[:top]:
+        print(f"  {cum_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {name.strip()}")
+
+    problems = []
+    if result["total_ms"] > max_ms:
+        problems.append(f"{mode}: import time {result['total_ms']:.0f} ms > {max_ms:.0f} ms")
+    if result["rss_mb"] > max_rss:
+        problems.append(f"{mode}: peak RSS {result['rss_mb']:.0f} MB > {max_rss:.0f} MB")
+    for name in result["leaked"]:
+        problems.append(f"{mode}: heavy dependency imported at startup: {name}")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modes", nargs="*", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--top", type=int, default=20, help="number of slowest imports to list")
+    parser.add_argument("--report-only", action="store_true", help="print the report but never fail")
+    parser.add_argument("--no-run", action="store_true", help="only name-check app.py, don't run its modes")
+    args = parser.parse_args(argv)
+
+    problems = []
+    for mode in args.modes:
+        problems += report(measure(mode), top=args.top)
+    problems += check_app(args.modes, run=not args.no_run)
+
+    print()
+    if not problems:
+        print("✅ Import budgets met and app.py checks passed")
+        return 0
+    for p in problems:
+        print(f"❌ {p}")
+    return 0 if args.report_only else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Row indexes for date-sorted frames.
+
+A frame sorted by date gets a day -> row-offset table, so a date range becomes two
+binary searches and a positional slice. Category / vendor filters use precomputed
+per-value row-id lists (sorted), which are clipped to the date range and intersected
+instead of building boolean masks over every row.
+"""
+import numpy as np
+import pandas as pd
+
+
+def sort_by_date(frame: pd.DataFrame) -> pd.DataFrame:
+    """Return the frame sorted by date (no-op when it already is)."""
+    if frame["date"].is_monotonic_increasing:
+        return frame
+    return frame.sort_values("date", kind="stable", ignore_index=True)
+
+
+def build_index(frame: pd.DataFrame, dims=("category", "vendor_id")) -> dict:
+    """
+    Build the row index for a date-sorted frame.
+
+    Returns:
+        dict with
+          - "days":     sorted unique days (datetime64[D])
+          - "offsets":  first row of each day, plus len(frame) as the final sentinel
+          - "postings": {dim: {value: sorted row positions}}
+    """
+    days = frame["date"].to_numpy().astype("datetime64[D]")
+    if len(days) and (np.diff(days.view("int64")) < 0).any():
+        raise ValueError("build_index() needs a frame sorted by date")
+
+    unique_days, starts = np.unique(days, return_index=True)
+    offsets = np.append(starts, len(frame)).astype("int64")
+
+    postings = {}
+    for dim in dims:
+        groups = frame.groupby(dim, observed=True, sort=False).indices
+        postings[dim] = {key: np.asarray(rows, dtype="int64") for key, rows in groups.items()}
+
+    return {"days": unique_days, "offsets": offsets, "postings": postings}
+
+
+def row_range(index: dict, start_date, end_date) -> tuple:
+    """[lo, hi) row positions covering start_date..end_date (inclusive), O(log days)."""
+    days = index["days"]
+    lo = np.searchsorted(days, np.datetime64(start_date, "D"), side="left")
+    hi = np.searchsorted(days, np.datetime64(end_date, "D"), side="right")
+    offsets = index["offsets"]
+    return int(offsets[lo]), int(offsets[max(lo, hi)])
+
+
+def select(frame: pd.DataFrame, index: dict, start_date, end_date, filters: dict = None) -> pd.DataFrame:
+    """
+    Rows of `frame` in the date range that match every {dim: value} filter ("All" = no filter).
+
+    Without dimension filters this is a positional slice of the frame (no boolean mask, no copy).
+    """
+    lo, hi = row_range(index, start_date, end_date)
+
+    rows = None
+    for dim, value in (filters or {}).items():
+        if value == "All":
+            continue
+        posting = index["postings"][dim].get(value)
+        if posting is None:
+            return frame.iloc[0:0]
+        a, b = np.searchsorted(posting, [lo, hi])
+        posting = posting[a:b]
+        rows = posting if rows is None else np.intersect1d(rows, posting, assume_unique=True)
+
+    if rows is None:
+        return frame.iloc[lo:hi]
+    return frame.iloc[rows]
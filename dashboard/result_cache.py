@@ -0,0 +1,119 @@
+"""
+Bounded LRU cache for computed dashboard results.
+
+Entries are keyed by the normalized filter state plus a data-version stamp, and the
+cache is bounded both by entry count and by (estimated) bytes. One instance is shared
+by all Streamlit sessions of the process, so it is guarded by a lock.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_ENTRIES", "64"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("DASHBOARD_CACHE_MB", "64")) * 1024 * 1024)
+
+_MISSING = object()
+
+
+def estimate_bytes(obj) -> int:
+    """Rough in-memory size of a cached value (DataFrames, bytes, dict/list/tuple of those)."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_bytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an entry and a byte budget."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (value, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, nbytes: int = None):
+        if nbytes is None:
+            nbytes = estimate_bytes(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            if nbytes > self.max_bytes:
+                # Larger than the whole budget: don't cache it, but don't evict everything either
+                return
+            self._data[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, freed) = self._data.popitem(last=False)
+                self._bytes -= freed
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing (and caching) it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry and start the hit / miss / eviction counts over."""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+def filter_key(data_version: str, start_date, end_date, category: str, vendor: str, min_date=None, max_date=None) -> tuple:
+    """
+    Normalized cache key for a sidebar filter state.
+
+    Dates are clamped to the data range so e.g. "2020-01-01..max" and "min..max" share an entry.
+    """
+    if min_date is not None:
+        start_date = max(start_date, min_date)
+        end_date = max(end_date, min_date)
+    if max_date is not None:
+        start_date = min(start_date, max_date)
+        end_date = min(end_date, max_date)
+    return (data_version, start_date.isoformat(), end_date.isoformat(), category or "All", vendor or "All")
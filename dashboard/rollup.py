@@ -0,0 +1,119 @@
+"""
+Pre-aggregated rollup store for the dashboard.
+
+The clean fact table is collapsed once (when the data is loaded) into additive
+measures, so every rerun only sums small pre-aggregated slices instead of
+grouping the raw daily x product rows again.
+"""
+import numpy as np
+import pandas as pd
+
+from dashboard.index import build_index, select
+
+# Additive measures kept in every rollup table.
+# Averages (fulfillment) are stored as sum + count so they stay additive.
+MEASURES = ["views", "orders", "net_revenue_usd", "returns", "ad_spend_usd", "fulfill_sum", "fulfill_count"]
+
+PRODUCT_GRAIN = ["date", "vendor_id", "category", "product_id"]
+CUBE_GRAIN = ["date", "vendor_id", "category"]
+
+MIN_VIEWS_FOR_CONVERSION = 2000
+PRODUCT_SAMPLE_SIZE = 1200
+
+
+def build_rollup(clean: pd.DataFrame) -> dict:
+    """
+    Build the rollup store from the clean fact table.
+
+    Returns:
+        dict with
+          - "product": date x vendor_id x category x product_id rows (product panel)
+          - "cube":    date x vendor_id x category rows (KPIs, vendor and category charts)
+          - "index":   date / category / vendor row indexes for both tables
+    """
+    fulfill = clean["avg_fulfillment_days"]
+    base = pd.DataFrame({
+        "date": clean["date"],
+        "vendor_id": clean["vendor_id"],
+        "category": clean["category"],
+        "product_id": clean["product_id"],
+        # Sum in float64 / int64 regardless of the storage dtype of the fact table
+        "views": clean["views"].astype("int64"),
+        "orders": clean["orders"].astype("int64"),
+        "net_revenue_usd": clean["net_revenue_usd"].astype("float64"),
+        "returns": clean["returns"].astype("int64"),
+        "ad_spend_usd": clean["ad_spend_usd"].astype("float64"),
+        "fulfill_sum": fulfill.fillna(0).astype("float64"),
+        "fulfill_count": fulfill.notna().astype("int64"),
+    })
+
+    product = base.groupby(PRODUCT_GRAIN, as_index=False, observed=True, sort=True)[MEASURES].sum()
+    cube = product.groupby(CUBE_GRAIN, as_index=False, observed=True, sort=True)[MEASURES].sum()
+
+    # groupby(sort=True) leaves both tables sorted by date, as build_index() requires
+    return {
+        "product": product,
+        "cube": cube,
+        "index": {"product": build_index(product), "cube": build_index(cube)},
+    }
+
+
+def slice_rollup(rollup: dict, start_date, end_date, category: str = "All", vendor: str = "All") -> tuple:
+    """Return the (cube, product) rows matching the sidebar filters."""
+    filters = {"category": category, "vendor_id": vendor}
+    return tuple(
+        select(rollup[name], rollup["index"][name], start_date, end_date, filters)
+        for name in ("cube", "product")
+    )
+
+
+def kpis(cube: pd.DataFrame) -> dict:
+    """KPI header values from a cube slice."""
+    total_views = int(cube["views"].sum())
+    total_orders = int(cube["orders"].sum())
+    returns = int(cube["returns"].sum())
+    fulfill_count = int(cube["fulfill_count"].sum())
+    return {
+        "total_views": total_views,
+        "total_orders": total_orders,
+        "net_rev": float(cube["net_revenue_usd"].sum()),
+        "conv": (total_orders / total_views) if total_views else 0.0,
+        "returns": returns,
+        "ret_rate": (returns / total_orders) if total_orders else 0.0,
+        "avg_fulfill": (float(cube["fulfill_sum"].sum()) / fulfill_count) if fulfill_count else float("nan"),
+    }
+
+
+def top_vendors_by_revenue(cube: pd.DataFrame, n: int = 10) -> pd.DataFrame:
+    vend = cube.groupby("vendor_id", as_index=False, observed=True)["net_revenue_usd"].sum()
+    return vend.sort_values("net_revenue_usd", ascending=False).head(n)
+
+
+def top_vendors_by_conversion(cube: pd.DataFrame, n: int = 10, min_views: int = MIN_VIEWS_FOR_CONVERSION) -> pd.DataFrame:
+    vend = cube.groupby("vendor_id", as_index=False, observed=True).agg(views=("views", "sum"), orders=("orders", "sum"))
+    vend = vend[vend["views"] > min_views].copy()
+    vend["conversion_rate"] = vend["orders"] / vend["views"]
+    return vend.sort_values("conversion_rate", ascending=False).head(n)
+
+
+def revenue_by_category(cube: pd.DataFrame) -> pd.DataFrame:
+    cat = cube.groupby("category", as_index=False, observed=True)["net_revenue_usd"].sum()
+    return cat.sort_values("net_revenue_usd", ascending=False)
+
+
+def product_conversion(product: pd.DataFrame, sample_size: int = PRODUCT_SAMPLE_SIZE) -> pd.DataFrame:
+    prod = product.groupby(["product_id", "category"], as_index=False, observed=True).agg(views=("views", "sum"), orders=("orders", "sum"))
+    prod["conversion_rate"] = prod["orders"] / prod["views"].replace(0, np.nan)
+    return prod.sample(min(len(prod), sample_size), random_state=42) if len(prod) else prod
+
+
+def compute_view(rollup: dict, start_date, end_date, category: str = "All", vendor: str = "All") -> dict:
+    """Everything the dashboard renders for one filter state."""
+    cube, product = slice_rollup(rollup, start_date, end_date, category, vendor)
+    return {
+        "kpis": kpis(cube),
+        "top_revenue": top_vendors_by_revenue(cube),
+        "top_conversion": top_vendors_by_conversion(cube),
+        "category_revenue": revenue_by_category(cube),
+        "products": product_conversion(product),
+    }
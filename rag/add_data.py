@@ -1,10 +1,10 @@
 """
 Module for adding vendors and products to the Neon PostgreSQL database
 """
-import pandas as pd
 from pathlib import Path
 from datetime import datetime
 from rag.db_config import insert_vendor, insert_product_raw, insert_marketplace_daily_raw, insert_marketplace_daily_clean, get_all_vendors
+from rag import live_index
 
 ROOT = Path(__file__).resolve().parents[1]
 
@@ -48,6 +48,8 @@ def add_vendor(vendor_id: str, vendor_tier: str, vendor_region: str, vendor_qual
         success = insert_vendor(vendor_id, vendor_tier, vendor_region, vendor_quality_score)
         
         if success:
+            # Make the vendor searchable by the chatbot (embedded in the background)
+            live_index.submit(live_index.vendor_document(vendor_id, vendor_tier, vendor_region, vendor_quality_score))
             return {
                 "success": True,
                 "message": f"✅ Vendor {vendor_id} added successfully to Neon!\nTier: {vendor_tier}, Region: {vendor_region}, Quality Score: {vendor_quality_score}"
@@ -187,6 +189,12 @@ def add_product(date: str, product_id: str, vendor_id: str, category: str, sub_c
         )
 
         if success:
+            # Make the product searchable by the chatbot (embedded in the background)
+            live_index.submit(live_index.product_document(
+                date, product_id, vendor_id, category, sub_category, price_usd, discount_rate,
+                ad_spend_usd, views, orders, returns, rating, rating_count, stock_units,
+                avg_fulfillment_days, conversion_rate, return_rate, net_revenue_usd,
+            ))
             return {
                 "success": True,
                 "message": f"""✅ Product {product_id} added successfully to Neon!
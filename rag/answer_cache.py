@@ -0,0 +1,184 @@
+"""
+Semantic cache for generated RAG answers.
+
+A question is answered from the cache when its embedding is within a cosine-similarity
+threshold of a cached question AND retrieval returned the same chunks, so a paraphrase
+hits but a question that pulls in different sources does not. Entries expire after a
+TTL, the cache is bounded (LRU), and it is persisted to rag/answer_cache.json so it
+survives restarts. The file is tagged with the index version written by ingest.py and
+discarded when the index has been rebuilt since.
+
+Writes are debounced off the request path: a change schedules one background save a
+couple of seconds later, which picks up every change made in between, and pending
+changes are flushed at exit.
+
+The file is a snapshot of one process's cache, not a shared store. Several processes
+(e.g. Streamlit workers) using the same file each load it at start and overwrite it
+with their own entries, so the last writer wins: answers cached only by another
+worker are missing from the file until that worker saves again, and a restart only
+gets back what the last writer had. Each process still keeps all of its own entries in
+memory. Point workers at separate files (AnswerCache(path=...)) to keep them apart.
+
+Only real model answers are cached; rate-limit / error fallbacks never are.
+
+Configuration:
+    RAG_ANSWER_CACHE=0                 disable
+    RAG_ANSWER_CACHE_THRESHOLD=0.92    minimum cosine similarity of the questions
+    RAG_ANSWER_CACHE_TTL=86400         seconds an answer stays valid
+    RAG_ANSWER_CACHE_ENTRIES=500       max cached answers
+    RAG_ANSWER_CACHE_SAVE_DELAY=2      seconds between a change and writing the file (0: at once)
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+RAG_DIR = Path(__file__).resolve().parent
+CACHE_FILE = RAG_DIR / "answer_cache.json"
+
+ENABLED = os.getenv("RAG_ANSWER_CACHE", "1") != "0"
+DEFAULT_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.92"))
+DEFAULT_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "86400"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_ENTRIES", "500"))
+DEFAULT_SAVE_DELAY = float(os.getenv("RAG_ANSWER_CACHE_SAVE_DELAY", "2"))
+
+
+class AnswerCache:
+    """Thread-safe semantic LRU cache of answers, persisted as JSON."""
+
+    def __init__(self, index_version: str, path: Path = CACHE_FILE, threshold: float = DEFAULT_THRESHOLD,
+                 ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 save_delay: float = DEFAULT_SAVE_DELAY):
+        self.index_version = index_version
+        self.path = Path(path)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        # key -> {"query", "vec" (np.ndarray), "chunk_ids", "answer", "created"}
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._dirty = False
+        self._save_timer = None
+        self._save_lock = threading.Lock()  # one writer of the file at a time
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring unreadable answer cache {self.path.name}: {e}")
+            return
+        if saved.get("index_version") != self.index_version:
+            return  # built against another index: every entry is suspect
+        now = time.time()
+        for key, e in saved.get("entries", []):
+            if now - e["created"] < self.ttl:
+                self._data[key] = {**e, "vec": np.asarray(e["vec"], dtype="float32")}
+
+    def _save(self):
+        """Schedule a write of the cache. Caller holds the lock."""
+        self._dirty = True
+        if self.save_delay <= 0:
+            threading.Thread(target=self.flush, daemon=True).start()
+        elif self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Write pending changes now (atomically); the lookup lock is only held to snapshot."""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # Entries are replaced, never mutated, so a shallow copy is a consistent snapshot
+                snapshot = list(self._data.items())
+
+            entries = [(key, {**e, "vec": [round(float(x), 6) for x in e["vec"]]}) for key, e in snapshot]
+            tmp = Path(str(self.path) + ".tmp")
+            try:
+                tmp.write_text(json.dumps({"index_version": self.index_version, "entries": entries}), encoding="utf-8")
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"[WARN] Could not persist answer cache: {e}")
+
+    def get(self, q_vec: np.ndarray, chunk_ids: list):
+        """Cached answer for a query embedding + retrieved chunk ids, or None."""
+        with self._lock:
+            now = time.time()
+            best_key, best_sim = None, self.threshold
+            for key, e in list(self._data.items()):
+                if now - e["created"] >= self.ttl:
+                    del self._data[key]
+                    continue
+                if e["chunk_ids"] != list(chunk_ids):
+                    continue
+                sim = float(np.dot(e["vec"], q_vec))
+                if sim >= best_sim:
+                    best_key, best_sim = key, sim
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(best_key)
+            self.hits += 1
+            return self._data[best_key]["answer"]
+
+    def put(self, query: str, q_vec: np.ndarray, chunk_ids: list, answer: str):
+        key = " ".join(query.lower().split())
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = {
+                "query": query,
+                "vec": np.asarray(q_vec, dtype="float32"),
+                "chunk_ids": list(chunk_ids),
+                "answer": answer,
+                "created": time.time(),
+            }
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            self._save()
+
+    def invalidate_chunks(self, chunk_ids):
+        """Drop answers that cited any of these chunks (e.g. a live document was replaced)."""
+        chunk_ids = set(chunk_ids)
+        with self._lock:
+            stale = [key for key, e in self._data.items() if chunk_ids.intersection(e["chunk_ids"])]
+            for key in stale:
+                del self._data[key]
+            if stale:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
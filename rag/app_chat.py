@@ -1,11 +1,15 @@
 import streamlit as st
-from rag.rag_core import answer
 from rag.add_data import add_vendor, add_product
 from rag.db_config import get_all_vendors
 import datetime
-from rag.intent import detect_intent
+from rag.turn import start_turn
+from rag.rag_core import preload
 
 st.set_page_config(page_title="Marketplace RAG Chatbot", layout="wide")
+
+# Load the model and index in the background while the page renders
+preload()
+
 st.title("📊 Marketplace RAG Chatbot (Docs + AI Recommendations)")
 
 st.caption("Ask questions about vendors, categories, performance tables, and recommendations. Answers include sources.")
@@ -135,7 +139,8 @@ if prompt:
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        intent_out = detect_intent(prompt)
+        turn = start_turn(prompt)
+        intent_out = turn.intent()
         intent = intent_out.get("intent", "qa")
 
 
@@ -157,13 +162,13 @@ if prompt:
 
 
     # Normal RAG flow
-    with st.spinner("Retrieving and answering..."):
-        out, contexts = answer(prompt)
-        st.markdown(out)
-
-        with st.expander("Sources used"):
-            for i, c in enumerate(contexts, start=1):
-                st.write(f"[{i}] {c['source']} (score={c['score']:.3f})")
-                st.code(c["text"][:800] + ("..." if len(c["text"]) > 800 else ""))
+    with st.spinner("Retrieving..."):
+        tokens, contexts = turn.answer_stream()
+    out = st.write_stream(tokens)
+
+    with st.expander("Sources used"):
+        for i, c in enumerate(contexts, start=1):
+            st.write(f"[{i}] {c['source']} (score={c['score']:.3f})")
+            st.code(c["text"][:800] + ("..." if len(c["text"]) > 800 else ""))
 
     st.session_state.messages[-1] = {"role": "assistant", "content": out}
@@ -0,0 +1,176 @@
+"""
+Throughput of the marketplace_daily_clean load paths against a (local) Postgres.
+
+    row             one INSERT ... ON CONFLICT DO NOTHING per row (the old batch_insert loop)
+    execute_values  multi-row INSERT pages via psycopg2.extras.execute_values
+    copy-skip       bulk_upsert_marketplace_daily_clean(on_conflict="skip"): COPY + one merge
+    copy-update     the same rows again with changed values, on_conflict="update"
+
+Rows use BENCH_ vendor / product ids and dates in 2099, and are deleted again afterwards
+(the summary triggers take the deletes back out of the summary tables). A few invalid
+rows, unknown vendors and in-batch duplicates are mixed in (--bad-rate) to exercise the
+rejected-rows report. "vs row" is each method's rows/s relative to the per-row
+baseline measured in the same run; no figures are recorded in the repo, since they
+depend on the server and the network round-trip time.
+
+Usage:
+    DATABASE_URL=postgresql://localhost/marketplace DB_SSLMODE=disable \\
+        python -m rag.bench_bulk_insert --rows 100000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from psycopg2.extras import execute_values
+
+from rag.db_config import (MARKETPLACE_CLEAN_COLUMNS, bulk_upsert_marketplace_daily_clean, init_database)
+from rag.db_pool import pooled_connection
+
+COLUMNS = ", ".join(MARKETPLACE_CLEAN_COLUMNS)
+INSERT_SQL = f"""
+    INSERT INTO marketplace_daily_clean ({COLUMNS}) VALUES %s
+    ON CONFLICT (date, product_id, vendor_id) DO NOTHING
+"""
+N_VENDORS = 50
+
+
+def make_records(n: int, bad_rate: float, seed: int = 0, price_bump: float = 0.0) -> list:
+    rng = random.Random(seed)
+    start = date(2099, 1, 1)
+    records = []
+    for i in range(n):
+        views = rng.randint(0, 5000)
+        orders = rng.randint(0, max(views // 20, 1))
+        price = round(rng.uniform(5, 500), 2) + price_bump
+        records.append((
+            start + timedelta(days=i % 365), f"BENCH_P{i // 365:06d}", f"BENCH_V{i % N_VENDORS:03d}",
+            "Bench", "Bench Sub", price, 0.1, 12.5, views, orders, orders * price, 0, 4.2, 10, 100,
+            2.5, orders / views if views else 0.0, 0.0, orders * price,
+        ))
+
+    rng = random.Random(seed + 1)
+    for _ in range(int(n * bad_rate)):
+        i = rng.randrange(n)
+        kind = rng.choice(("vendor", "int", "dup"))
+        if kind == "vendor":
+            records[i] = records[i][:2] + ("BENCH_UNKNOWN",) + records[i][3:]
+        elif kind == "int":
+            records[i] = records[i][:8] + ("lots",) + records[i][9:]
+        else:
+            records.append(records[i])
+    return records
+
+
+def clean_rows(records: list) -> list:
+    """The rows the plain INSERT paths can take (they'd abort on the bad ones)."""
+    seen, out = set(), []
+    for r in records:
+        key = r[:3]
+        if r[2] != "BENCH_UNKNOWN" and isinstance(r[8], int) and key not in seen:
+            seen.add(key)
+            out.append(r)
+    return out
+
+
+def reset(vendors: bool = False):
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM marketplace_daily_clean WHERE vendor_id LIKE 'BENCH\\_%'")
+        if vendors:
+            cur.execute("DELETE FROM vendors WHERE vendor_id LIKE 'BENCH\\_%'")
+        else:
+            execute_values(cur, """
+                INSERT INTO vendors (vendor_id, vendor_tier, vendor_region, vendor_quality_score) VALUES %s
+                ON CONFLICT (vendor_id) DO NOTHING
+            """, [(f"BENCH_V{i:03d}", "Bench", "Bench", 0.5) for i in range(N_VENDORS)])
+        conn.commit()
+        cur.close()
+
+
+def run_row(records: list) -> int:
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        inserted = 0
+        for r in records:
+            cur.execute(INSERT_SQL.replace("VALUES %s", f"VALUES ({', '.join(['%s'] * len(r))})"), r)
+            inserted += cur.rowcount
+        conn.commit()
+        cur.close()
+        return inserted
+
+
+def run_execute_values(records: list, page_size: int) -> int:
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        inserted = 0
+        for start in range(0, len(records), page_size):
+            execute_values(cur, INSERT_SQL, records[start:start + page_size], page_size=page_size)
+            inserted += cur.rowcount
+        conn.commit()
+        cur.close()
+        return inserted
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--row-limit", type=int, default=5_000, help="rows for the (slow) per-row baseline")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--page-size", type=int, default=1_000, help="execute_values page size")
+    parser.add_argument("--bad-rate", type=float, default=0.001)
+    args = parser.parse_args(argv)
+
+    init_database()
+    records = make_records(args.rows, args.bad_rate)
+    valid = clean_rows(records)
+    results = []
+
+    def timed(name, n, fn):
+        reset()
+        t0 = time.perf_counter()
+        inserted = fn()
+        seconds = time.perf_counter() - t0
+        results.append((name, n, inserted, seconds))
+        return inserted
+
+    timed("row", min(args.row_limit, len(valid)), lambda: run_row(valid[:args.row_limit]))
+    timed("execute_values", len(valid), lambda: run_execute_values(valid, args.page_size))
+
+    bulk = {}
+    reset()
+    t0 = time.perf_counter()
+    bulk["skip"] = bulk_upsert_marketplace_daily_clean(records, "skip", args.batch_size)
+    results.append(("copy-skip", len(records), bulk["skip"]["inserted"], time.perf_counter() - t0))
+
+    # Same keys, new prices: every surviving row becomes an update
+    changed = make_records(args.rows, args.bad_rate, price_bump=1.0)
+    t0 = time.perf_counter()
+    bulk["update"] = bulk_upsert_marketplace_daily_clean(changed, "update", args.batch_size)
+    results.append(("copy-update", len(changed), bulk["update"]["updated"], time.perf_counter() - t0))
+
+    reset(vendors=True)
+
+    base_rate = results[0][1] / results[0][3] if results[0][3] else 0
+    print(f"\n{'method':<16} {'rows':>9} {'written':>9} {'seconds':>9} {'rows/s':>10} {'vs row':>7}")
+    for name, n, written, seconds in results:
+        rate = n / seconds if seconds else 0
+        print(f"{name:<16} {n:>9} {written:>9} {seconds:>9.2f} {rate:>10.0f} "
+              f"{rate / base_rate if base_rate else 0:>6.1f}x")
+
+    for mode, r in bulk.items():
+        print(f"\n{mode}: {r['inserted']} inserted, {r['updated']} updated, {r['unchanged']} unchanged, "
+              f"{r['rejected']} rejected, {r['failed']} failed in {len(r['batches'])} batches")
+        reasons = {}
+        for rej in r["rejects"]:
+            reason = rej["reason"].split(" BENCH_")[0]
+            reasons[reason] = reasons.get(reason, 0) + 1
+        for reason, count in sorted(reasons.items()):
+            print(f"   {count:>6}  {reason}")
+
+    return 0 if all(r["failed"] == 0 for r in bulk.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
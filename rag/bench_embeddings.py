@@ -0,0 +1,148 @@
+"""
+Parity check and benchmark for the embedding backends in rag/embeddings.py.
+
+Each backend runs in a fresh interpreter (so RSS is its own) and reports:
+    load       time to load the model
+    RSS        resident memory after loading and encoding
+    p50 / p99  single-query encode latency (the retrieve() path)
+    docs/s     batch encode throughput over the corpus (the ingest path)
+
+Parity: every backend's corpus vectors are compared with the torch backend's, text by
+text (cosine similarity), and the top-k chunks retrieved for the query set must match.
+The script exits with status 1 when a backend falls below --min-cosine or --min-topk.
+
+Usage:
+    python -m rag.bench_embeddings                       # torch vs onnx vs onnx-int8
+    python -m rag.bench_embeddings --backends torch onnx-int8 --min-cosine 0.98
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from rag.embeddings import BACKENDS
+
+ROOT = Path(__file__).resolve().parents[1]
+QUERIES_FILE = Path(__file__).resolve().parent / "intent_eval.jsonl"
+
+
+def corpus_texts() -> list:
+    from rag.rag_core import load_chunks
+
+    chunks = load_chunks()
+    return [c["text"] for c in (chunks.values() if isinstance(chunks, dict) else chunks)]
+
+
+def query_texts() -> list:
+    with open(QUERIES_FILE, "r", encoding="utf-8") as f:
+        return [json.loads(line)["prompt"] for line in f if line.strip()]
+
+
+def worker(backend: str, out_dir: Path, repeats: int):
+    """Runs inside the child process: measure one backend, save its vectors."""
+    from rag.embeddings import load_embedder
+
+    t0 = time.perf_counter()
+    emb = load_embedder(backend)
+    load_s = time.perf_counter() - t0
+
+    corpus, queries = corpus_texts(), query_texts()
+    emb.encode(queries[:4])  # warm-up
+
+    lat = []
+    for _ in range(repeats):
+        for q in queries:
+            t0 = time.perf_counter()
+            emb.encode([q])
+            lat.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    corpus_vecs = emb.encode(corpus, batch_size=32)
+    batch_s = time.perf_counter() - t0
+
+    np.save(out_dir / f"{backend}_corpus.npy", corpus_vecs)
+    np.save(out_dir / f"{backend}_queries.npy", emb.encode(queries))
+    print(json.dumps({
+        "backend": backend,
+        "load_s": load_s,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "docs_per_s": len(corpus) / batch_s if batch_s else float("inf"),
+        "model_mb": emb.nbytes() / 2**20,
+    }))
+
+
+def topk_agreement(ref_corpus, ref_q, corpus, q, k: int) -> float:
+    k = min(k, len(ref_corpus))
+    ref = np.argsort(-(ref_q @ ref_corpus.T), axis=1)[:, :k]
+    got = np.argsort(-(q @ corpus.T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref, got)]))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the query set for latency")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="minimum per-text cosine vs torch")
+    parser.add_argument("--min-topk", type=float, default=0.9, help="minimum top-k agreement vs torch")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker, Path(args.out_dir), args.repeats)
+        return 0
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    out_dir = Path(tempfile.mkdtemp(prefix="bench_embeddings_"))
+    results = {}
+    for backend in backends:
+        proc = subprocess.run(
+            [sys.executable, "-m", "rag.bench_embeddings", "--worker", backend,
+             "--out-dir", str(out_dir), "--repeats", str(args.repeats)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"❌ {backend}: failed\n{proc.stderr[-1500:]}")
+            return 1
+        results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print(f"\n{'backend':<10} {'load s':>7} {'RSS MB':>8} {'model MB':>9} {'p50 ms':>8} {'p99 ms':>8} {'docs/s':>9}")
+    for r in results.values():
+        print(f"{r['backend']:<10} {r['load_s']:>7.2f} {r['rss_mb']:>8.0f} {r['model_mb']:>9.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['docs_per_s']:>9.1f}")
+
+    ref_corpus = np.load(out_dir / "torch_corpus.npy")
+    ref_q = np.load(out_dir / "torch_queries.npy")
+    failures = []
+    print(f"\n{'backend':<10} {'min cos':>8} {'mean cos':>9} {'top-' + str(args.k):>7}   (vs torch)")
+    for backend in backends[1:]:
+        corpus = np.load(out_dir / f"{backend}_corpus.npy")
+        q = np.load(out_dir / f"{backend}_queries.npy")
+        cos = np.concatenate([np.sum(ref_corpus * corpus, axis=1), np.sum(ref_q * q, axis=1)])
+        agree = topk_agreement(ref_corpus, ref_q, corpus, q, args.k)
+        print(f"{backend:<10} {cos.min():>8.4f} {cos.mean():>9.4f} {agree:>7.2f}")
+        if cos.min() < args.min_cosine:
+            failures.append(f"{backend}: min cosine {cos.min():.4f} < {args.min_cosine}")
+        if agree < args.min_topk:
+            failures.append(f"{backend}: top-{args.k} agreement {agree:.2f} < {args.min_topk}")
+
+    print()
+    if not failures:
+        print("✅ Parity OK")
+        return 0
+    for f in failures:
+        print(f"❌ {f}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
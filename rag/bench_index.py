@@ -0,0 +1,122 @@
+"""
+Recall / latency / memory benchmark for the RAG index types.
+
+Builds every index type from rag/index_config.py over the same vectors, sweeps its
+search knob (nprobe for IVF, efSearch for HNSW) and reports, per setting:
+    recall@k   overlap with the exact IndexFlatIP top-k
+    p50 / p99  single-query search latency
+    memory     size of the serialized index
+
+Vectors come from the current corpus (re-embedded from the chunk store), or from a
+synthetic clustered set so the curve can be read at the corpus size we are heading for.
+
+Usage:
+    python -m rag.bench_index                          # current corpus
+    python -m rag.bench_index --synthetic 200000 -k 5
+    python -m rag.bench_index --types ivf_flat hnsw --queries 500
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from rag.index_config import DEFAULTS, INDEX_TYPES, build_index, apply_search_params
+
+NPROBE_SWEEP = [1, 4, 16, 64, 256]
+EF_SEARCH_SWEEP = [16, 32, 64, 128, 256]
+
+
+def corpus_vectors() -> np.ndarray:
+    from rag.embeddings import load_embedder
+    from rag.rag_core import load_chunks
+
+    chunks = load_chunks()
+    texts = [c["text"] for c in (chunks.values() if isinstance(chunks, dict) else chunks)]
+    return load_embedder().encode(texts, show_progress_bar=True)
+
+
+def synthetic_vectors(n: int, dim: int = 384, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Normalized vectors drawn around random centres (closer to real embeddings than pure noise)."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype("float32")
+    x = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+
+def make_queries(vectors: np.ndarray, n: int, seed: int = 1) -> np.ndarray:
+    """Perturbed corpus vectors, so queries land near real neighbourhoods."""
+    rng = np.random.default_rng(seed)
+    q = vectors[rng.integers(0, len(vectors), n)] + 0.05 * rng.standard_normal((n, vectors.shape[1])).astype("float32")
+    faiss.normalize_L2(q)
+    return q
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def time_queries(index, queries: np.ndarray, k: int) -> tuple:
+    """Search one query at a time (as retrieve() does); returns (ids, latencies_ms)."""
+    ids = np.empty((len(queries), k), dtype="int64")
+    lat = np.empty(len(queries))
+    for i in range(len(queries)):
+        t0 = time.perf_counter()
+        _, I = index.search(queries[i:i + 1], k)
+        lat[i] = (time.perf_counter() - t0) * 1000
+        ids[i] = I[0]
+    return ids, lat
+
+
+def sweep(kind: str) -> list:
+    if kind in ("ivf_flat", "ivf_pq"):
+        return [("nprobe", v) for v in NPROBE_SWEEP]
+    if kind == "hnsw":
+        return [("ef_search", v) for v in EF_SEARCH_SWEEP]
+    return [(None, None)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark N synthetic vectors instead of the corpus")
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=DEFAULTS["nlist"])
+    parser.add_argument("--pq-m", type=int, default=DEFAULTS["pq_m"])
+    parser.add_argument("--hnsw-m", type=int, default=DEFAULTS["hnsw_m"])
+    args = parser.parse_args(argv)
+
+    vectors = synthetic_vectors(args.synthetic) if args.synthetic else corpus_vectors()
+    queries = make_queries(vectors, args.queries)
+    k = min(args.k, len(vectors))
+    print(f"Vectors: {len(vectors)} x {vectors.shape[1]}, queries: {len(queries)}, k={k}")
+
+    flat, _ = build_index(vectors, {"index_type": "flat"})
+    truth, _ = time_queries(flat, queries, k)
+
+    print(f"\n{'index':<10} {'setting':<16} {'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8} {'memory MB':>10} {'build s':>8}")
+    for kind in args.types:
+        t0 = time.perf_counter()
+        index, params = build_index(vectors, {
+            "index_type": kind, "nlist": args.nlist, "pq_m": args.pq_m, "hnsw_m": args.hnsw_m,
+        })
+        build_s = time.perf_counter() - t0
+        memory_mb = faiss.serialize_index(index).nbytes / 2**20
+
+        for knob, value in sweep(params["index_type"]):
+            label = "exact"
+            if knob:
+                params[knob] = value
+                apply_search_params(index, params)
+                label = f"{knob}={value}"
+            ids, lat = time_queries(index, queries, k)
+            print(f"{params['index_type']:<10} {label:<16} {recall_at_k(ids, truth):>9.3f} "
+                  f"{np.percentile(lat, 50):>8.3f} {np.percentile(lat, 99):>8.3f} {memory_mb:>10.1f} {build_s:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
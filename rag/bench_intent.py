@@ -0,0 +1,76 @@
+"""
+Accuracy / latency benchmark for intent detection on rag/intent_eval.jsonl.
+
+Tiers compared:
+    rules      keyword rules only (no model, no network)
+    local      rules + nearest-centroid on MiniLM (loads the retrieval model first)
+    tiered     what detect_intent() does: local, LLM below INTENT_LOCAL_THRESHOLD
+    llm        the OpenAI classifier for every prompt
+
+The tiers that call OpenAI only run with --llm.
+
+Usage:
+    python -m rag.bench_intent
+    python -m rag.bench_intent --llm --show-errors
+"""
+import argparse
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from rag.intent import classify_local, classify_rules, detect_intent, detect_intent_llm
+
+EVAL_FILE = Path(__file__).resolve().parent / "intent_eval.jsonl"
+
+
+def load_eval(path: Path = EVAL_FILE) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(name: str, classify, rows: list, show_errors: bool = False):
+    correct = 0
+    sources = Counter()
+    lat = []
+    for row in rows:
+        t0 = time.perf_counter()
+        result = classify(row["prompt"]) or {"intent": None, "source": "none"}
+        lat.append((time.perf_counter() - t0) * 1000)
+
+        sources[result.get("source", name)] += 1
+        if result["intent"] == row["intent"]:
+            correct += 1
+        elif show_errors:
+            print(f"  ✗ [{name}] {row['prompt']!r}: expected {row['intent']}, got {result['intent']} ({result.get('reason', '')})")
+
+    lat = np.array(lat)
+    used = ", ".join(f"{k}={v}" for k, v in sources.most_common())
+    print(f"{name:<8} {correct / len(rows):>9.1%} {np.percentile(lat, 50):>9.3f} {np.percentile(lat, 99):>9.3f} {lat.mean():>9.3f}   {used}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm", action="store_true", help="also run the tiers that call OpenAI")
+    parser.add_argument("--no-model", action="store_true", help="skip the tiers that need the embedding model")
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = load_eval()
+    print(f"Eval set: {len(rows)} prompts, {dict(Counter(r['intent'] for r in rows))}\n")
+    print(f"{'tier':<8} {'accuracy':>9} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}   decided by")
+
+    run("rules", classify_rules, rows, args.show_errors)
+    if not args.no_model:
+        from rag import rag_core
+        rag_core.init()
+        run("local", classify_local, rows, args.show_errors)
+    if args.llm:
+        run("tiered", detect_intent, rows, args.show_errors)
+        run("llm", detect_intent_llm, rows, args.show_errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Set-based bulk ingestion into Postgres: COPY into a temp staging table, then one merge.
+
+Row-by-row INSERTs cost one round trip per row, and one bad row used to roll back a
+whole batch with no detail. Here each batch is:
+
+    1. coerced in Python (rows that don't fit the column types are rejected, not sent)
+    2. streamed with COPY into a temp staging table (one round trip)
+    3. checked in SQL: rows whose foreign key has no parent, and earlier duplicates of
+       a key within the batch (the last occurrence wins), are rejected
+    4. merged with a single INSERT ... SELECT ... ON CONFLICT, counting inserted vs
+       updated rows (xmax = 0 on a freshly inserted row version)
+
+on_conflict="skip" keeps existing rows (DO NOTHING); "update" overwrites them, leaving
+rows whose values are unchanged untouched (so the summary triggers see no churn).
+Each batch commits on its own; a failing batch is rolled back and reported.
+
+load_dataframe() does the same for a whole pandas DataFrame in one transaction, with
+column-wise (vectorized) coercion; rag/migrate_to_neon.py is built on it.
+"""
+import csv
+import io
+import math
+import time
+from datetime import date, datetime
+
+ON_CONFLICT = ("skip", "update")
+
+# Python-side coercion for the SQL types used in db_config's tables
+_INT_TYPES = ("INTEGER", "BIGINT", "SMALLINT", "SERIAL")
+_FLOAT_TYPES = ("FLOAT", "DOUBLE PRECISION", "REAL", "NUMERIC")
+
+
+def column_kind(sql_type: str) -> str:
+    t = sql_type.upper()
+    if t.startswith(_INT_TYPES):
+        return "int"
+    if t.startswith(_FLOAT_TYPES):
+        return "float"
+    if t == "DATE":
+        return "date"
+    return "text"
+
+
+def _missing(value) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value)) or value == ""
+
+
+def coerce_value(value, kind: str):
+    """Value converted for a column of the given kind (None for missing); raises ValueError."""
+    if _missing(value):
+        return None
+    if kind == "int":
+        f = float(value)
+        if not f.is_integer():
+            raise ValueError(f"{value!r} is not an integer")
+        return int(f)
+    if kind == "float":
+        f = float(value)
+        if math.isinf(f):
+            raise ValueError(f"{value!r} is not finite")
+        return f
+    if kind == "date":
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return date.fromisoformat(str(value)[:10])
+    return str(value)
+
+
+def coerce_record(record, columns: dict, required=()) -> tuple:
+    """
+    A record (sequence in column order, or mapping) as a tuple of coerced values.
+    Raises ValueError naming the offending column.
+    """
+    names = list(columns)
+    if isinstance(record, dict):
+        values = [record.get(c) for c in names]
+    else:
+        values = list(record)
+        if len(values) != len(names):
+            raise ValueError(f"expected {len(names)} values, got {len(values)}")
+    out = []
+    for name, value in zip(names, values):
+        try:
+            v = coerce_value(value, column_kind(columns[name]))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{name}: {e}") from None
+        if v is None and name in required:
+            raise ValueError(f"{name}: required")
+        out.append(v)
+    return tuple(out)
+
+
+def create_stage(cur, stage: str, columns: dict):
+    """Temp staging table (row_no + the given columns), dropped at commit."""
+    cols = ", ".join(f"{c} {typ}" for c, typ in columns.items())
+    cur.execute(f"CREATE TEMP TABLE {stage} (row_no INTEGER NOT NULL, {cols}) ON COMMIT DROP")
+
+
+def copy_rows(cur, table: str, columns: list, rows) -> int:
+    """COPY an iterable of tuples into table(columns) as CSV; returns the row count."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    n = 0
+    for row in rows:
+        # An unquoted empty field is NULL in CSV COPY (coerce_value maps "" to None)
+        writer.writerow(["" if v is None else v for v in row])
+        n += 1
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+    return n
+
+
+def _fk_joins(foreign_keys: dict) -> str:
+    return " ".join(
+        f"JOIN {parent} p{i} ON p{i}.{parent_col} = s.{col}"
+        for i, (col, (parent, parent_col)) in enumerate(foreign_keys.items())
+    )
+
+
+def staged_rejects_sql(stage: str, key: list, foreign_keys: dict) -> str:
+    """row_no + reason for staged rows that fail a foreign key or are superseded in-batch."""
+    parts = []
+    for col, (parent, parent_col) in foreign_keys.items():
+        parts.append(f"""
+            SELECT s.row_no, 'unknown {col} ' || s.{col} AS reason
+            FROM {stage} s LEFT JOIN {parent} p ON p.{parent_col} = s.{col}
+            WHERE p.{parent_col} IS NULL""")
+    # Only rows that pass the foreign keys compete for a key (as in merge_sql)
+    partition = ", ".join(f"s.{k}" for k in key)
+    parts.append(f"""
+        SELECT row_no, 'duplicate key in batch (a later row wins)' AS reason
+        FROM (SELECT s.row_no, row_number() OVER (PARTITION BY {partition} ORDER BY s.row_no DESC) AS rn
+              FROM {stage} s {_fk_joins(foreign_keys)}) d
+        WHERE rn > 1""")
+    return " UNION ALL ".join(parts) + " ORDER BY row_no"
+
+
+def merge_sql(target: str, stage: str, columns: list, key: list, foreign_keys: dict,
+              on_conflict: str = "skip", update_columns: list = None) -> str:
+    """
+    One INSERT ... SELECT ... ON CONFLICT from the staging table, skipping rejected rows.
+    Returns (inserted, updated) counts.
+    """
+    if on_conflict not in ON_CONFLICT:
+        raise ValueError(f"on_conflict must be one of {ON_CONFLICT}, got {on_conflict!r}")
+    cols = ", ".join(columns)
+    keys = ", ".join(key)
+    if on_conflict == "update":
+        update_columns = update_columns or [c for c in columns if c not in key]
+        sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in update_columns)
+        old = ", ".join(f"t.{c}" for c in update_columns)
+        new = ", ".join(f"EXCLUDED.{c}" for c in update_columns)
+        action = f"DO UPDATE SET {sets} WHERE ({old}) IS DISTINCT FROM ({new})"
+    else:
+        action = "DO NOTHING"
+    return f"""
+        WITH src AS (
+            SELECT DISTINCT ON ({", ".join(f"s.{k}" for k in key)}) {", ".join(f"s.{c}" for c in columns)}
+            FROM {stage} s {_fk_joins(foreign_keys)}
+            ORDER BY {", ".join(f"s.{k}" for k in key)}, s.row_no DESC
+        ), merged AS (
+            INSERT INTO {target} AS t ({cols})
+            SELECT {cols} FROM src
+            ON CONFLICT ({keys}) {action}
+            RETURNING (t.xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM merged
+    """
+
+
+def bulk_upsert(conn, target: str, columns: dict, key: list, records, on_conflict: str = "skip",
+                foreign_keys: dict = None, update_columns: list = None, batch_size: int = 50_000,
+                verbose: bool = False) -> dict:
+    """
+    Load records into `target` in batches of batch_size (one transaction each).
+
+    columns: column -> SQL type, in record order; key: the ON CONFLICT columns;
+    foreign_keys: column -> (parent table, parent column), checked before the merge.
+
+    Returns {"received", "inserted", "updated", "unchanged", "rejected", "failed",
+    "seconds", "rows_per_s", "batches": [per-batch counts], "rejects": [{"row", "reason"}]};
+    "row" is the record's 0-based position in `records`.
+    """
+    foreign_keys = foreign_keys or {}
+    names = list(columns)
+    stage = f"_stage_{target}"
+    totals = {"received": 0, "inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "failed": 0}
+    batches, rejects = [], []
+    merge = merge_sql(target, stage, names, key, foreign_keys, on_conflict, update_columns)
+    rejects_sql = staged_rejects_sql(stage, key, foreign_keys)
+
+    def run_batch(offset: int, batch: list):
+        b = {"batch": len(batches), "rows": len(batch), "inserted": 0, "updated": 0,
+             "unchanged": 0, "rejected": 0, "error": None}
+        good = []
+        for i, record in enumerate(batch, start=offset):
+            try:
+                good.append((i,) + coerce_record(record, columns, required=key))
+            except ValueError as e:
+                rejects.append({"row": i, "reason": str(e)})
+                b["rejected"] += 1
+
+        t0 = time.perf_counter()
+        cur = conn.cursor()
+        try:
+            create_stage(cur, stage, columns)
+            copy_rows(cur, stage, ["row_no"] + names, good)
+            cur.execute(rejects_sql)
+            # A row failing several foreign keys is reported once
+            staged = {}
+            for r, reason in cur.fetchall():
+                staged.setdefault(r, {"row": r, "reason": reason})
+            staged_rejects = list(staged.values())
+            cur.execute(merge)
+            b["inserted"], b["updated"] = cur.fetchone()
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            b["error"] = f"{type(e).__name__}: {e}"
+            print(f"❌ Batch {b['batch']} ({len(batch)} rows) failed: {b['error']}")
+            totals["failed"] += len(batch) - b["rejected"]
+        else:
+            rejects.extend(staged_rejects)
+            b["rejected"] += len(staged_rejects)
+            b["unchanged"] = len(good) - len(staged_rejects) - b["inserted"] - b["updated"]
+        finally:
+            cur.close()
+        b["seconds"] = time.perf_counter() - t0
+
+        for k in ("inserted", "updated", "unchanged", "rejected"):
+            totals[k] += b[k]
+        totals["received"] += len(batch)
+        batches.append(b)
+        if verbose:
+            print(f"   batch {b['batch']}: {b['rows']} rows → {b['inserted']} inserted, {b['updated']} updated, "
+                  f"{b['unchanged']} unchanged, {b['rejected']} rejected ({b['seconds']:.2f}s)")
+
+    t0 = time.perf_counter()
+    batch, offset = [], 0
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            run_batch(offset, batch)
+            offset += len(batch)
+            batch = []
+    if batch:
+        run_batch(offset, batch)
+
+    seconds = time.perf_counter() - t0
+    totals.update(
+        seconds=seconds,
+        rows_per_s=totals["received"] / seconds if seconds else 0.0,
+        batches=batches,
+        rejects=rejects,
+    )
+    return totals
+
+
+# ---------------------------------------------------------------------------
+# DataFrame -> table
+#
+# The same staging + merge, for a whole DataFrame in one transaction, with the
+# type coercion done column-wise in pandas instead of per record.
+# ---------------------------------------------------------------------------
+
+def coerce_frame(df, columns: dict, required=()):
+    """
+    df[columns] coerced column-wise: Int64 / float / ISO date strings / strings, NA for missing.
+    Returns (frame, reasons): reasons is "" for good rows, else what failed per column.
+    """
+    import pandas as pd
+
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"DataFrame is missing columns {missing}")
+
+    out = pd.DataFrame(index=df.index)
+    reasons = pd.Series("", index=df.index, dtype="object")
+    for name, sql_type in columns.items():
+        s = df[name]
+        present = s.notna() & (s.astype(str).str.strip() != "")
+        kind = column_kind(sql_type)
+        if kind in ("int", "float"):
+            v = pd.to_numeric(s.where(present), errors="coerce")
+            invalid = present & (v.isna() | (v.abs() == float("inf")))
+            if kind == "int":
+                invalid |= present & ~invalid & (v % 1 != 0)
+                v = v.where(~invalid).round().astype("Int64")
+            else:
+                v = v.where(~invalid)
+        elif kind == "date":
+            v = pd.to_datetime(s.where(present), errors="coerce")
+            invalid = present & v.isna()
+            v = v.dt.strftime("%Y-%m-%d")
+        else:
+            v = s.where(present).astype("string")
+            invalid = pd.Series(False, index=df.index)
+        if name in required:
+            reasons = reasons.where(present, reasons + f"{name}: required; ")
+        reasons = reasons.where(~invalid, reasons + f"{name}: not a valid {kind}; ")
+        out[name] = v
+    return out, reasons.str.rstrip("; ")
+
+
+def load_dataframe(conn, df, table: str, columns: dict, key: list, on_conflict: str = "skip",
+                   update_columns: list = None, foreign_keys: dict = None, dry_run: bool = False,
+                   chunk_rows: int = 100_000, progress: bool = True) -> dict:
+    """
+    Load a DataFrame into `table` in one transaction: coerce, COPY into staging in chunks
+    of chunk_rows, reject rows failing a foreign key (and in-frame duplicate keys), then
+    one merge. update_columns limits what on_conflict="update" overwrites.
+
+    dry_run only coerces and counts (no connection needed). Returns {"table", "rows",
+    "valid" (rows passing coercion), "inserted", "updated", "unchanged", "rejected",
+    "rejects", "bytes", "seconds", "dry_run"};
+    rejected rows are reported by their 0-based position in df. Raises on database
+    errors after rolling back.
+    """
+    foreign_keys = foreign_keys or {}
+    names = list(columns)
+    t0 = time.perf_counter()
+
+    frame, reasons = coerce_frame(df, columns, required=key)
+    frame.insert(0, "row_no", range(len(frame)))
+    bad = (reasons != "").to_numpy()
+    rejects = [{"row": int(r), "reason": reason}
+               for r, reason in zip(frame["row_no"][bad], reasons[bad])]
+    good = frame[~bad]
+
+    result = {"table": table, "rows": len(df), "valid": len(good), "inserted": 0, "updated": 0,
+              "unchanged": 0, "rejected": len(rejects), "rejects": rejects, "bytes": 0, "dry_run": dry_run}
+    if dry_run:
+        result["seconds"] = time.perf_counter() - t0
+        if progress:
+            print(f"   {table}: {len(good)} rows would be merged, {len(rejects)} rejected (dry run)")
+        return result
+
+    stage = f"_stage_{table}"
+    cur = conn.cursor()
+    try:
+        create_stage(cur, stage, columns)
+        for start in range(0, len(good), chunk_rows):
+            chunk = good.iloc[start:start + chunk_rows]
+            data = chunk.to_csv(index=False, header=False, na_rep="")
+            cur.copy_expert(f"COPY {stage} (row_no, {', '.join(names)}) FROM STDIN WITH (FORMAT csv)",
+                            io.StringIO(data))
+            result["bytes"] += len(data.encode("utf-8"))
+            if progress:
+                print(f"   {table}: staged {start + len(chunk)}/{len(good)} rows "
+                      f"({result['bytes'] / 2**20:.1f} MB)")
+
+        cur.execute(staged_rejects_sql(stage, key, foreign_keys))
+        staged = {}
+        for r, reason in cur.fetchall():
+            staged.setdefault(r, {"row": r, "reason": reason})
+        cur.execute(merge_sql(table, stage, names, key, foreign_keys, on_conflict, update_columns))
+        result["inserted"], result["updated"] = cur.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    rejects.extend(staged.values())
+    rejects.sort(key=lambda r: r["row"])
+    result["rejected"] = len(rejects)
+    result["unchanged"] = len(good) - len(staged) - result["inserted"] - result["updated"]
+    result["seconds"] = time.perf_counter() - t0
+    if progress:
+        print(f"   {table}: {result['inserted']} inserted, {result['updated']} updated, "
+              f"{result['unchanged']} unchanged, {result['rejected']} rejected "
+              f"in {result['seconds']:.2f}s")
+    return result
@@ -0,0 +1,122 @@
+"""
+End-to-end check of rag_core.answer_stream against the fake OpenAI server.
+
+Starts rag/fake_openai_server.py on a free port, points the openai client at it and
+streams one answer, failing (exit code 1) unless:
+- the answer arrives as several chunks spread over the server's token delays (really
+  streamed, not buffered into one piece);
+- time to first token is at least the server's first-token delay and within --slack-ms of
+  it, and stream_stats() reports the same number;
+- the streamed answer is handed to the answer cache once complete;
+- an answer-cache hit is streamed without touching the model TTFT samples;
+- a rate-limited server streams the rate-limit fallback instead of raising.
+
+Retrieval is skipped (a fixed context is passed as prepared=), so no index or embedding
+model is needed. tests/test_streaming.py asserts the same under pytest.
+
+Usage:
+    python -m rag.check_streaming
+    python -m rag.check_streaming --first-token-ms 500 --token-ms 30 --slack-ms 2000
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+from rag import rag_core
+from rag.fake_openai_server import Handler, serve, tokenize
+
+CONTEXTS = [{"id": 0, "source": "check_streaming", "score": 1.0, "text": "Vendor V001 sells electronics."}]
+QUERY = "Which category does vendor V001 sell?"
+
+
+def stream(query: str, prepared) -> tuple:
+    """(chunks, seconds after the start at which each chunk arrived)"""
+    t_start = time.perf_counter()
+    tokens, _ = rag_core.answer_stream(query, prepared=prepared, t_start=t_start)
+    chunks, at = [], []
+    for piece in tokens:
+        chunks.append(piece)
+        at.append(time.perf_counter() - t_start)
+    return chunks, at
+
+
+def run_checks(first_token_ms: int, token_ms: int, slack_ms: float) -> list:
+    """Failed checks, as messages (empty when everything passed)"""
+    failures = []
+
+    def check(ok: bool, message: str):
+        print(f"{'✅' if ok else '❌'} {message}")
+        if not ok:
+            failures.append(message)
+
+    server = serve(0, first_token_ms, token_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    import openai  # noqa: F401  (imported up front so it isn't counted as time to first token)
+
+    try:
+        # 1. A streamed answer
+        stored = []
+        chunks, at = stream(QUERY, (CONTEXTS, None, stored.append))
+        answer = "".join(chunks)
+        expected = len(tokenize(answer))
+        check(len(chunks) > 1, f"answer streamed as {len(chunks)} chunks (server sent {expected} tokens)")
+
+        ttft_ms = at[0] * 1000 if at else float("inf")
+        check(first_token_ms <= ttft_ms <= first_token_ms + slack_ms,
+              f"time to first token {ttft_ms:.0f} ms (server delay {first_token_ms} ms, slack {slack_ms:.0f} ms)")
+
+        spread_ms = (at[-1] - at[0]) * 1000 if at else 0
+        check(spread_ms >= 0.5 * token_ms * (expected - 1),
+              f"chunks arrived over {spread_ms:.0f} ms (≈{token_ms * (expected - 1)} ms of token delays)")
+
+        stats = rag_core.stream_stats()
+        reported = stats["last_ms"] if stats else None
+        check(reported is not None and abs(reported - ttft_ms) <= max(50.0, 0.1 * ttft_ms),
+              f"stream_stats() reports {reported if reported is None else round(reported)} ms")
+        check(stored == [answer], "full answer handed to the answer cache")
+
+        # 2. An answer-cache hit: streamed at once, kept out of the model TTFT samples
+        model_samples = stats["count"] if stats else 0
+        chunks, _ = stream(QUERY, (CONTEXTS, answer, stored.append))
+        stats = rag_core.stream_stats()
+        check(chunks == [answer] and stats["count"] == model_samples and stats["cached"] is not None,
+              f"cache hit streamed as one chunk, recorded apart ({stats['cached']['count'] if stats['cached'] else 0} cache hits)")
+
+        # 3. Rate limited: the fallback message, not an exception
+        Handler.rate_limit = True
+        try:
+            chunks, _ = stream(QUERY, (CONTEXTS, None, stored.append))
+        except Exception as e:
+            chunks = [f"raised {type(e).__name__}: {e}"]
+        finally:
+            Handler.rate_limit = False
+        check("rate-limited" in "".join(chunks), "rate-limited server streams the fallback message")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token-ms", type=int, default=300, help="fake server delay before the first token")
+    parser.add_argument("--token-ms", type=int, default=20, help="fake server delay between tokens")
+    parser.add_argument("--slack-ms", type=float, default=1500,
+                        help="allowed time to first token beyond the server delay (client setup, scheduling)")
+    args = parser.parse_args(argv)
+
+    failures = run_checks(args.first_token_ms, args.token_ms, args.slack_ms)
+    if failures:
+        print(f"\n❌ {len(failures)} streaming check(s) failed")
+        return 1
+    print("\n✅ Streaming checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
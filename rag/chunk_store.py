@@ -0,0 +1,155 @@
+"""
+Binary, memory-mapped chunk store for the RAG corpus.
+
+Replaces parsing chunks.jsonl into a list of dicts at startup: the file is mmap'ed
+read-only (so the OS page cache shares it across worker processes) and a chunk's
+strings are only decoded when that chunk is actually returned, i.e. for the top-k hits.
+
+Chunks are addressed by their vector id (the id the FAISS index returns), so the
+index can be updated incrementally without renumbering the store.
+
+File layout (little endian):
+    magic    8 bytes             b"RAGCHNK2"
+    count    uint64              number of chunks
+    ids      int64[count]        vector id of each chunk, ascending
+    offsets  uint64[3*count+1]   blob offsets of id / source / text for each chunk,
+                                 followed by the end of the blob
+    blob     UTF-8 bytes
+
+Version 1 files (b"RAGCHNK1", no ids table, vector id == position) are still readable.
+
+chunks.bin is generated, not committed: ingest.py writes it right after chunks.jsonl, and
+rag_core falls back to chunks.jsonl when chunks.bin is the older of the two.
+
+Usage:
+    python -m rag.chunk_store    # build rag/chunks.bin from rag/chunks.jsonl
+"""
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from pathlib import Path
+
+RAG_DIR = Path(__file__).resolve().parent
+CHUNKS_JSONL = RAG_DIR / "chunks.jsonl"
+CHUNKS_BIN = RAG_DIR / "chunks.bin"
+
+MAGIC = b"RAGCHNK2"
+MAGIC_V1 = b"RAGCHNK1"
+FIELDS = ("id", "source", "text")
+_HEADER = struct.Struct("<8sQ")
+_U64 = struct.Struct("<Q")
+
+
+def write_chunk_store(docs: list, path: Path = CHUNKS_BIN) -> Path:
+    """
+    Write chunks (dicts with id/source/text and optionally vid) to a binary store, atomically.
+    Chunks without a vid get their position as vector id.
+    """
+    docs = sorted(
+        ({**d, "vid": d.get("vid", i)} for i, d in enumerate(docs)),
+        key=lambda d: d["vid"],
+    )
+    ids = [int(d["vid"]) for d in docs]
+    if len(set(ids)) != len(ids):
+        raise ValueError("duplicate vector ids in chunk store")
+
+    offsets = []
+    parts = []
+    pos = 0
+    for d in docs:
+        for field in FIELDS:
+            b = str(d.get(field, "")).encode("utf-8")
+            offsets.append(pos)
+            parts.append(b)
+            pos += len(b)
+    offsets.append(pos)
+
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(docs)))
+        f.write(struct.pack(f"<{len(ids)}q", *ids))
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        for b in parts:
+            f.write(b)
+    os.replace(tmp, path)
+    return path
+
+
+class ChunkStore:
+    """Read-only, memory-mapped view of a chunk store file."""
+
+    def __init__(self, path: Path = CHUNKS_BIN):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count = _HEADER.unpack_from(self._mm, 0)
+        if magic == MAGIC:
+            ids_end = _HEADER.size + 8 * self._count
+            self._ids = memoryview(self._mm)[_HEADER.size:ids_end].cast("q")
+            self._table = ids_end
+        elif magic == MAGIC_V1:
+            self._ids = None
+            self._table = _HEADER.size
+        else:
+            raise ValueError(f"{self.path} is not a chunk store (bad magic {magic!r})")
+        self._blob = self._table + _U64.size * (len(FIELDS) * self._count + 1)
+
+    def __len__(self):
+        return self._count
+
+    def _offset(self, j: int) -> int:
+        return _U64.unpack_from(self._mm, self._table + _U64.size * j)[0]
+
+    def field(self, i: int, name: str) -> str:
+        """Decode a single field of chunk i."""
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        j = len(FIELDS) * i + FIELDS.index(name)
+        start, end = self._offset(j), self._offset(j + 1)
+        return self._mm[self._blob + start:self._blob + end].decode("utf-8")
+
+    def __getitem__(self, i: int) -> dict:
+        """Chunk i as a new dict (safe for the caller to modify)."""
+        return {name: self.field(i, name) for name in FIELDS}
+
+    def position(self, vid: int) -> int:
+        """Position of the chunk with vector id vid, or -1."""
+        if self._ids is None:
+            return vid if 0 <= vid < self._count else -1
+        i = bisect_left(self._ids, vid)
+        return i if i < self._count and self._ids[i] == vid else -1
+
+    def get(self, vid: int, default=None):
+        """Chunk with vector id vid as a new dict, or default."""
+        i = self.position(vid)
+        return self[i] if i >= 0 else default
+
+    def vids(self) -> list:
+        """Vector ids of all chunks, ascending."""
+        return self._ids.tolist() if self._ids is not None else list(range(self._count))
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self):
+        if self._ids is not None:
+            self._ids.release()  # the map can't close while a view of it is exported
+            self._ids = None
+        self._mm.close()
+
+
+def convert_jsonl(src: Path = CHUNKS_JSONL, dst: Path = CHUNKS_BIN) -> int:
+    """Build a chunk store from an existing chunks.jsonl; returns the number of chunks."""
+    with open(src, "r", encoding="utf-8") as f:
+        docs = [json.loads(line) for line in f if line.strip()]
+    write_chunk_store(docs, dst)
+    return len(docs)
+
+
+if __name__ == "__main__":
+    n = convert_jsonl()
+    print(f"✅ Saved {CHUNKS_BIN.name} ({n} chunks)")
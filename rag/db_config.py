@@ -4,6 +4,8 @@ Database configuration and connection management for Neon PostgreSQL
 import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
+from rag.db_pool import SSLMODE, PooledConnection, get_pool
+from rag.bulk_load import bulk_upsert
 
 try:
     from dotenv import load_dotenv
@@ -12,7 +14,8 @@ except Exception:
     pass
 
 # Neon connection string - check environment first, then Streamlit secrets
-def get_connection():
+def connect_new():
+    """Open a new (unpooled) connection; used by the pool in rag/db_pool.py"""
     db_url = os.getenv("DATABASE_URL")
     if not db_url:
         try:
@@ -24,7 +27,42 @@ def get_connection():
     if not db_url:
         raise RuntimeError("DATABASE_URL is not set (env var or Streamlit secrets).")
 
-    return psycopg2.connect(db_url, sslmode="require")
+    return psycopg2.connect(db_url, sslmode=SSLMODE)
+
+def get_connection():
+    """Pooled connection; close() returns it to the pool"""
+    pool = get_pool()
+    return PooledConnection(pool, pool.getconn())
+
+# Per-table high-water mark of the incremental CSV sync: newest date loaded, where in
+# the CSV the next sync can start reading, and a fingerprint of the CSV it refers to
+SYNC_STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        table_name VARCHAR(100) PRIMARY KEY,
+        watermark_date DATE,
+        file_offset BIGINT,
+        file_fingerprint VARCHAR(64),
+        lookback_days INTEGER,
+        rows_synced BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+def save_sync_state(cur, table: str, watermark_date, file_offset=None, file_fingerprint=None,
+                    lookback_days=None, rows_synced: int = 0):
+    """Record a table's sync watermark (caller commits, with the data it describes)"""
+    cur.execute(SYNC_STATE_DDL)
+    cur.execute("""
+        INSERT INTO sync_state (table_name, watermark_date, file_offset, file_fingerprint, lookback_days, rows_synced)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (table_name) DO UPDATE SET
+            watermark_date = EXCLUDED.watermark_date,
+            file_offset = EXCLUDED.file_offset,
+            file_fingerprint = EXCLUDED.file_fingerprint,
+            lookback_days = EXCLUDED.lookback_days,
+            rows_synced = EXCLUDED.rows_synced,
+            updated_at = CURRENT_TIMESTAMP
+    """, (table, watermark_date, file_offset, file_fingerprint, lookback_days, rows_synced))
 
 def init_database():
     """Initialize database schema"""
@@ -184,6 +222,26 @@ def init_database():
             );
         """)
         
+        # Composite covering indexes for the dashboard's GROUP BY queries (index-only scans)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_mdc_date_vendor ON marketplace_daily_clean(date, vendor_id)
+                INCLUDE (category, product_id, views, orders, net_revenue_usd, returns, avg_fulfillment_days);
+            CREATE INDEX IF NOT EXISTS idx_mdc_date_category ON marketplace_daily_clean(date, category)
+                INCLUDE (vendor_id, product_id, views, orders, net_revenue_usd, returns, avg_fulfillment_days);
+        """)
+        
+        # Incremental sync watermarks (rag/incremental_sync.py)
+        cur.execute(SYNC_STATE_DDL)
+        
+        # Summary tables + maintenance triggers; backfill them the first time
+        _create_summary_tables(cur)
+        cur.execute("""
+            SELECT NOT EXISTS (SELECT 1 FROM vendor_daily_summary)
+               AND EXISTS (SELECT 1 FROM marketplace_daily_clean)
+        """)
+        if cur.fetchone()[0]:
+            rebuild_summaries(cur)
+        
         cur.execute("""
             CREATE INDEX IF NOT EXISTS idx_products_raw_vendor_id ON products_raw(vendor_id);
             CREATE INDEX IF NOT EXISTS idx_products_raw_category ON products_raw(category);
@@ -201,6 +259,241 @@ def init_database():
         cur.close()
         conn.close()
 
+# ---------------------------------------------------------------------------
+# Summary tables (vendor / category / product performance)
+#
+# Kept up to date by statement-level triggers on marketplace_daily_clean that read
+# the transition tables (new_rows / old_rows). An INSERT ... ON CONFLICT DO UPDATE
+# fires both the INSERT trigger (newly inserted rows) and the UPDATE trigger (old
+# values subtracted, new values added), so upserts produce exact deltas. COPY fires
+# the INSERT trigger too, and TRUNCATE empties the summaries.
+# ---------------------------------------------------------------------------
+
+# summary column -> (SQL type, expression over a marketplace_daily_clean row)
+SUMMARY_MEASURES = {
+    "views": ("BIGINT", "COALESCE(views, 0)"),
+    "orders": ("BIGINT", "COALESCE(orders, 0)"),
+    "returns": ("BIGINT", "COALESCE(returns, 0)"),
+    "gross_revenue_usd": ("DOUBLE PRECISION", "COALESCE(gross_revenue_usd, 0)"),
+    "net_revenue_usd": ("DOUBLE PRECISION", "COALESCE(net_revenue_usd, 0)"),
+    "ad_spend_usd": ("DOUBLE PRECISION", "COALESCE(ad_spend_usd, 0)"),
+    # Averages are stored as sum + non-null count so they stay additive
+    "discount_sum": ("DOUBLE PRECISION", "COALESCE(discount_rate, 0)"),
+    "discount_n": ("BIGINT", "(discount_rate IS NOT NULL)::int"),
+    "rating_sum": ("DOUBLE PRECISION", "COALESCE(rating, 0)"),
+    "rating_n": ("BIGINT", "(rating IS NOT NULL)::int"),
+    "fulfill_sum": ("DOUBLE PRECISION", "COALESCE(avg_fulfillment_days, 0)"),
+    "fulfill_n": ("BIGINT", "(avg_fulfillment_days IS NOT NULL)::int"),
+    "row_count": ("BIGINT", "1"),
+}
+
+# summary table -> key column -> (SQL type, expression over a marketplace_daily_clean row)
+SUMMARY_TABLES = {
+    "vendor_daily_summary": {
+        "date": ("DATE", "date"),
+        "vendor_id": ("VARCHAR(50)", "vendor_id"),
+    },
+    "category_daily_summary": {
+        "date": ("DATE", "date"),
+        "category": ("VARCHAR(100)", "COALESCE(category, 'Unknown')"),
+    },
+    "product_summary": {
+        "product_id": ("VARCHAR(50)", "product_id"),
+        "vendor_id": ("VARCHAR(50)", "vendor_id"),
+        "category": ("VARCHAR(100)", "COALESCE(category, 'Unknown')"),
+        "sub_category": ("VARCHAR(100)", "COALESCE(sub_category, 'Unknown')"),
+    },
+}
+
+
+def _summary_merge_sql(table: str, source: str) -> str:
+    """
+    Add the signed rows of `source` (fact columns + a `sign` column of +1/-1) into a summary
+    table, then drop keys whose row_count reached zero.
+    """
+    keys = SUMMARY_TABLES[table]
+    key_cols = ", ".join(keys)
+    key_exprs = ", ".join(expr for _, expr in keys.values())
+    measure_cols = ", ".join(SUMMARY_MEASURES)
+    measure_exprs = ", ".join(f"SUM(sign * {expr})" for _, expr in SUMMARY_MEASURES.values())
+    updates = ", ".join(f"{m} = s.{m} + EXCLUDED.{m}" for m in SUMMARY_MEASURES)
+    key_match = " AND ".join(f"s.{k} = d.{k}" for k in keys)
+    return f"""
+        INSERT INTO {table} AS s ({key_cols}, {measure_cols})
+        SELECT {key_exprs}, {measure_exprs}
+        FROM ({source}) src
+        GROUP BY {key_exprs}
+        ON CONFLICT ({key_cols}) DO UPDATE SET {updates};
+
+        DELETE FROM {table} s
+        USING (SELECT DISTINCT {", ".join(f"{expr} AS {k}" for k, (_, expr) in keys.items())} FROM ({source}) src) d
+        WHERE {key_match} AND s.row_count <= 0;
+    """
+
+
+def _summary_merge_all_sql(source: str) -> str:
+    return "\n".join(_summary_merge_sql(t, source) for t in SUMMARY_TABLES)
+
+
+def _create_summary_tables(cur):
+    """Create the summary tables and the triggers that maintain them"""
+    for table, keys in SUMMARY_TABLES.items():
+        cols = [f"{k} {typ} NOT NULL" for k, (typ, _) in keys.items()]
+        cols += [f"{m} {typ} NOT NULL DEFAULT 0" for m, (typ, _) in SUMMARY_MEASURES.items()]
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {", ".join(cols)},
+                PRIMARY KEY ({", ".join(keys)})
+            );
+        """)
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vendor_daily_summary_vendor ON vendor_daily_summary(vendor_id);
+        CREATE INDEX IF NOT EXISTS idx_category_daily_summary_category ON category_daily_summary(category);
+    """)
+
+    insert_src = "SELECT n.*, 1 AS sign FROM new_rows n"
+    delete_src = "SELECT o.*, -1 AS sign FROM old_rows o"
+    update_src = f"{insert_src} UNION ALL {delete_src}"
+
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION marketplace_summary_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $fn$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_summary_merge_all_sql(insert_src)}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {_summary_merge_all_sql(update_src)}
+            ELSIF TG_OP = 'DELETE' THEN
+                {_summary_merge_all_sql(delete_src)}
+            END IF;
+            RETURN NULL;
+        END;
+        $fn$;
+    """)
+
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION marketplace_summary_truncate() RETURNS trigger
+        LANGUAGE plpgsql AS $fn$
+        BEGIN
+            TRUNCATE {", ".join(SUMMARY_TABLES)};
+            RETURN NULL;
+        END;
+        $fn$;
+    """)
+
+    create_summary_triggers(cur, "marketplace_daily_clean")
+
+
+def create_summary_triggers(cur, table: str):
+    """(Re)create the summary maintenance triggers on a marketplace_daily_clean table"""
+    cur.execute(f"""
+        DROP TRIGGER IF EXISTS trg_summary_insert ON {table};
+        DROP TRIGGER IF EXISTS trg_summary_update ON {table};
+        DROP TRIGGER IF EXISTS trg_summary_delete ON {table};
+        DROP TRIGGER IF EXISTS trg_summary_truncate ON {table};
+
+        CREATE TRIGGER trg_summary_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION marketplace_summary_apply();
+        CREATE TRIGGER trg_summary_update AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION marketplace_summary_apply();
+        CREATE TRIGGER trg_summary_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION marketplace_summary_apply();
+        CREATE TRIGGER trg_summary_truncate AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION marketplace_summary_truncate();
+    """)
+
+
+def rebuild_summaries(cur):
+    """Recompute all summary tables from marketplace_daily_clean (caller commits)"""
+    # SHARE mode blocks concurrent writes (and their trigger deltas) during the rebuild
+    cur.execute("LOCK TABLE marketplace_daily_clean IN SHARE MODE")
+    cur.execute(f"TRUNCATE {', '.join(SUMMARY_TABLES)}")
+    cur.execute(_summary_merge_all_sql("SELECT f.*, 1 AS sign FROM marketplace_daily_clean f"))
+
+
+def rebuild_summary_tables() -> bool:
+    """Full rebuild of the summary tables, e.g. after a backfill"""
+    conn = get_connection()
+    cur = conn.cursor()
+    
+    try:
+        rebuild_summaries(cur)
+        conn.commit()
+        print("✅ Summary tables rebuilt")
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error rebuilding summary tables: {e}")
+        return False
+    finally:
+        cur.close()
+        conn.close()
+
+def _summary_perf_sql(table: str, group_cols: list, where: str = "") -> str:
+    cols = ", ".join(group_cols)
+    return f"""
+        SELECT {cols},
+               SUM(views) AS views, SUM(orders) AS orders, SUM(returns) AS returns,
+               SUM(gross_revenue_usd) AS gross_revenue_usd, SUM(net_revenue_usd) AS net_revenue_usd,
+               SUM(ad_spend_usd) AS ad_spend_usd,
+               SUM(discount_sum) / NULLIF(SUM(discount_n), 0) AS avg_discount,
+               SUM(rating_sum) / NULLIF(SUM(rating_n), 0) AS avg_rating,
+               SUM(fulfill_sum) / NULLIF(SUM(fulfill_n), 0) AS avg_fulfillment_days,
+               SUM(orders)::float / NULLIF(SUM(views), 0) AS conversion_rate,
+               SUM(returns)::float / NULLIF(SUM(orders), 0) AS return_rate
+        FROM {table}
+        {where}
+        GROUP BY {cols}
+        ORDER BY net_revenue_usd DESC
+    """
+
+def get_vendor_performance(start_date: str = None, end_date: str = None):
+    """vendor_perf from vendor_daily_summary (optionally for a date range)"""
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        cur.execute(_summary_perf_sql(
+            "vendor_daily_summary", ["vendor_id"],
+            "WHERE date BETWEEN COALESCE(%s, '-infinity'::date) AND COALESCE(%s, 'infinity'::date)",
+        ), (start_date, end_date))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+def get_category_performance(start_date: str = None, end_date: str = None):
+    """cat_perf from category_daily_summary (optionally for a date range)"""
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        cur.execute(_summary_perf_sql(
+            "category_daily_summary", ["category"],
+            "WHERE date BETWEEN COALESCE(%s, '-infinity'::date) AND COALESCE(%s, 'infinity'::date)",
+        ), (start_date, end_date))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+def get_product_performance():
+    """prod_perf from product_summary"""
+    conn = get_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    try:
+        cur.execute(_summary_perf_sql("product_summary", ["product_id", "vendor_id", "category", "sub_category"]))
+        return cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
+
+
 def insert_vendor(vendor_id: str, vendor_tier: str, vendor_region: str, vendor_quality_score: float) -> bool:
     """Insert a vendor into the database"""
     conn = get_connection()
@@ -507,34 +800,57 @@ def insert_marketplace_daily_clean(
         cur.close()
         conn.close()
 
-def batch_insert_marketplace_daily_clean(records: list) -> int:
-    """Batch insert marketplace daily clean records for better performance"""
+# marketplace_daily_clean columns in record order -> SQL type (for bulk loads)
+MARKETPLACE_CLEAN_COLUMNS = {
+    "date": "DATE",
+    "product_id": "VARCHAR(50)",
+    "vendor_id": "VARCHAR(50)",
+    "category": "VARCHAR(100)",
+    "sub_category": "VARCHAR(100)",
+    "price_usd": "FLOAT",
+    "discount_rate": "FLOAT",
+    "ad_spend_usd": "FLOAT",
+    "views": "INTEGER",
+    "orders": "INTEGER",
+    "gross_revenue_usd": "FLOAT",
+    "returns": "INTEGER",
+    "rating": "FLOAT",
+    "rating_count": "INTEGER",
+    "stock_units": "INTEGER",
+    "avg_fulfillment_days": "FLOAT",
+    "conversion_rate": "FLOAT",
+    "return_rate": "FLOAT",
+    "net_revenue_usd": "FLOAT",
+}
+MARKETPLACE_KEY = ["date", "product_id", "vendor_id"]
+
+def bulk_upsert_marketplace_daily_clean(records, on_conflict: str = "skip", batch_size: int = 50_000,
+                                        verbose: bool = False) -> dict:
+    """
+    COPY records (tuples in MARKETPLACE_CLEAN_COLUMNS order, or dicts) into a staging
+    table and merge them in one statement per batch; see rag/bulk_load.py.
+    on_conflict: "skip" keeps existing rows, "update" overwrites them.
+    Returns row counts per batch and in total, plus the rejected rows and why.
+    """
     conn = get_connection()
-    cur = conn.cursor()
-    
-    inserted_count = 0
     try:
-        for record in records:
-            cur.execute("""
-                INSERT INTO marketplace_daily_clean 
-                (date, product_id, vendor_id, category, sub_category, price_usd, discount_rate, ad_spend_usd,
-                 views, orders, gross_revenue_usd, returns, rating, rating_count, stock_units, avg_fulfillment_days,
-                 conversion_rate, return_rate, net_revenue_usd)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (date, product_id, vendor_id) DO NOTHING
-            """, record)
-            inserted_count += cur.rowcount
-        
-        conn.commit()
-        return inserted_count
-    except Exception as e:
-        conn.rollback()
-        print(f"Error in batch insert: {e}")
-        return 0
+        return bulk_upsert(
+            conn, "marketplace_daily_clean", MARKETPLACE_CLEAN_COLUMNS, MARKETPLACE_KEY, records,
+            on_conflict=on_conflict, foreign_keys={"vendor_id": ("vendors", "vendor_id")},
+            batch_size=batch_size, verbose=verbose,
+        )
     finally:
-        cur.close()
         conn.close()
 
+def batch_insert_marketplace_daily_clean(records: list) -> int:
+    """Batch insert marketplace daily clean records (existing keys are kept); returns rows inserted"""
+    result = bulk_upsert_marketplace_daily_clean(records, on_conflict="skip")
+    if result["rejected"] or result["failed"]:
+        print(f"Batch insert: {result['rejected']} rows rejected, {result['failed']} failed")
+        for r in result["rejects"][:10]:
+            print(f"   row {r['row']}: {r['reason']}")
+    return result["inserted"]
+
 def insert_marketplace_daily_raw(date: str, product_id: str, vendor_id: str, category: str, sub_category: str,
                                   price_usd: float, discount_rate: float, ad_spend_usd: float, views: int, orders: int,
                                   gross_revenue_usd: float, returns: int, rating: float, rating_count: int,
@@ -564,4 +880,8 @@ def insert_marketplace_daily_raw(date: str, product_id: str, vendor_id: str, cat
         conn.close()
 
 if __name__ == "__main__":
-    init_database()
+    import sys
+    if "rebuild-summaries" in sys.argv[1:]:
+        rebuild_summary_tables()
+    else:
+        init_database()
@@ -0,0 +1,293 @@
+"""
+Process-wide, thread-safe Postgres connection pool.
+
+Opening a connection to a remote (TLS) Postgres costs tens to hundreds of ms, so the
+db_config helpers and the dashboard's Postgres source borrow connections from here
+instead of connecting per query:
+
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        ...
+        conn.commit()
+
+db_config.get_connection() hands out the same pooled connections behind a proxy whose
+close() returns them, so `conn = get_connection() ... finally: conn.close()` code pools
+too. DB_POOL_MIN connections are opened when the pool is created (the first query of
+the process); idle pruning never goes below them.
+
+On return a connection with an open or failed transaction is rolled back, and a broken
+one is discarded. Connections idle longer than a health-check interval are pinged
+(SELECT 1) before being handed out, idle ones beyond the minimum are closed after
+DB_POOL_MAX_IDLE, and every connection is recycled after DB_POOL_MAX_LIFETIME.
+
+Configuration (env):
+    DB_POOL_MIN=1  DB_POOL_MAX=10  DB_POOL_TIMEOUT=30  DB_POOL_MAX_IDLE=300
+    DB_POOL_MAX_LIFETIME=1800  DB_POOL_HEALTHCHECK_AFTER=30  DB_SSLMODE=require
+(DB_SSLMODE=disable for a local Postgres.)
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+MAX_IDLE_S = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+MAX_LIFETIME_S = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+HEALTHCHECK_AFTER_S = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))
+SSLMODE = os.getenv("DB_SSLMODE", "require")
+
+
+class PoolTimeout(RuntimeError):
+    """No connection became available within the pool timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections guarded by a Condition."""
+
+    def __init__(self, connect, minconn: int = POOL_MIN, maxconn: int = POOL_MAX, timeout: float = POOL_TIMEOUT,
+                 max_idle: float = MAX_IDLE_S, max_lifetime: float = MAX_LIFETIME_S,
+                 healthcheck_after: float = HEALTHCHECK_AFTER_S):
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.healthcheck_after = healthcheck_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()        # (conn, created_at, returned_at), most recently returned last
+        self._created_at = {}       # id(conn) -> creation time, for checked-out connections too
+        self._size = 0              # open connections (idle + checked out)
+
+        self.checkouts = 0
+        self.created = 0
+        self.closed = 0
+        self.health_failures = 0
+        self.wait_s_total = 0.0
+        self.wait_s_max = 0.0
+        self.timeouts = 0
+
+    # -- internals (caller holds the condition unless noted) --
+
+    def _close(self, conn):
+        self._size -= 1
+        self.closed += 1
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _prune_idle(self, now: float):
+        """Close idle connections past max_idle (keeping minconn) or past max_lifetime."""
+        kept = deque()
+        while self._idle:
+            conn, created_at, returned_at = self._idle.popleft()
+            too_old = now - created_at > self.max_lifetime
+            too_idle = now - returned_at > self.max_idle and self._size > self.minconn
+            if too_old or too_idle or conn.closed:
+                self._close(conn)
+            else:
+                kept.append((conn, created_at, returned_at))
+        self._idle = kept
+
+    def _healthy(self, conn) -> bool:
+        """Round trip on a connection that sat idle for a while (called without the lock)."""
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # -- public API --
+
+    def prefill(self):
+        """Open connections until the pool holds minconn (all idle, ready to hand out)."""
+        while True:
+            with self._cond:
+                if self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                now = time.monotonic()
+                self.created += 1
+                self._created_at[id(conn)] = now
+                self._idle.append((conn, now, now))
+                self._cond.notify()
+
+    def getconn(self, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        t0 = time.monotonic()
+        deadline = t0 + timeout
+        while True:
+            with self._cond:
+                self._prune_idle(time.monotonic())
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"no database connection available within {timeout:.0f}s (max {self.maxconn})")
+                    self._cond.wait(remaining)
+                    self._prune_idle(time.monotonic())
+
+                if self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                else:
+                    conn, created_at, returned_at = None, None, None
+                    self._size += 1  # reserve the slot before connecting outside the lock
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.created += 1
+                    self._created_at[id(conn)] = time.monotonic()
+            elif time.monotonic() - returned_at > self.healthcheck_after and not self._healthy(conn):
+                with self._cond:
+                    self.health_failures += 1
+                    self._close(conn)
+                continue
+
+            with self._cond:
+                waited = time.monotonic() - t0
+                self.checkouts += 1
+                self.wait_s_total += waited
+                self.wait_s_max = max(self.wait_s_max, waited)
+            return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Return a connection; open/failed transactions are rolled back, broken ones dropped."""
+        if not discard and not conn.closed:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+
+        with self._cond:
+            created_at = self._created_at.get(id(conn), time.monotonic())
+            if discard or conn.closed or time.monotonic() - created_at > self.max_lifetime:
+                self._close(conn)
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.putconn(conn, discard=conn.closed != 0)
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self.putconn(conn)
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                self._close(self._idle.popleft()[0])
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min": self.minconn,
+                "max": self.maxconn,
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "closed": self.closed,
+                "health_failures": self.health_failures,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": (self.wait_s_total / self.checkouts * 1000) if self.checkouts else 0.0,
+                "wait_ms_max": self.wait_s_max * 1000,
+            }
+
+
+class PooledConnection:
+    """
+    A pooled psycopg2 connection that goes back to the pool on close(), so code written
+    as `conn = get_connection() ... finally: conn.close()` reuses connections unchanged.
+    """
+
+    def __init__(self, pool: ConnectionPool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.putconn(self._conn)
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same transaction semantics as psycopg2's connection context manager
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+        return False
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(connect=None) -> ConnectionPool:
+    """The process-wide pool (recreated after fork; connections can't be shared across processes)."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if connect is None:
+                from rag.db_config import connect_new
+                connect = connect_new
+            pool = ConnectionPool(connect)
+            pool.prefill()
+            _pool, _pool_pid = pool, os.getpid()
+        return _pool
+
+
+def pooled_connection(timeout: float = None):
+    """Context manager: borrow a connection from the process-wide pool."""
+    return get_pool().connection(timeout)
+
+
+def pool_stats() -> dict:
+    """Pool counters for monitoring (size, checkouts, creations, wait times...)."""
+    return get_pool().stats()
@@ -0,0 +1,152 @@
+"""
+Pluggable sentence-embedding backends for all-MiniLM-L6-v2.
+
+    torch      sentence-transformers on PyTorch (the original path)
+    onnx       the same model exported to ONNX, run with ONNX Runtime (no torch at runtime)
+    onnx-int8  the ONNX model with dynamically quantized int8 weights
+
+Select with RAG_EMBED_BACKEND (default torch). Every backend returns L2-normalized
+float32 vectors of the same dimension, so an index built with one can be queried
+with another; tests/test_embeddings_parity.py and rag/bench_embeddings.py check
+that they agree. ingest.py records the backend and rebuilds the index when it changes.
+
+The ONNX files are produced once (needs torch + transformers, e.g. on a build host):
+    python -m rag.embeddings export
+which writes rag/models/all-MiniLM-L6-v2/{model.onnx, model_int8.onnx, tokenizer.json}.
+"""
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+RAG_DIR = Path(__file__).resolve().parent
+MODEL_NAME = "all-MiniLM-L6-v2"
+HF_MODEL = f"sentence-transformers/{MODEL_NAME}"
+ONNX_DIR = RAG_DIR / "models" / MODEL_NAME
+MAX_SEQ_LENGTH = 256  # as configured for all-MiniLM-L6-v2 in sentence-transformers
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_BACKEND = os.getenv("RAG_EMBED_BACKEND", "torch")
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return (x / np.maximum(norms, 1e-12)).astype("float32")
+
+
+class TorchEmbedder:
+    """sentence-transformers / PyTorch backend."""
+
+    name = "torch"
+
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(MODEL_NAME)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: list, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        vectors = self.model.encode(
+            texts, batch_size=batch_size, normalize_embeddings=True, show_progress_bar=show_progress_bar,
+        )
+        return np.asarray(vectors, dtype="float32")
+
+    def nbytes(self) -> int:
+        return sum(p.numel() * p.element_size() for p in self.model.parameters())
+
+
+class OnnxEmbedder:
+    """ONNX Runtime backend: tokenizer + transformer + mean pooling, without torch."""
+
+    def __init__(self, quantized: bool = False):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.name = "onnx-int8" if quantized else "onnx"
+        self.path = ONNX_DIR / ("model_int8.onnx" if quantized else "model.onnx")
+        if not self.path.exists():
+            raise FileNotFoundError(f"{self.path} not found; run `python -m rag.embeddings export` first")
+
+        self.tokenizer = Tokenizer.from_file(str(ONNX_DIR / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        opts = ort.SessionOptions()
+        threads = int(os.getenv("RAG_ONNX_THREADS", "0"))
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(self.path), opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def _encode_batch(self, texts: list) -> np.ndarray:
+        enc = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in enc], dtype="int64"),
+            "attention_mask": np.array([e.attention_mask for e in enc], dtype="int64"),
+            "token_type_ids": np.array([e.type_ids for e in enc], dtype="int64"),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+        # Mean pooling over real tokens (what the sentence-transformers model does)
+        mask = feeds["attention_mask"][..., None].astype("float32")
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def encode(self, texts: list, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        out = []
+        for start in range(0, len(texts), batch_size):
+            out.append(self._encode_batch(texts[start:start + batch_size]))
+            if show_progress_bar:
+                print(f"\rEmbedded {min(start + batch_size, len(texts))}/{len(texts)}", end="", file=sys.stderr)
+        if show_progress_bar:
+            print(file=sys.stderr)
+        return _normalize(np.vstack(out)) if out else np.zeros((0, self.dim), dtype="float32")
+
+    def nbytes(self) -> int:
+        return self.path.stat().st_size
+
+
+def load_embedder(backend: str = None):
+    """Embedding backend by name (RAG_EMBED_BACKEND when not given)."""
+    backend = backend or DEFAULT_BACKEND
+    if backend == "torch":
+        return TorchEmbedder()
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbedder(quantized=backend == "onnx-int8")
+    raise ValueError(f"RAG_EMBED_BACKEND must be one of {BACKENDS}, got {backend!r}")
+
+
+def export_onnx(out_dir: Path = ONNX_DIR):
+    """Export the transformer to ONNX and write an int8 dynamically quantized copy."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL)
+    model = AutoModel.from_pretrained(HF_MODEL).eval()
+    tokenizer.backend_tokenizer.save(str(out_dir / "tokenizer.json"))
+
+    sample = tokenizer(["an example sentence"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {"batch": 0, "seq": 1}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in names),
+            str(out_dir / "model.onnx"),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{n: dynamic for n in names}, "last_hidden_state": dynamic},
+            opset_version=17,
+        )
+    quantize_dynamic(str(out_dir / "model.onnx"), str(out_dir / "model_int8.onnx"), weight_type=QuantType.QInt8)
+
+    for name in ("model.onnx", "model_int8.onnx"):
+        print(f"✅ {out_dir / name} ({(out_dir / name).stat().st_size / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["export"]:
+        export_onnx()
+    else:
+        print(__doc__)
@@ -0,0 +1,121 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Serves POST /v1/chat/completions with a canned, deterministic answer, either as one
+JSON response or (stream=true) as server-sent events with a configurable delay before
+the first token and between tokens. Intent-classification prompts get a JSON intent.
+Point the app at it through the openai client's OPENAI_BASE_URL:
+
+    python -m rag.fake_openai_server --port 8765 --first-token-ms 300 --token-ms 20
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake streamlit run app.py
+
+--rate-limit makes every request fail with HTTP 429 (the app's RateLimitError path).
+`python -m rag.check_streaming` runs rag_core.answer_stream against it and checks the
+chunking and time to first token.
+"""
+import argparse
+import json
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_answer(messages: list) -> str:
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    if "intent classifier" in system:
+        return json.dumps({"intent": "qa", "confidence": 0.5, "reason": "fake server"})
+
+    question = re.search(r"Question:\s*(.+)", user)
+    question = question.group(1).strip() if question else user.strip()[:200]
+    n_sources = len(re.findall(r"^\[\d+\] Source:", user, flags=re.M))
+    cites = " ".join(f"[{i}]" for i in range(1, n_sources + 1)) or "(no sources)"
+    return (
+        f"- This is a canned answer to: {question}\n"
+        f"- It is produced by the local fake completion server, not a model {cites}\n"
+        f"- Each word arrives as a separate streamed token so the UI renders incrementally"
+    )
+
+
+def tokenize(text: str) -> list:
+    """Split into word-sized pieces, keeping the whitespace (like real token deltas)."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class Handler(BaseHTTPRequestHandler):
+    first_token_ms = 300
+    token_ms = 20
+    rate_limit = False
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+        if self.rate_limit:
+            return self._json(429, {"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_exceeded"}})
+
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = req.get("model", "gpt-4o-mini")
+        text = fake_answer(req.get("messages", []))
+        completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not req.get("stream"):
+            time.sleep((self.first_token_ms + self.token_ms * len(tokenize(text))) / 1000)
+            return self._json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send(delta: dict, finish_reason=None):
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send({"role": "assistant", "content": ""})
+        time.sleep(self.first_token_ms / 1000)
+        for i, piece in enumerate(tokenize(text)):
+            if i:
+                time.sleep(self.token_ms / 1000)
+            send({"content": piece})
+        send({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def serve(port: int = 8765, first_token_ms: int = 300, token_ms: int = 20, rate_limit: bool = False):
+    Handler.first_token_ms = first_token_ms
+    Handler.token_ms = token_ms
+    Handler.rate_limit = rate_limit
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"✅ Fake OpenAI server on http://127.0.0.1:{server.server_port}/v1")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=int, default=300)
+    parser.add_argument("--token-ms", type=int, default=20)
+    parser.add_argument("--rate-limit", action="store_true")
+    args = parser.parse_args()
+    serve(args.port, args.first_token_ms, args.token_ms, args.rate_limit).serve_forever()
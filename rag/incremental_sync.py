@@ -0,0 +1,216 @@
+"""
+Watermark-based incremental sync of the daily fact tables from their CSVs.
+
+Instead of reloading the whole history, each sync sends only the rows dated on or after
+
+    since = watermark_date - lookback_days
+
+and upserts them on UNIQUE(date, product_id, vendor_id). Rows inside the lookback
+window are re-sent so late corrections are applied. Rows whose values didn't change
+are left alone, so the summary triggers only see real changes. The new watermark is
+saved in sync_state in the same transaction as the rows it describes.
+
+The CSVs are appended to in date order. While that holds, sync_state.file_offset
+remembers the byte offset of the first row the next sync needs. A daily refresh then
+seeks straight there instead of scanning the file from the top. The offset is only
+trusted when the CSV still starts with the same bytes (file_fingerprint), the lookback
+is no longer than last time, and the rows were in date order. Otherwise the whole
+file is scanned, still sending only rows from `since` on.
+
+Usage:
+    python -m rag.incremental_sync marketplace_daily_clean synthetic_marketplace_daily_clean.csv
+    python -m rag.incremental_sync marketplace_daily_raw synthetic_marketplace_daily_raw.csv --lookback-days 3
+
+Configuration (env): SYNC_LOOKBACK_DAYS=7
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from rag.bulk_load import coerce_value, column_kind, create_stage, merge_sql, staged_rejects_sql
+from rag.db_config import SYNC_STATE_DDL, save_sync_state
+from rag.db_pool import pooled_connection
+from rag.parallel_copy import COPY_READ_BYTES, TABLES, CsvStream
+
+LOOKBACK_DAYS = int(os.getenv("SYNC_LOOKBACK_DAYS", "7"))
+FINGERPRINT_BYTES = 64 * 1024
+KEY = ["date", "product_id", "vendor_id"]
+VENDOR_FK = {"vendor_id": ("vendors", "vendor_id")}
+
+
+def fingerprint(csv_path: Path) -> str:
+    """sha1 of the first FINGERPRINT_BYTES: unchanged while the CSV is only appended to."""
+    with open(csv_path, "rb") as f:
+        return hashlib.sha1(f.read(FINGERPRINT_BYTES)).hexdigest()
+
+
+def load_state(cur, table: str) -> dict:
+    cur.execute(SYNC_STATE_DDL)
+    cur.execute("""
+        SELECT watermark_date, file_offset, file_fingerprint, lookback_days, rows_synced
+        FROM sync_state WHERE table_name = %s
+    """, (table,))
+    row = cur.fetchone()
+    keys = ("watermark_date", "file_offset", "file_fingerprint", "lookback_days", "rows_synced")
+    return dict(zip(keys, row)) if row else {}
+
+
+def scan_rows(csv_path: Path, spec: dict, since, start_offset: int, stats: dict):
+    """
+    Coerced rows (row_no first) dated on or after `since`, reading from start_offset.
+    Tracks in stats: the newest date, the first byte offset of each date seen, whether
+    dates were in order, and rejected rows.
+    """
+    columns = spec["columns"]
+    kinds = [column_kind(t) for t in columns.values()]
+    zero_fill = {i for i, c in enumerate(columns) if c in spec["zero_fill"]}
+    since_iso = since.isoformat() if since else ""
+
+    with open(csv_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        try:
+            positions = [header.index(c) for c in columns]
+        except ValueError as e:
+            raise ValueError(f"{csv_path.name}: missing column ({e})") from None
+        date_pos = header.index("date")
+        if start_offset:
+            f.seek(start_offset)
+
+        last_day = None
+        row_no = 0
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            text = line.decode("utf-8")
+            # Dates are ISO strings: compare the raw field before parsing the whole row
+            if date_pos == 0:
+                day = text.split(",", 1)[0].strip('"')[:10]
+                record = None
+            else:
+                record = next(csv.reader([text]), None)
+                if not record:
+                    continue
+                day = record[date_pos][:10]
+            if not day:
+                continue
+            if last_day is not None and day < last_day:
+                stats["sorted"] = False
+            last_day = day
+            if day < since_iso:
+                continue
+            stats["day_offsets"].setdefault(day, offset)
+
+            record = record or next(csv.reader([text]))
+            try:
+                row = [coerce_value(record[p], kind) for p, kind in zip(positions, kinds)]
+            except (ValueError, IndexError) as e:
+                stats["rejected"] += 1
+                if len(stats["reasons"]) < 5:
+                    stats["reasons"].append(f"byte {offset}: {e}")
+                continue
+            for i in zero_fill:
+                if row[i] is None:
+                    row[i] = 0
+            if stats["max_date"] is None or row[0] > stats["max_date"]:
+                stats["max_date"] = row[0]
+            stats["rows"] += 1
+            yield [row_no] + row
+            row_no += 1
+
+
+def sync_csv(table: str, csv_path, lookback_days: int = LOOKBACK_DAYS) -> bool:
+    """Upsert the CSV rows newer than the table's watermark (minus the lookback); True on success."""
+    if table not in TABLES:
+        raise ValueError(f"table must be one of {list(TABLES)}, got {table!r}")
+    spec = TABLES[table]
+    if list(spec["columns"])[0] != "date":
+        raise ValueError(f"{table}: the first column must be date")
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        print(f"❌ CSV not found: {csv_path}")
+        return False
+
+    t0 = time.perf_counter()
+    fp = fingerprint(csv_path)
+    stage = f"_stage_{table}"
+    names = list(spec["columns"])
+    stats = {"rows": 0, "rejected": 0, "reasons": [], "max_date": None, "day_offsets": {}, "sorted": True}
+
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            # One sync per table at a time; released at commit / rollback
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"sync_state:{table}",))
+            state = load_state(cur, table)
+            watermark = state.get("watermark_date")
+            since = watermark - timedelta(days=lookback_days) if watermark else None
+
+            start_offset = 0
+            if (state.get("file_offset") and state.get("file_fingerprint") == fp
+                    and lookback_days <= (state.get("lookback_days") or 0)
+                    and state["file_offset"] <= csv_path.stat().st_size):
+                start_offset = state["file_offset"]
+            print(f"🔄 Syncing {csv_path.name} into {table}: rows from {since or 'the beginning'} "
+                  f"(watermark {watermark or 'none'}, lookback {lookback_days}d), "
+                  f"{'from byte ' + str(start_offset) if start_offset else 'scanning the whole file'}")
+
+            create_stage(cur, stage, spec["columns"])
+            cur.copy_expert(
+                f"COPY {stage} (row_no, {', '.join(names)}) FROM STDIN WITH (FORMAT csv)",
+                CsvStream(scan_rows(csv_path, spec, since, start_offset, stats)),
+                size=COPY_READ_BYTES,
+            )
+            cur.execute(staged_rejects_sql(stage, KEY, VENDOR_FK))
+            staged_rejects = {row_no for row_no, _ in cur.fetchall()}
+            cur.execute(merge_sql(table, stage, names, KEY, VENDOR_FK, "update"))
+            inserted, updated = cur.fetchone()
+
+            dates = [d for d in (watermark, stats["max_date"]) if d]
+            new_watermark = max(dates) if dates else None
+            next_offset = None
+            if stats["sorted"] and new_watermark:
+                next_since = (new_watermark - timedelta(days=lookback_days)).isoformat()
+                offsets = [o for day, o in stats["day_offsets"].items() if day >= next_since]
+                # Nothing new since the last sync: the previous offset still holds
+                next_offset = min(offsets) if offsets else (start_offset or None)
+            save_sync_state(cur, table, new_watermark, next_offset, fp, lookback_days,
+                            (state.get("rows_synced") or 0) + inserted)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Incremental sync of {table} failed, nothing changed: {type(e).__name__}: {e}")
+            return False
+        finally:
+            cur.close()
+
+    for reason in stats["reasons"]:
+        print(f"   ⚠️  {reason}")
+    rejected = stats["rejected"] + len(staged_rejects)
+    unchanged = stats["rows"] - len(staged_rejects) - inserted - updated
+    print(f"✅ {table}: {inserted} inserted, {updated} updated, {unchanged} unchanged, {rejected} rejected; "
+          f"watermark {new_watermark} ({time.perf_counter() - t0:.1f}s)")
+    if staged_rejects:
+        print(f"   ⚠️  {len(staged_rejects)} rows had an unknown vendor_id or a duplicate key; rows older than "
+              f"the lookback window are not retried")
+    return True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", choices=list(TABLES))
+    parser.add_argument("csv", type=Path)
+    parser.add_argument("--lookback-days", type=int, default=LOOKBACK_DAYS,
+                        help="re-send rows this many days before the watermark (late corrections)")
+    args = parser.parse_args(argv)
+    return 0 if sync_csv(args.table, args.csv, args.lookback_days) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
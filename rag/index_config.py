@@ -0,0 +1,155 @@
+"""
+FAISS index types for the RAG corpus and their persisted settings.
+
+ingest.py builds one of:
+    flat      exact inner-product search (IndexFlatIP, the original behaviour)
+    ivf_flat  inverted lists over full vectors          (search knob: nprobe)
+    ivf_pq    inverted lists over product-quantized codes (search knob: nprobe)
+    hnsw      HNSW graph                                  (search knob: efSearch)
+
+The build and search settings are written to rag/index_params.json next to
+index.faiss; rag_core applies them when it loads the index, so retrieval picks up
+whatever ingest built. RAG_NPROBE / RAG_EF_SEARCH override the search knobs at runtime.
+
+Indexes built with explicit vector ids (what ingest does) are ID-mapped: flat and HNSW
+are wrapped in IndexIDMap2, IVF indexes take the ids natively. update_index() then
+removes / adds vectors by id so re-ingestion only touches what changed.
+"""
+import json
+import os
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+RAG_DIR = Path(__file__).resolve().parent
+PARAMS_FILE = RAG_DIR / "index_params.json"
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+DEFAULTS = {
+    "index_type": os.getenv("RAG_INDEX_TYPE", "flat"),
+    "nlist": int(os.getenv("RAG_NLIST", "1024")),
+    "pq_m": int(os.getenv("RAG_PQ_M", "48")),        # sub-quantizers; must divide the embedding dim (384)
+    "pq_bits": int(os.getenv("RAG_PQ_BITS", "8")),
+    "hnsw_m": int(os.getenv("RAG_HNSW_M", "32")),
+    "ef_construction": int(os.getenv("RAG_EF_CONSTRUCTION", "200")),
+    "nprobe": int(os.getenv("RAG_NPROBE", "16")),
+    "ef_search": int(os.getenv("RAG_EF_SEARCH", "64")),
+}
+
+# faiss wants ~39 training points per IVF centroid
+_MIN_POINTS_PER_CENTROID = 39
+
+
+def effective_nlist(nlist: int, n: int) -> int:
+    """Clamp nlist so small corpora still have enough training points per list."""
+    return max(1, min(nlist, n // _MIN_POINTS_PER_CENTROID))
+
+
+def build_index(vectors: np.ndarray, params: dict = None, ids: np.ndarray = None):
+    """
+    Build (train + add) an inner-product index over normalized vectors.
+    With ids, the index is ID-mapped and search returns those ids instead of positions.
+
+    Returns:
+        (index, params) where params is the resolved configuration to persist.
+    """
+    params = {**DEFAULTS, **(params or {})}
+    kind = params["index_type"]
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"index_type must be one of {INDEX_TYPES}, got {kind!r}")
+
+    n, dim = vectors.shape
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if kind == "ivf_pq" and n < (1 << params["pq_bits"]):
+        print(f"[WARN] {n} vectors are too few to train PQ{params['pq_m']}x{params['pq_bits']}; using flat")
+        kind = "flat"
+    if kind == "ivf_pq" and dim % params["pq_m"]:
+        raise ValueError(f"pq_m={params['pq_m']} must divide the embedding dim {dim}")
+
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "ivf_flat":
+        params["nlist"] = effective_nlist(params["nlist"], n)
+        index = faiss.index_factory(dim, f"IVF{params['nlist']},Flat", metric)
+    elif kind == "ivf_pq":
+        params["nlist"] = effective_nlist(params["nlist"], n)
+        index = faiss.index_factory(dim, f"IVF{params['nlist']},PQ{params['pq_m']}x{params['pq_bits']}", metric)
+    else:
+        index = faiss.index_factory(dim, f"HNSW{params['hnsw_m']},Flat", metric)
+        index.hnsw.efConstruction = params["ef_construction"]
+
+    if ids is not None and kind in ("flat", "hnsw"):
+        index = faiss.IndexIDMap2(index)
+
+    if not index.is_trained:
+        index.train(vectors)
+    if ids is None:
+        index.add(vectors)
+    else:
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+
+    params.update({"index_type": kind, "dim": dim, "ntotal": int(index.ntotal), "id_mapped": ids is not None})
+    apply_search_params(index, params)
+    return index, params
+
+
+def apply_search_params(index, params: dict):
+    """Set nprobe / efSearch on a loaded index according to its params."""
+    kind = params.get("index_type", "flat")
+    if kind in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = int(params.get("nprobe", DEFAULTS["nprobe"]))
+    elif kind == "hnsw":
+        hnsw_index = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+        hnsw_index.hnsw.efSearch = int(params.get("ef_search", DEFAULTS["ef_search"]))
+
+
+def update_index(index, params: dict, vectors: np.ndarray = None, ids: np.ndarray = None, remove_ids=()):
+    """
+    Remove vectors by id, then add new ones, on an index built with ids.
+
+    HNSW graphs can't delete nodes, so when there are removals the kept vectors are
+    read back from the index and the graph is rebuilt (no re-embedding needed).
+    IVF lists keep the centroids they were trained with; rebuild from scratch
+    (ingest --full) once the corpus has grown or drifted a lot.
+    """
+    remove_ids = np.asarray(list(remove_ids), dtype="int64")
+
+    if len(remove_ids) and params["index_type"] == "hnsw":
+        all_ids = faiss.vector_to_array(index.id_map)
+        all_vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+        keep = ~np.isin(all_ids, remove_ids)
+        kept_ids, kept_vectors = all_ids[keep], all_vectors[keep]
+        if vectors is not None and len(vectors):
+            kept_ids = np.concatenate([kept_ids, np.asarray(ids, dtype="int64")])
+            kept_vectors = np.vstack([kept_vectors, vectors])
+        index, rebuilt = build_index(kept_vectors, params, ids=kept_ids)
+        params.update(rebuilt)
+        return index
+
+    if len(remove_ids):
+        index.remove_ids(remove_ids)
+    if vectors is not None and len(vectors):
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    params["ntotal"] = int(index.ntotal)
+    return index
+
+
+def save_params(params: dict, path: Path = PARAMS_FILE):
+    tmp = Path(str(path) + ".tmp")
+    tmp.write_text(json.dumps(params, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_params(path: Path = PARAMS_FILE) -> dict:
+    """Persisted params (flat if the index predates index_params.json), with env overrides."""
+    params = {"index_type": "flat"}
+    if path.exists():
+        params.update(json.loads(path.read_text(encoding="utf-8")))
+    if os.getenv("RAG_NPROBE"):
+        params["nprobe"] = int(os.environ["RAG_NPROBE"])
+    if os.getenv("RAG_EF_SEARCH"):
+        params["ef_search"] = int(os.environ["RAG_EF_SEARCH"])
+    return params
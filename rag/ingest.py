@@ -1,13 +1,42 @@
+"""
+Chunk, embed and index the sources listed in rag/data_sources.txt.
+
+Ingestion is incremental: rag/ingest_manifest.json records a content hash per source
+and per chunk, together with the chunk's vector id. On the next run unchanged sources
+are skipped without being read, changed sources are re-chunked and only chunks whose
+text is new are embedded; vectors of chunks that disappeared are removed from the
+ID-mapped index. The index, chunk store, params and manifest are then swapped in
+atomically (os.replace), so readers never see a half-written file.
+
+A full rebuild happens with --full, on the first run, or when the model, the embedding
+backend (RAG_EMBED_BACKEND), chunking or index build settings changed, so vectors from
+different backends never share an index.
+
+Usage:
+    python -m rag.ingest
+    python -m rag.ingest --index-type hnsw --full
+"""
 import os
+import sys
 import json
+import hashlib
+import argparse
+from collections import defaultdict
 import pandas as pd
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 import faiss
+from rag.chunk_store import ChunkStore, write_chunk_store
+from rag.embeddings import DEFAULT_BACKEND as EMBED_BACKEND
+from rag.index_config import DEFAULTS, INDEX_TYPES, build_index, update_index, save_params
+from rag.live_index import compact_journal
 
 ROOT = Path(__file__).resolve().parents[1]
 RAG_DIR = ROOT / "rag"
 SOURCES_FILE = RAG_DIR / "data_sources.txt"
+INDEX_FILE = RAG_DIR / "index.faiss"
+CHUNKS_BIN = RAG_DIR / "chunks.bin"
+PARAMS_FILE = RAG_DIR / "index_params.json"
+MANIFEST_FILE = RAG_DIR / "ingest_manifest.json"
 
 MODEL_NAME = "all-MiniLM-L6-v2"  # small, fast, good for RAG
 CHUNK_SIZE = 800
@@ -51,44 +80,206 @@ def chunk_text(text: str, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
             break
     return chunks
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chunk, embed and index the RAG sources")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=DEFAULTS["index_type"])
+    parser.add_argument("--nlist", type=int, default=DEFAULTS["nlist"], help="IVF lists (clamped to the corpus size)")
+    parser.add_argument("--pq-m", type=int, default=DEFAULTS["pq_m"], help="PQ sub-quantizers (ivf_pq)")
+    parser.add_argument("--pq-bits", type=int, default=DEFAULTS["pq_bits"], help="bits per PQ code (ivf_pq)")
+    parser.add_argument("--hnsw-m", type=int, default=DEFAULTS["hnsw_m"], help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int, default=DEFAULTS["ef_construction"])
+    parser.add_argument("--nprobe", type=int, default=DEFAULTS["nprobe"], help="IVF lists searched per query")
+    parser.add_argument("--ef-search", type=int, default=DEFAULTS["ef_search"], help="HNSW search breadth")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-embed everything")
+    return parser.parse_args(argv)
+
+# Settings that change what gets built; any difference forces a full rebuild
+BUILD_KEYS = ("index_type", "nlist", "pq_m", "pq_bits", "hnsw_m", "ef_construction")
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def load_manifest():
+    if not MANIFEST_FILE.exists():
+        return None
+    return json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+
+def write_json(path: Path, data: dict):
+    tmp = Path(str(path) + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+def full_rebuild_reason(manifest, build: dict):
+    """Why the manifest can't be used incrementally (None if it can)."""
+    if manifest is None:
+        return "no manifest"
+    if not INDEX_FILE.exists() or not CHUNKS_BIN.exists() or not PARAMS_FILE.exists():
+        return "index files missing"
+    if (manifest["model"], manifest["chunk_size"], manifest["chunk_overlap"]) != (MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP):
+        return "model or chunking changed"
+    # Manifests from before the ONNX backends were all embedded with torch
+    if manifest.get("embed_backend", "torch") != EMBED_BACKEND:
+        return f"embedding backend changed ({manifest.get('embed_backend', 'torch')} -> {EMBED_BACKEND})"
+    if manifest["build"] != build:
+        return "index build settings changed"
+    params = json.loads(PARAMS_FILE.read_text(encoding="utf-8"))
+    if params.get("version") != manifest.get("index_version"):
+        return "index and manifest out of sync"
+    return None
+
+def index_version(docs: list) -> str:
+    """Content stamp of the indexed corpus (used to invalidate caches built on it)."""
+    h = hashlib.sha1()
+    for d in sorted(docs, key=lambda d: d["vid"]):
+        h.update(f"{d['vid']}\t{d['id']}\t{d['hash']}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def embed(texts: list):
+    # Same backend as query time (RAG_EMBED_BACKEND, see rag/embeddings.py)
+    from rag.embeddings import load_embedder
+
+    return load_embedder(EMBED_BACKEND).encode(texts, show_progress_bar=True)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
     RAG_DIR.mkdir(parents=True, exist_ok=True)
 
+    requested = {k: v for k, v in vars(args).items() if k in DEFAULTS}
+    build = {k: requested[k] for k in BUILD_KEYS}
+
     sources = [line.strip() for line in SOURCES_FILE.read_text().splitlines() if line.strip()]
-    docs = []
+    manifest = load_manifest()
+    reason = "--full" if args.full else full_rebuild_reason(manifest, build)
+    if reason:
+        print(f"Full rebuild ({reason})")
+        manifest = None
+
+    old_sources = manifest["sources"] if manifest else {}
+    next_id = manifest["next_id"] if manifest else 0
+    store = ChunkStore(CHUNKS_BIN) if manifest else None
+
+    docs = []       # every chunk of the new corpus, with its vector id
+    to_embed = []   # chunks that need a new vector
+    removed = []    # vector ids no longer in the corpus
+    new_sources = {}
+    counts = defaultdict(int)
 
     for rel in sources:
         p = (ROOT / rel).resolve()
         if not p.exists():
             print(f"[WARN] Missing: {rel}")
             continue
-        text = read_file(p)
-        for i, ch in enumerate(chunk_text(text)):
-            docs.append({
-                "id": f"{rel}::chunk{i}",
-                "source": rel,
-                "text": ch
-            })
+        file_hash = sha256(p.read_bytes())
+        old = old_sources.get(rel)
+
+        if old and old["sha256"] == file_hash:
+            # Unchanged: texts come from the current chunk store, vectors stay in the index
+            for chunk_id, h, vid in old["chunks"]:
+                docs.append({"id": chunk_id, "source": rel, "text": store.get(vid)["text"], "hash": h, "vid": vid})
+            new_sources[rel] = old
+            counts["unchanged"] += 1
+            continue
+
+        # New or changed: re-chunk, keep the vector of every chunk whose text is unchanged
+        reusable = defaultdict(list)
+        for chunk_id, h, vid in (old["chunks"] if old else []):
+            reusable[h].append(vid)
+
+        entries = []
+        for i, ch in enumerate(chunk_text(read_file(p))):
+            h = sha256(ch.encode("utf-8"))
+            d = {"id": f"{rel}::chunk{i}", "source": rel, "text": ch, "hash": h}
+            if reusable[h]:
+                d["vid"] = reusable[h].pop()
+                counts["reused"] += 1
+            else:
+                d["vid"] = next_id
+                next_id += 1
+                to_embed.append(d)
+            docs.append(d)
+            entries.append([d["id"], h, d["vid"]])
+
+        removed += [vid for vids in reusable.values() for vid in vids]
+        new_sources[rel] = {"sha256": file_hash, "chunks": entries}
+        counts["changed" if old else "added"] += 1
+
+    for rel, old in old_sources.items():
+        if rel not in new_sources:
+            removed += [vid for _, _, vid in old["chunks"]]
+            counts["removed"] += 1
+
+    if store is not None:
+        store.close()
+
+    print(
+        f"Sources: {counts['unchanged']} unchanged, {counts['changed']} changed, "
+        f"{counts['added']} added, {counts['removed']} removed"
+    )
+    print(f"Chunks: {len(docs)} total, {len(to_embed)} to embed, {counts['reused']} reused, {len(removed)} removed")
+
+    if not docs:
+        # Nothing to build an index from (and IVF / PQ can't train on zero vectors)
+        print(f"❌ No chunks to index: none of the sources in {SOURCES_FILE.name} exist or have any text. "
+              "The existing index was left unchanged.")
+        return 1
+
+    version = index_version(docs)
+    if manifest is not None and not to_embed and not removed and version == manifest["index_version"]:
+        # Nothing to re-index; search settings may still have changed
+        params = json.loads(PARAMS_FILE.read_text(encoding="utf-8"))
+        params.update(nprobe=requested["nprobe"], ef_search=requested["ef_search"])
+        save_params(params, PARAMS_FILE)
+        print("Index is up to date")
+        return 0
+
+    # Embed only what is new
+    ids = [d["vid"] for d in to_embed]
+    vectors = embed([d["text"] for d in to_embed]) if to_embed else None
+
+    # FAISS index (type and search settings from rag/index_config.py)
+    if manifest is None:
+        index, params = build_index(vectors, requested, ids=ids)
+    else:
+        index = faiss.read_index(str(INDEX_FILE))
+        params = json.loads(PARAMS_FILE.read_text(encoding="utf-8"))
+        params.update(nprobe=requested["nprobe"], ef_search=requested["ef_search"])
+        index = update_index(index, params, vectors, ids, removed)
+    params["version"] = version
 
-    print(f"Loaded chunks: {len(docs)}")
+    # Swap in: chunks first (hits on ids they no longer have are skipped by
+    # retrieve), then index and params, manifest last. chunks.bin goes after
+    # chunks.jsonl: rag_core only reads it when it isn't the older of the two.
+    tmp = RAG_DIR / "chunks.jsonl.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for d in sorted(docs, key=lambda d: d["vid"]):
+            f.write(json.dumps({k: d[k] for k in ("id", "source", "text", "vid")}, ensure_ascii=False) + "\n")
+    os.replace(tmp, RAG_DIR / "chunks.jsonl")
 
-    # Embed
-    emb_model = SentenceTransformer(MODEL_NAME)
-    vectors = emb_model.encode([d["text"] for d in docs], normalize_embeddings=True, show_progress_bar=True)
-    vectors = vectors.astype("float32")
+    write_chunk_store(docs, CHUNKS_BIN)
 
-    # FAISS index
-    dim = vectors.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(vectors)
+    faiss.write_index(index, str(INDEX_FILE) + ".tmp")
+    os.replace(str(INDEX_FILE) + ".tmp", INDEX_FILE)
+    save_params(params, PARAMS_FILE)
 
-    faiss.write_index(index, str(RAG_DIR / "index.faiss"))
+    write_json(MANIFEST_FILE, {
+        "model": MODEL_NAME,
+        "embed_backend": EMBED_BACKEND,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "build": build,
+        "next_id": next_id,
+        "index_version": version,
+        "sources": new_sources,
+    })
 
-    with open(RAG_DIR / "chunks.jsonl", "w", encoding="utf-8") as f:
-        for d in docs:
-            f.write(json.dumps(d, ensure_ascii=False) + "\n")
+    # Live documents (rag/live_index.py) stay in the overlay; drop their superseded versions
+    kept = compact_journal()
 
-    print("Saved: rag/index.faiss and rag/chunks.jsonl")
+    print(f"Index: {params['index_type']} ({params['ntotal']} vectors, version {version})")
+    print("Saved: rag/index.faiss, rag/index_params.json, rag/chunks.jsonl, rag/chunks.bin and rag/ingest_manifest.json")
+    if kept:
+        print(f"Live journal compacted to {kept} documents")
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
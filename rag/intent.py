@@ -1,13 +1,189 @@
+"""
+Intent detection for the chat box: add_vendor | add_product | qa | ambiguous.
+
+Local tiers run first and cost no network round trip:
+  1. keyword rules (add-verbs x vendor/product nouns, question forms)
+  2. nearest-centroid match of the prompt's MiniLM embedding against labelled examples,
+     only when rag_core already has the model loaded (it is never loaded just for this)
+The OpenAI classifier is called only when local confidence is below
+INTENT_LOCAL_THRESHOLD, and if that call fails the local guess is used.
+
+See rag/bench_intent.py for accuracy / latency on rag/intent_eval.jsonl.
+"""
 import os
-from openai import OpenAI
+import re
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+LOCAL_THRESHOLD = float(os.getenv("INTENT_LOCAL_THRESHOLD", "0.8"))
 
-def detect_intent(prompt: str) -> dict:
-    """
-    Returns:
-      { "intent": "add_vendor" | "add_product" | "qa" | "ambiguous", "confidence": 0..1, "reason": "..." }
-    """
+_client = None
+
+def get_client():
+    """OpenAI client, created on first use (not at import time)"""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _client
+
+# ---- Tier 1: keyword rules ----
+
+# "add up the revenue" is arithmetic, not an add
+_ADD = re.compile(r"\b(add(?!\s+up\b)|adding|insert|register|onboard|enter|sign up)\b", re.I)
+# "create" / "new" / "put" only mean adding when they lead the prompt ("create vendor record",
+# "can we create ...", "new merchant signup"); elsewhere they describe data ("revenue of new products")
+_ADD_LEADING = re.compile(
+    r"^\s*(please\s+|(can|could) (we|you|i)\s+|let'?s\s+)?(create|new|put)\b", re.I)
+# Add intents below this when analysis vocabulary is also present, so the centroid / LLM decide
+_MIXED_ADD_CONFIDENCE = 0.6
+_VENDOR = re.compile(r"\b(vendors?|sellers?|suppliers?|merchants?|v\d{2,})\b", re.I)
+_PRODUCT = re.compile(r"\b(products?|items?|skus?|listings?|p\d{3,})\b", re.I)
+# "last vendor added", "which products were added" ... are questions about data
+_ASKS_ABOUT_ADDED = re.compile(r"\b(last|latest|recent(ly)?|most recent|newest|which|what|how many|when)\b.*\b(added|inserted|registered|onboarded)\b", re.I)
+_QUESTION = re.compile(
+    r"^\s*(what|which|who|why|how|when|where|is|are|do|does|did|can|could|should|show|list|give|tell|compare|explain|summari[sz]e)\b|\?\s*$",
+    re.I,
+)
+# "can you add ...", "please insert ..." are requests, not questions
+_REQUEST = re.compile(r"^\s*(can|could|would|will)\s+(you|we|i)\b|\bplease\b|\b(i want|i'd like|i need)\b", re.I)
+_ANALYTICS = re.compile(
+    r"\b(revenue|conversion|rate|\w*perform\w*|top|best|worst|trend|average|avg|total|kpi|"
+    r"categor(y|ies)|region|recommend\w*|discount|promotion|returns?|views|orders|ad spend|fulfil\w*|report|summary)\b",
+    re.I,
+)
+# Words that ask for analysis. Unlike _ANALYTICS this leaves out the fields an add request
+# carries as values (region, views, orders, rating, discount, average fulfillment ...)
+_ANALYSIS = re.compile(
+    r"\b(\w*perform\w*|top|best|worst|trends?|totals?|sum|add up|kpis?|report|summary|"
+    r"recommend\w*|compare|comparison|rank\w*|breakdown|how (many|much)|"
+    r"(by|per) (vendor|product|category|region|tier|day|week|month))\b",
+    re.I,
+)
+
+def classify_rules(prompt: str):
+    """Keyword-rule intent, or None when the rules have nothing to say."""
+    text = prompt.strip()
+    if not text:
+        return {"intent": "qa", "confidence": 0.5, "reason": "empty prompt"}
+
+    if _ASKS_ABOUT_ADDED.search(text):
+        return {"intent": "qa", "confidence": 0.95, "reason": "asks about previously added data"}
+
+    is_question = bool(_QUESTION.search(text)) and not _REQUEST.search(text)
+    analysis = bool(_ANALYSIS.search(text))
+    strong_add = bool(_ADD.search(text))
+
+    # "Create a report of top vendors": a leading create/new is not an add next to analysis terms
+    if (strong_add or (_ADD_LEADING.search(text) and not analysis)) and not is_question:
+        guess = _add_guess(text)
+        if analysis:
+            guess = {**guess, "confidence": min(guess["confidence"], _MIXED_ADD_CONFIDENCE),
+                     "reason": guess["reason"] + ", but also analysis vocabulary"}
+        return guess
+
+    if is_question:
+        return {"intent": "qa", "confidence": 0.9, "reason": "question form"}
+    if analysis or _ANALYTICS.search(text):
+        return {"intent": "qa", "confidence": 0.85, "reason": "analytics vocabulary"}
+    return None
+
+def _add_guess(text: str) -> dict:
+    """Which entity an add-style prompt is about."""
+    vendor, product = bool(_VENDOR.search(text)), bool(_PRODUCT.search(text))
+    if product and not vendor:
+        return {"intent": "add_product", "confidence": 0.95, "reason": "add verb + product noun"}
+    if vendor and not product:
+        return {"intent": "add_vendor", "confidence": 0.95, "reason": "add verb + vendor noun"}
+    if product and vendor:
+        # "add a product for vendor V001": the product comes first and the vendor is its owner
+        if _PRODUCT.search(text).start() < _VENDOR.search(text).start():
+            return {"intent": "add_product", "confidence": 0.9, "reason": "add verb + product (of a vendor)"}
+        return {"intent": "add_product", "confidence": 0.6, "reason": "add verb + vendor and product nouns"}
+    return {"intent": "ambiguous", "confidence": 0.85, "reason": "add verb without vendor/product"}
+
+# ---- Tier 2: nearest centroid on the loaded sentence embeddings ----
+
+INTENT_EXAMPLES = {
+    "add_vendor": [
+        "add a new vendor",
+        "I want to register a seller",
+        "onboard supplier V120 from the GCC",
+        "create vendor record",
+        "please insert a vendor into the database",
+        "new merchant signup",
+    ],
+    "add_product": [
+        "add a new product",
+        "I want to list an item",
+        "insert product P01234",
+        "create a product entry for electronics",
+        "register a new SKU",
+        "add listing to the catalog",
+    ],
+    "qa": [
+        "why are some vendors underperforming",
+        "top categories by revenue",
+        "which vendors have the best conversion rate",
+        "summarize the management report",
+        "what discount do you recommend for low converting products",
+        "return rate by category",
+        "what was the last vendor added",
+    ],
+    "ambiguous": [
+        "I want to add something",
+        "add a new one",
+        "can you insert a record",
+        "new entry please",
+        "I'd like to add data",
+    ],
+}
+
+# Margin between the best and second-best centroid that counts as full confidence
+_CENTROID_FULL_MARGIN = 0.15
+_centroids = None
+
+def classify_centroid(prompt: str):
+    """Nearest labelled-centroid intent, or None if the embedding model isn't loaded."""
+    global _centroids
+    from rag import rag_core
+
+    if _centroids is None:
+        labels = list(INTENT_EXAMPLES)
+        vectors = rag_core.encode_if_loaded([t for lab in labels for t in INTENT_EXAMPLES[lab]])
+        if vectors is None:
+            return None
+        centroids, i = [], 0
+        for lab in labels:
+            n = len(INTENT_EXAMPLES[lab])
+            c = vectors[i:i + n].mean(axis=0)
+            centroids.append(c / ((c @ c) ** 0.5))
+            i += n
+        _centroids = (labels, centroids)
+
+    q = rag_core.encode_if_loaded([prompt])
+    if q is None:
+        return None
+    labels, centroids = _centroids
+    sims = sorted(((float(c @ q[0]), lab) for lab, c in zip(labels, centroids)), reverse=True)
+    (best, intent), (second, _) = sims[0], sims[1]
+    confidence = max(0.0, min(1.0, (best - second) / _CENTROID_FULL_MARGIN))
+    return {"intent": intent, "confidence": confidence, "reason": f"nearest centroid (sim {best:.2f}, margin {best - second:.2f})"}
+
+def classify_local(prompt: str) -> dict:
+    """Best local guess: rules, refined by the centroid tier when the rules aren't sure."""
+    rules = classify_rules(prompt)
+    if rules is not None and rules["confidence"] >= LOCAL_THRESHOLD:
+        return {**rules, "source": "rules"}
+
+    centroid = classify_centroid(prompt)
+    if centroid is not None and (rules is None or centroid["confidence"] > rules["confidence"]):
+        return {**centroid, "source": "centroid"}
+    if rules is not None:
+        return {**rules, "source": "rules"}
+    return {"intent": "qa", "confidence": 0.0, "reason": "no local signal", "source": "default"}
+
+# ---- Tier 3: LLM ----
+
+def detect_intent_llm(prompt: str) -> dict:
     system = """
 You are an intent classifier for a marketplace chatbot UI.
 Decide whether the user wants to:
@@ -24,7 +200,7 @@ Rules:
 
     user = f'Prompt: """{prompt}"""'
 
-    resp = client.chat.completions.create(
+    resp = get_client().chat.completions.create(
         model="gpt-4o-mini",
         temperature=0,
         messages=[
@@ -36,7 +212,23 @@ Rules:
     # Safe parse
     import json
     try:
-        return json.loads(resp.choices[0].message.content)
+        return {**json.loads(resp.choices[0].message.content), "source": "llm"}
     except Exception:
         # fallback if model ever returns weird output
-        return {"intent": "qa", "confidence": 0.0, "reason": "fallback_parse_failed"}
\ No newline at end of file
+        return {"intent": "qa", "confidence": 0.0, "reason": "fallback_parse_failed", "source": "llm"}
+
+def detect_intent(prompt: str, use_llm: bool = True) -> dict:
+    """
+    Returns:
+      { "intent": "add_vendor" | "add_product" | "qa" | "ambiguous", "confidence": 0..1,
+        "reason": "...", "source": "rules" | "centroid" | "llm" | "default" }
+    """
+    local = classify_local(prompt)
+    if local["confidence"] >= LOCAL_THRESHOLD or not use_llm:
+        return local
+
+    try:
+        return detect_intent_llm(prompt)
+    except Exception as e:
+        # Rate limit / network error: the local guess is better than failing the turn
+        return {**local, "reason": f"{local['reason']} (LLM unavailable: {type(e).__name__})"}
@@ -0,0 +1,178 @@
+"""
+Write-through indexing of vendors / products added from the chat forms.
+
+After add_vendor / add_product succeed, a compact text document for the entity is
+appended to rag/live_docs.jsonl and handed to a single background worker, which embeds
+it and adds it to rag_core's in-memory live overlay (searched together with the main
+index by retrieve()). The form returns immediately; the entity is searchable a moment
+later in the same process, without re-running ingest.py.
+
+The journal is replayed when rag_core initialises, so restarted processes (and other
+workers) see the same documents. Documents added while rag_core is still initialising
+are queued and added by init() once the overlay exists. With RAG_RETRIEVAL_URL set the
+document is forwarded to the retrieval service instead. Re-adding an entity replaces
+its previous document. Live documents use vector ids from LIVE_ID_BASE up, clear of
+the ids ingest assigns.
+
+ingest.py compacts the journal to the latest document per id after it rebuilds the
+main index, so it grows with the number of entities rather than the number of edits.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialised
+    fcntl = None
+
+RAG_DIR = Path(__file__).resolve().parent
+JOURNAL = RAG_DIR / "live_docs.jsonl"
+# flock()ed around every journal access, so other processes (Streamlit workers, the
+# retrieval service, ingest.py) never append while the journal is being compacted
+JOURNAL_LOCK = RAG_DIR / "live_docs.lock"
+
+LIVE_ID_BASE = 1 << 40
+
+_executor = None
+_journal_lock = threading.Lock()
+
+# Documents that arrived before rag_core's overlay existed; drained by init()
+_pending = []
+_pending_lock = threading.Lock()
+
+
+def vendor_document(vendor_id: str, vendor_tier: str, vendor_region: str, vendor_quality_score: float) -> dict:
+    text = (
+        f"VENDOR {vendor_id}\n"
+        f"Vendor {vendor_id} is a {vendor_tier} tier vendor in the {vendor_region} region "
+        f"with a vendor quality score of {vendor_quality_score}.\n"
+        f"Added to the marketplace on {datetime.now():%Y-%m-%d}."
+    )
+    return {"id": f"vendor:{vendor_id}", "source": "live:vendors", "text": text}
+
+
+def product_document(date: str, product_id: str, vendor_id: str, category: str, sub_category: str,
+                     price_usd: float, discount_rate: float, ad_spend_usd: float, views: int, orders: int,
+                     returns: int, rating: float, rating_count: int, stock_units: int,
+                     avg_fulfillment_days: float, conversion_rate: float, return_rate: float,
+                     net_revenue_usd: float) -> dict:
+    text = (
+        f"PRODUCT {product_id}\n"
+        f"Product {product_id} is sold by vendor {vendor_id} in category {category} > {sub_category}.\n"
+        f"On {date}: price ${price_usd:.2f}, discount {discount_rate:.0%}, ad spend ${ad_spend_usd:.2f}, "
+        f"{views} views, {orders} orders (conversion rate {conversion_rate:.2%}), "
+        f"{returns} returns (return rate {return_rate:.2%}), net revenue ${net_revenue_usd:.2f}.\n"
+        f"Rating {rating} from {rating_count} ratings, {stock_units} units in stock, "
+        f"average fulfillment {avg_fulfillment_days} days."
+    )
+    return {"id": f"product:{product_id}", "source": "live:products", "text": text}
+
+
+@contextmanager
+def _locked_journal():
+    """This process's journal lock plus an exclusive flock shared with other processes."""
+    with _journal_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(JOURNAL_LOCK, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def append_journal(doc: dict):
+    with _locked_journal():
+        with open(JOURNAL, "a", encoding="utf-8") as f:
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+
+def read_journal() -> list:
+    """Journaled documents, latest version per id, in insertion order."""
+    if not JOURNAL.exists():
+        return []
+    docs = {}
+    with _locked_journal():
+        with open(JOURNAL, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    doc = json.loads(line)
+                    docs.pop(doc["id"], None)
+                    docs[doc["id"]] = doc
+    return list(docs.values())
+
+
+def compact_journal() -> int:
+    """
+    Rewrite the journal with only the latest document per id (atomically); returns the
+    number of documents kept. Appends from any process wait until it is done.
+    """
+    if not JOURNAL.exists():
+        return 0
+    with _locked_journal():
+        docs = {}
+        with open(JOURNAL, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    doc = json.loads(line)
+                    docs.pop(doc["id"], None)
+                    docs[doc["id"]] = doc
+
+        tmp = JOURNAL.with_name(JOURNAL.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for doc in docs.values():
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        os.replace(tmp, JOURNAL)
+    return len(docs)
+
+
+def take_pending() -> list:
+    """Documents queued while rag_core wasn't ready, latest per id (emptying the queue)."""
+    global _pending
+    with _pending_lock:
+        docs, _pending = _pending, []
+    return list({d["id"]: d for d in docs}.values())
+
+
+def _index_document(doc: dict):
+    from rag import rag_core, retrieval_client
+
+    # Retrieval runs in rag/retrieval_server.py: update its overlay (it replays the
+    # journal on restart, so a missed update is picked up then)
+    if retrieval_client.enabled() and retrieval_client.add_live([doc]):
+        # The answer cache lives in this process: drop answers citing the old version
+        cache = rag_core.get_answer_cache()
+        if cache is not None:
+            cache.invalidate_chunks([doc["id"]])
+        return
+    docs = [doc]
+    if not rag_core.is_ready():
+        # init() may already have read the journal: queue it for init() to add
+        with _pending_lock:
+            _pending.append(doc)
+        # ... unless init() finished in the meantime, and then it's ours to add
+        if not rag_core.is_ready():
+            return
+        docs = take_pending()
+        if not docs:
+            return
+    try:
+        rag_core.add_live_documents(docs)
+    except Exception as e:
+        print(f"[WARN] Live index update failed for {', '.join(d['id'] for d in docs)}: {type(e).__name__}: {e}")
+
+
+def submit(doc: dict):
+    """Journal a document and index it on the background worker; returns the Future."""
+    global _executor
+    append_journal(doc)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-live-index")
+    return _executor.submit(_index_document, doc)
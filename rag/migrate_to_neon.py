@@ -1,125 +1,150 @@
 """
 Migration script to transfer data from CSV files to Neon PostgreSQL
+
+Each CSV is loaded set-based with rag.bulk_load.load_dataframe: one COPY into a staging
+table and one merge per table, in a single transaction, with the same conflict
+behaviour the per-row insert_* helpers had. Rows with an unknown vendor_id are reported
+as rejected instead of failing one by one.
+
+Usage:
+    python -m rag.migrate_to_neon              # migrate all three tables
+    python -m rag.migrate_to_neon --dry-run    # read + coerce the CSVs, report row counts
 """
+import argparse
+
 import pandas as pd
 from pathlib import Path
-from rag.db_config import (insert_vendor, insert_product_raw, insert_vendor_promotion, 
-                       insert_discount_recommendation, get_connection)
+from rag.bulk_load import load_dataframe
+from rag.db_pool import pooled_connection
 
 ROOT = Path(__file__).resolve().parents[1]
 
-def migrate_products_from_raw():
-    """Migrate products from products_from_raw.csv to Neon"""
-    products_csv = ROOT / "products_from_raw.csv"
-    
-    if not products_csv.exists():
-        print(f"❌ Products CSV not found: {products_csv}")
+VENDOR_FK = {"vendor_id": ("vendors", "vendor_id")}
+
+# table -> CSV, column types, conflict key and behaviour (as in the db_config insert_* helpers)
+MIGRATIONS = {
+    "products_raw": {
+        "csv": "products_from_raw.csv",
+        "label": "products",
+        "columns": {
+            "product_id": "VARCHAR(50)",
+            "vendor_id": "VARCHAR(50)",
+            "category": "VARCHAR(100)",
+            "sub_category": "VARCHAR(100)",
+            "price_usd": "FLOAT",
+            "rating": "FLOAT",
+            "rating_count": "INTEGER",
+            "avg_fulfillment_days": "FLOAT",
+        },
+        "key": ["product_id"],
+        "on_conflict": "skip",
+    },
+    "vendor_promotion_recommendations": {
+        "csv": "ai_vendor_promotion_recommendations.csv",
+        "label": "vendor promotion recommendations",
+        "columns": {
+            "vendor_id": "VARCHAR(50)",
+            "views": "INTEGER",
+            "orders": "INTEGER",
+            "net_rev": "FLOAT",
+            "conversion_rate": "FLOAT",
+            "vendor_tier": "VARCHAR(50)",
+            "vendor_region": "VARCHAR(100)",
+            "vendor_quality_score": "FLOAT",
+        },
+        "key": ["vendor_id"],
+        "on_conflict": "update",
+        "update_columns": ["views", "orders", "net_rev", "conversion_rate"],
+    },
+    "discount_recommendations": {
+        "csv": "ai_discount_recommendations.csv",
+        "label": "discount recommendations",
+        "columns": {
+            "product_id": "VARCHAR(50)",
+            "vendor_id": "VARCHAR(50)",
+            "category": "VARCHAR(100)",
+            "sub_category": "VARCHAR(100)",
+            "price_usd": "FLOAT",
+            "views": "INTEGER",
+            "orders": "INTEGER",
+            "p_order": "FLOAT",
+            "avg_discount": "FLOAT",
+            "stock": "INTEGER",
+            "avg_rating": "FLOAT",
+            "avg_fulfillment": "FLOAT",
+            "conversion_rate": "FLOAT",
+            "suggested_discount": "FLOAT",
+        },
+        "key": ["product_id"],
+        "on_conflict": "update",
+        "update_columns": ["suggested_discount", "avg_discount"],
+    },
+}
+
+
+def migrate_table(table: str, dry_run: bool = False) -> bool:
+    """Load one table's CSV in a single transaction (or only count rows with dry_run)"""
+    spec = MIGRATIONS[table]
+    csv_path = ROOT / spec["csv"]
+
+    if not csv_path.exists():
+        print(f"❌ {spec['label'].capitalize()} CSV not found: {csv_path}")
         return False
-    
+
     try:
-        df = pd.read_csv(products_csv)
-        count = 0
-        
-        for _, row in df.iterrows():
-            success = insert_product_raw(
-                product_id=row['product_id'],
-                vendor_id=row['vendor_id'],
-                category=row['category'],
-                sub_category=row['sub_category'],
-                price_usd=float(row['price_usd']),
-                rating=float(row['rating']),
-                rating_count=int(row['rating_count']),
-                avg_fulfillment_days=float(row['avg_fulfillment_days'])
-            )
-            if success:
-                count += 1
-        
-        print(f"✅ Migrated {count} products from products_from_raw.csv to Neon")
+        df = pd.read_csv(csv_path)
+        kwargs = dict(
+            table=table, columns=spec["columns"], key=spec["key"], on_conflict=spec["on_conflict"],
+            update_columns=spec.get("update_columns"), foreign_keys=VENDOR_FK,
+        )
+        if dry_run:
+            result = load_dataframe(None, df, dry_run=True, **kwargs)
+        else:
+            with pooled_connection() as conn:
+                result = load_dataframe(conn, df, **kwargs)
+
+        for r in result["rejects"][:10]:
+            print(f"   ⚠️  {spec['csv']} line {r['row'] + 2}: {r['reason']}")
+        if result["rejected"] > 10:
+            print(f"   ⚠️  ... {result['rejected'] - 10} more rejected rows")
+
+        if dry_run:
+            print(f"✅ {result['valid']} of {result['rows']} rows in {spec['csv']} ready to migrate (dry run)")
+        else:
+            count = result["inserted"] + result["updated"]
+            print(f"✅ Migrated {count} {spec['label']} from {spec['csv']} to Neon "
+                  f"({result['bytes'] / 2**20:.2f} MB in {result['seconds']:.2f}s)")
         return True
     except Exception as e:
-        print(f"❌ Error migrating products: {e}")
+        print(f"❌ Error migrating {spec['label']}: {e}")
         return False
 
-def migrate_vendor_promotions():
+def migrate_products_from_raw(dry_run: bool = False):
+    """Migrate products from products_from_raw.csv to Neon"""
+    return migrate_table("products_raw", dry_run)
+
+def migrate_vendor_promotions(dry_run: bool = False):
     """Migrate vendor promotion recommendations to Neon"""
-    promotions_csv = ROOT / "ai_vendor_promotion_recommendations.csv"
-    
-    if not promotions_csv.exists():
-        print(f"❌ Vendor promotions CSV not found: {promotions_csv}")
-        return False
-    
-    try:
-        df = pd.read_csv(promotions_csv)
-        count = 0
-        
-        for _, row in df.iterrows():
-            success = insert_vendor_promotion(
-                vendor_id=row['vendor_id'],
-                views=int(row['views']),
-                orders=int(row['orders']),
-                net_rev=float(row['net_rev']),
-                conversion_rate=float(row['conversion_rate']),
-                vendor_tier=row['vendor_tier'],
-                vendor_region=row['vendor_region'],
-                vendor_quality_score=float(row['vendor_quality_score'])
-            )
-            if success:
-                count += 1
-        
-        print(f"✅ Migrated {count} vendor promotion recommendations to Neon")
-        return True
-    except Exception as e:
-        print(f"❌ Error migrating vendor promotions: {e}")
-        return False
+    return migrate_table("vendor_promotion_recommendations", dry_run)
 
-def migrate_discount_recommendations():
+def migrate_discount_recommendations(dry_run: bool = False):
     """Migrate discount recommendations to Neon"""
-    discounts_csv = ROOT / "ai_discount_recommendations.csv"
-    
-    if not discounts_csv.exists():
-        print(f"❌ Discount recommendations CSV not found: {discounts_csv}")
-        return False
-    
-    try:
-        df = pd.read_csv(discounts_csv)
-        count = 0
-        
-        for _, row in df.iterrows():
-            success = insert_discount_recommendation(
-                product_id=row['product_id'],
-                vendor_id=row['vendor_id'],
-                category=row['category'],
-                sub_category=row['sub_category'],
-                price_usd=float(row['price_usd']),
-                views=int(row['views']),
-                orders=int(row['orders']),
-                p_order=float(row['p_order']),
-                avg_discount=float(row['avg_discount']),
-                stock=int(row['stock']),
-                avg_rating=float(row['avg_rating']),
-                avg_fulfillment=float(row['avg_fulfillment']),
-                conversion_rate=float(row['conversion_rate']),
-                suggested_discount=float(row['suggested_discount'])
-            )
-            if success:
-                count += 1
-        
-        print(f"✅ Migrated {count} discount recommendations to Neon")
-        return True
-    except Exception as e:
-        print(f"❌ Error migrating discount recommendations: {e}")
-        return False
+    return migrate_table("discount_recommendations", dry_run)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="read and coerce the CSVs without writing")
+    args = parser.parse_args()
+
     print("🔄 Starting data migration from CSV files to Neon...\n")
-    
+
     print("1. Migrating products_from_raw.csv...")
-    migrate_products_from_raw()
-    
+    migrate_products_from_raw(args.dry_run)
+
     print("\n2. Migrating ai_vendor_promotion_recommendations.csv...")
-    migrate_vendor_promotions()
-    
+    migrate_vendor_promotions(args.dry_run)
+
     print("\n3. Migrating ai_discount_recommendations.csv...")
-    migrate_discount_recommendations()
-    
+    migrate_discount_recommendations(args.dry_run)
+
     print("\n✅ Migration complete!")
@@ -0,0 +1,441 @@
+"""
+Parallel, resumable COPY of a large CSV into one of the daily fact tables.
+
+    python -m rag.parallel_copy marketplace_daily_clean synthetic_marketplace_daily_clean.csv --workers 4
+
+1. The CSV is split into newline-aligned byte ranges (--chunk-mb each). Each chunk is
+   read, parsed and coerced to the column types in a streaming generator, so only one
+   COPY buffer per worker is in memory. Rows that don't fit are counted and skipped.
+2. Chunks COPY in parallel over pooled connections into an UNLOGGED `<table>_load`
+   table with a chunk_no column. A chunk's rows are deleted before it is re-copied, so
+   reloading a chunk is idempotent.
+3. Progress is checkpointed to rag/<table>.load.json after every chunk. Re-running
+   the same command resumes with the chunks not yet done, as long as the CSV and the
+   chunk size are unchanged (--restart starts over). On resume the rows per chunk_no in
+   `<table>_load` are checked against the checkpoint: chunks that don't match are
+   reloaded, and a missing `<table>_load` restarts the plan.
+4. One transaction builds `<table>_load` into a copy of `<table>`. It drops chunk_no,
+   sets the table LOGGED and recreates constraints, indexes and triggers. It also
+   moves sequence ownership over, then swaps the tables by DROP + RENAME. Readers see
+   the old table until that commit, never a half-loaded one. For
+   marketplace_daily_clean the summary tables are rebuilt in the same transaction, and
+   the table's sync_state watermark is reset to its newest date (rag/incremental_sync.py).
+
+A duplicate key or an unknown vendor_id in the CSV makes the swap fail (and roll back);
+the loaded chunks stay in `<table>_load`, so a re-run only retries the swap.
+Quoted fields must not contain newlines (true for the generated marketplace CSVs).
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from rag.bulk_load import coerce_value, column_kind
+from rag.db_config import MARKETPLACE_CLEAN_COLUMNS, rebuild_summaries, save_sync_state
+from rag.db_pool import POOL_MAX, pooled_connection
+
+RAG_DIR = Path(__file__).resolve().parent
+
+_RAW_COLUMNS = list(MARKETPLACE_CLEAN_COLUMNS)[:16]  # the raw table lacks the derived rates/revenue
+
+# table -> column types (CSV header names), integer columns where NULL means 0, post-swap hook
+TABLES = {
+    "marketplace_daily_clean": {
+        "columns": MARKETPLACE_CLEAN_COLUMNS,
+        "zero_fill": [],
+        "after_swap": rebuild_summaries,
+    },
+    "marketplace_daily_raw": {
+        "columns": {c: MARKETPLACE_CLEAN_COLUMNS[c] for c in _RAW_COLUMNS},
+        "zero_fill": ["views", "orders", "returns", "rating_count", "stock_units"],
+        "after_swap": None,
+    },
+}
+
+COPY_BATCH_ROWS = 2000  # rows formatted per read() of the COPY stream
+COPY_READ_BYTES = 1 << 20
+MAX_REASONS = 5         # rejected-row reasons kept per chunk in the manifest
+
+
+def manifest_path(table: str) -> Path:
+    return RAG_DIR / f"{table}.load.json"
+
+
+def plan_chunks(csv_path: Path, chunk_bytes: int) -> list:
+    """Newline-aligned [start, end) byte ranges covering the file after the header line."""
+    size = csv_path.stat().st_size
+    with open(csv_path, "rb") as f:
+        f.readline()
+        bounds = [f.tell()]
+        while bounds[-1] < size:
+            f.seek(min(bounds[-1] + chunk_bytes, size))
+            if f.tell() < size:
+                f.readline()  # finish the line the cut landed in
+            bounds.append(min(f.tell(), size))
+    return [{"no": i, "start": s, "end": e, "state": "pending", "rows": 0, "rejected": 0, "reasons": []}
+            for i, (s, e) in enumerate(zip(bounds, bounds[1:]))]
+
+
+class Manifest:
+    """Per-table load checkpoint (JSON, rewritten atomically after each change)."""
+
+    def __init__(self, path: Path, data: dict):
+        self.path = path
+        self.data = data
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, table: str, csv_path: Path, chunk_bytes: int, restart: bool = False):
+        """The existing manifest if it matches this CSV and chunking, else a fresh plan."""
+        path = manifest_path(table)
+        stat = csv_path.stat()
+        source = {"csv": str(csv_path.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                  "chunk_bytes": chunk_bytes}
+        if path.exists() and not restart:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("source") == source:
+                return cls(path, data), True
+        data = {"table": table, "source": source,
+                "chunks": plan_chunks(csv_path, chunk_bytes)}
+        manifest = cls(path, data)
+        manifest.save()
+        return manifest, False
+
+    @property
+    def chunks(self) -> list:
+        return self.data["chunks"]
+
+    def save(self):
+        with self._lock:
+            tmp = self.path.with_suffix(".json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp, self.path)
+
+    def update(self, chunk: dict, **fields):
+        with self._lock:
+            chunk.update(fields)
+        self.save()
+
+    def reset(self, chunks: list, state: str = "pending"):
+        """Mark chunks as not loaded ("started" makes load_chunk delete their rows first)."""
+        with self._lock:
+            for chunk in chunks:
+                chunk.update(state=state, rows=0, rejected=0, reasons=[])
+        self.save()
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+
+
+def iter_chunk_rows(csv_path: Path, chunk: dict, spec: dict, stats: dict):
+    """
+    Coerced rows (chunk_no first) of one byte range, read line by line. Rows that don't
+    fit the column types are counted in stats and skipped.
+    """
+    columns = spec["columns"]
+    kinds = [column_kind(t) for t in columns.values()]
+    zero_fill = {i for i, c in enumerate(columns) if c in spec["zero_fill"]}
+
+    with open(csv_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        try:
+            positions = [header.index(c) for c in columns]
+        except ValueError as e:
+            raise ValueError(f"{csv_path.name}: missing column ({e})") from None
+
+        f.seek(chunk["start"])
+
+        def lines():
+            while f.tell() < chunk["end"]:
+                line = f.readline()
+                if not line:
+                    break
+                yield line.decode("utf-8")
+
+        for lineno, record in enumerate(csv.reader(lines())):
+            if not record:
+                continue
+            try:
+                row = [coerce_value(record[p], kind) for p, kind in zip(positions, kinds)]
+            except (ValueError, IndexError) as e:
+                e = _describe(record, positions, kinds, columns) or e
+                stats["rejected"] += 1
+                if len(stats["reasons"]) < MAX_REASONS:
+                    stats["reasons"].append(f"row {lineno} of chunk {chunk['no']}: {e}")
+                continue
+            for i in zero_fill:
+                if row[i] is None:
+                    row[i] = 0
+            yield [chunk["no"]] + row
+
+
+def _describe(record: list, positions: list, kinds: list, columns: dict) -> str:
+    """Which column of a rejected record failed, and why."""
+    if len(record) <= max(positions):
+        return f"expected at least {max(positions) + 1} fields, got {len(record)}"
+    for p, kind, name in zip(positions, kinds, columns):
+        try:
+            coerce_value(record[p], kind)
+        except ValueError as e:
+            return f"{name}: {e}"
+    return None
+
+
+class CsvStream:
+    """Read-only file object that formats rows as CSV on demand, for cursor.copy_expert()."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buf = io.StringIO()
+        self._done = False
+
+    def _fill(self):
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        for _ in range(COPY_BATCH_ROWS):
+            row = next(self._rows, None)
+            if row is None:
+                self._done = True
+                break
+            writer.writerow(["" if v is None else v for v in row])
+        buf.seek(0)
+        self._buf = buf
+
+    def read(self, size: int = -1) -> str:
+        parts = []
+        while True:
+            part = self._buf.read(size)
+            parts.append(part)
+            if size >= 0:
+                size -= len(part)
+            if size == 0 or self._done:
+                return "".join(parts)
+            self._fill()
+
+
+def _prepare_load_table(table: str, load_table: str, fresh: bool) -> bool:
+    """Create the load table (dropping it first when fresh); True if it already existed."""
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            if fresh:
+                cur.execute(f"DROP TABLE IF EXISTS {load_table}")
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (load_table,))
+            existed = cur.fetchone()[0]
+            # No indexes or foreign keys while loading; defaults (id sequence, created_at) apply
+            cur.execute(f"CREATE UNLOGGED TABLE IF NOT EXISTS {load_table} (LIKE {table} INCLUDING DEFAULTS)")
+            cur.execute(f"ALTER TABLE {load_table} ADD COLUMN IF NOT EXISTS chunk_no INTEGER")
+            conn.commit()
+        finally:
+            cur.close()
+    return existed
+
+
+def _stale_chunks(load_table: str, chunks: list) -> list:
+    """Chunks whose rows in the load table don't match the checkpoint (done or not)."""
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT chunk_no, COUNT(*) FROM {load_table} GROUP BY chunk_no")
+            loaded = dict(cur.fetchall())
+        finally:
+            cur.close()
+    # A done chunk must have exactly its checkpointed rows; a chunk not done none at all
+    return [c for c in chunks if loaded.get(c["no"], 0) != (c["rows"] if c["state"] == "done" else 0)]
+
+
+def load_chunk(csv_path: Path, load_table: str, spec: dict, chunk: dict, manifest: Manifest) -> dict:
+    """COPY one chunk (replacing any rows an earlier attempt committed) and checkpoint it."""
+    retry = chunk["state"] == "started"
+    manifest.update(chunk, state="started")
+    stats = {"rejected": 0, "reasons": []}
+    columns = ", ".join(spec["columns"])
+    t0 = time.perf_counter()
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            if retry:
+                cur.execute(f"DELETE FROM {load_table} WHERE chunk_no = %s", (chunk["no"],))
+            cur.copy_expert(
+                f"COPY {load_table} (chunk_no, {columns}) FROM STDIN WITH (FORMAT csv)",
+                CsvStream(iter_chunk_rows(csv_path, chunk, spec, stats)),
+                size=COPY_READ_BYTES,
+            )
+            rows = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    manifest.update(chunk, state="done", rows=rows, rejected=stats["rejected"], reasons=stats["reasons"],
+                    seconds=round(time.perf_counter() - t0, 3))
+    return chunk
+
+
+def _index_ddl(indexdef: str, name: str, load_table: str) -> str:
+    """CREATE INDEX statement for the load table, named <name>_load."""
+    m = re.match(r"CREATE (UNIQUE )?INDEX \S+ ON \S+ (.*)$", indexdef)
+    return f"CREATE {m.group(1) or ''}INDEX {name}_load ON {load_table} {m.group(2)}"
+
+
+def swap_in(table: str, load_table: str, after_swap=None):
+    """Give the load table the original's constraints, indexes, triggers and sequences, then swap."""
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"ALTER TABLE {load_table} DROP COLUMN IF EXISTS chunk_no")
+            cur.execute(f"ALTER TABLE {load_table} SET LOGGED")
+
+            # Indexes that don't back a constraint, then the constraints themselves
+            cur.execute("""
+                SELECT i.relname, pg_get_indexdef(i.oid)
+                FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+                WHERE x.indrelid = %s::regclass
+                  AND NOT EXISTS (SELECT 1 FROM pg_constraint c
+                                  WHERE c.conindid = x.indexrelid AND c.conrelid = x.indrelid)
+            """, (table,))
+            indexes = cur.fetchall()
+            cur.execute("""
+                SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+                WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f', 'c')
+                ORDER BY contype DESC, conname
+            """, (table,))
+            constraints = cur.fetchall()
+            cur.execute("""
+                SELECT pg_get_triggerdef(oid) FROM pg_trigger
+                WHERE tgrelid = %s::regclass AND NOT tgisinternal
+            """, (table,))
+            triggers = [row[0] for row in cur.fetchall()]
+            cur.execute("""
+                SELECT a.attname, pg_get_serial_sequence(%s, a.attname) FROM pg_attribute a
+                WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+            """, (table, table))
+            sequences = [(col, seq) for col, seq in cur.fetchall() if seq]
+
+            for name, definition in constraints:
+                cur.execute(f"ALTER TABLE {load_table} ADD CONSTRAINT {name}_load {definition}")
+            for name, indexdef in indexes:
+                cur.execute(_index_ddl(indexdef, name, load_table))
+            for definition in triggers:
+                cur.execute(re.sub(r" ON \S+ ", f" ON {load_table} ", definition, count=1))
+            # Otherwise dropping the old table would drop the id sequence with it
+            for col, seq in sequences:
+                cur.execute(f"ALTER SEQUENCE {seq} OWNED BY {load_table}.{col}")
+
+            cur.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+            cur.execute(f"DROP TABLE {table}")
+            cur.execute(f"ALTER TABLE {load_table} RENAME TO {table}")
+            for name, _ in constraints:
+                cur.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {name}_load TO {name}")
+            for name, _ in indexes:
+                cur.execute(f"ALTER INDEX {name}_load RENAME TO {name}")
+
+            if after_swap is not None:
+                after_swap(cur)
+            # The next incremental sync continues from here (rescanning the CSV once for its offset)
+            cur.execute(f"SELECT MAX(date), COUNT(*) FROM {table}")
+            watermark, rows = cur.fetchone()
+            save_sync_state(cur, table, watermark, rows_synced=rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+def load_csv(table: str, csv_path, workers: int = 4, chunk_mb: float = 32, restart: bool = False) -> bool:
+    """Load csv_path into table (parallel chunks, resumable, atomic swap); True on success."""
+    if table not in TABLES:
+        raise ValueError(f"table must be one of {list(TABLES)}, got {table!r}")
+    spec = TABLES[table]
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        print(f"❌ CSV not found: {csv_path}")
+        return False
+
+    load_table = f"{table}_load"
+    workers = max(1, min(workers, POOL_MAX))
+    manifest, resumed = Manifest.open(table, csv_path, int(chunk_mb * 2**20), restart)
+    chunks = manifest.chunks
+
+    t0 = time.perf_counter()
+    try:
+        existed = _prepare_load_table(table, load_table, fresh=not resumed)
+        if resumed and not existed:
+            print(f"⚠️  {load_table} no longer exists; restarting the load from the first chunk")
+            manifest.reset(chunks)
+        elif resumed:
+            stale = _stale_chunks(load_table, chunks)
+            if stale:
+                print(f"⚠️  {len(stale)} chunk(s) in {load_table} don't match the checkpoint; reloading them")
+                manifest.reset(stale, state="started")
+
+        todo = [c for c in chunks if c["state"] != "done"]
+        if resumed:
+            print(f"🔄 Resuming {table}: {len(chunks) - len(todo)}/{len(chunks)} chunks already loaded")
+        else:
+            print(f"🔄 Loading {csv_path.name} into {table}: {len(chunks)} chunks, {workers} workers")
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parallel-copy") as pool:
+            futures = [pool.submit(load_chunk, csv_path, load_table, spec, c, manifest) for c in todo]
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    chunk = future.result()
+                    print(f"   chunk {chunk['no']}: {chunk['rows']} rows, {chunk['rejected']} rejected "
+                          f"({chunk['seconds']:.1f}s) [{done}/{len(todo)}]")
+            except BaseException:
+                # Chunks already running finish and checkpoint; queued ones are left for the resume
+                for future in futures:
+                    future.cancel()
+                raise
+    except Exception as e:
+        print(f"❌ Load interrupted: {type(e).__name__}: {e}")
+        print("   Re-run the same command to resume from the last checkpoint.")
+        return False
+
+    rows = sum(c["rows"] for c in chunks)
+    rejected = sum(c["rejected"] for c in chunks)
+    for c in chunks:
+        for reason in c["reasons"]:
+            print(f"   ⚠️  {reason}")
+    mb = csv_path.stat().st_size / 2**20
+    seconds = time.perf_counter() - t0
+    print(f"   Copied {rows} rows ({rejected} rejected), {mb:.0f} MB in {seconds:.1f}s "
+          f"({mb / seconds if seconds else 0:.1f} MB/s)")
+
+    try:
+        t1 = time.perf_counter()
+        swap_in(table, load_table, spec["after_swap"])
+    except Exception as e:
+        print(f"❌ Swap failed, {table} is unchanged: {type(e).__name__}: {e}")
+        print(f"   Loaded rows are kept in {load_table}; fix the cause and re-run to retry the swap.")
+        return False
+    manifest.remove()
+    print(f"✅ Swapped in {rows} rows into {table} ({time.perf_counter() - t1:.1f}s for indexes and swap)")
+    return True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", choices=list(TABLES))
+    parser.add_argument("csv", type=Path)
+    parser.add_argument("--workers", type=int, default=4, help=f"parallel COPY connections (≤ DB_POOL_MAX={POOL_MAX})")
+    parser.add_argument("--chunk-mb", type=float, default=32)
+    parser.add_argument("--restart", action="store_true", help="ignore a previous checkpoint and reload everything")
+    args = parser.parse_args(argv)
+    return 0 if load_csv(args.table, args.csv, args.workers, args.chunk_mb, args.restart) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
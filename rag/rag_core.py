@@ -1,10 +1,14 @@
 import os, json
+import threading
+import time
+from collections import deque
 from pathlib import Path
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
-from openai import RateLimitError
+
+from rag.resources import ResourceManager
+
+# faiss, the embedding backend (torch or onnxruntime) and openai are imported lazily in init()/answer()
+# so importing this module stays cheap.
 
 ROOT = Path(__file__).resolve().parents[1]
 RAG_DIR = ROOT / "rag"
@@ -13,56 +17,230 @@ MODEL_NAME = "all-MiniLM-L6-v2"
 TOP_K = 5
 
 def load_chunks():
-    chunks = []
-    with open(RAG_DIR / "chunks.jsonl", "r", encoding="utf-8") as f:
-        for line in f:
-            chunks.append(json.loads(line))
+    """
+    Chunks keyed by vector id: the memory-mapped chunk store when available and not
+    older than chunks.jsonl, otherwise a {vid: chunk} dict from chunks.jsonl. Both
+    support .get(vid).
+    """
+    bin_path, jsonl_path = RAG_DIR / "chunks.bin", RAG_DIR / "chunks.jsonl"
+    if bin_path.exists():
+        if not jsonl_path.exists() or bin_path.stat().st_mtime_ns >= jsonl_path.stat().st_mtime_ns:
+            from rag.chunk_store import ChunkStore
+            return ChunkStore(bin_path)
+        print("[WARN] rag/chunks.bin is older than rag/chunks.jsonl, reading chunks.jsonl instead "
+              "(rebuild it with `python -m rag.chunk_store`)")
+
+    chunks = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            c = json.loads(line)
+            chunks[c.pop("vid", i)] = c
     return chunks
 
+def _load_index():
+    import faiss
+    from rag.index_config import apply_search_params, load_params
+
+    index = faiss.read_index(str(RAG_DIR / "index.faiss"))
+    # nprobe / efSearch as persisted by ingest (env overrides allowed)
+    apply_search_params(index, load_params())
+    return index
+
+def _load_embedder():
+    # torch / onnx / onnx-int8, per RAG_EMBED_BACKEND (rag/embeddings.py)
+    from rag.embeddings import load_embedder
+    return load_embedder()
+
+def _chunks_bytes(chunks) -> int:
+    if hasattr(chunks, "path"):
+        return chunks.path.stat().st_size  # memory-mapped, shared via the page cache
+    return sum(len(c["text"]) + len(c["id"]) + len(c["source"]) for c in chunks.values())
+
+# Loaded once per process (rag/resources.py); preload() fills these in the background
+_resources = ResourceManager()
+_resources.register("embedder", _load_embedder, size=lambda emb: emb.nbytes())
+_resources.register("index", _load_index, size=lambda index: (RAG_DIR / "index.faiss").stat().st_size)
+_resources.register("chunks", load_chunks, size=_chunks_bytes)
+
 _chunks = None
 _index = None
 _emb = None
 
+# Documents added since the last ingest (rag/live_index.py): a small flat overlay
+# searched together with the main index, and their chunks keyed by vector id
+_live = None
+_live_chunks = {}
+_live_vids = {}     # document id -> vector id
+_next_live_vid = None
+
+# Semantic answer cache (rag/answer_cache.py), created on first use
+_answer_cache = None
+
+# Guards the overlay (FAISS indexes aren't safe to search while being added to)
+_lock = threading.RLock()
+
+def is_ready() -> bool:
+    return _live is not None
+
 def init():
-    global _chunks, _index, _emb
-    if _chunks is None:
-        _chunks = load_chunks()
-    if _index is None:
-        _index = faiss.read_index(str(RAG_DIR / "index.faiss"))
-    if _emb is None:
-        _emb = SentenceTransformer(MODEL_NAME)
-
-def retrieve(query: str, k=TOP_K):
+    global _chunks, _index, _emb, _live
+    if _live is not None:
+        return
+    import faiss
+
+    _emb = _resources.get("embedder")
+    _index = _resources.get("index")
+    _chunks = _resources.get("chunks")
+    with _lock:
+        if _live is None:
+            from rag.live_index import read_journal, take_pending
+            overlay = faiss.IndexIDMap2(faiss.IndexFlatIP(_index.d))
+            docs = read_journal()
+            if docs:
+                _add_live(overlay, docs, _encode([d["text"] for d in docs]))
+            # Ready first, then drain: a document queued after this point is added by
+            # its own worker (see live_index._index_document), so none is missed
+            _live = overlay
+            docs = take_pending()
+            if docs:
+                _add_live(overlay, docs, _encode([d["text"] for d in docs]))
+
+def preload():
+    """
+    Start loading the model, index and chunks on a background thread (once per process).
+    Skipped when retrieval is served by rag/retrieval_server.py.
+    """
+    from rag import retrieval_client
+
+    if retrieval_client.RETRIEVAL_URL:
+        return None
+    return _resources.preload(then=init)
+
+def resource_status() -> dict:
+    """Readiness and memory of the loaded resources (see ResourceManager.status)."""
+    status = _resources.status()
+    status["ready"] = status["ready"] and is_ready()
+    return status
+
+def index_version() -> str:
+    """Version of the main index as written by ingest.py (file mtime for older indexes)."""
+    from rag.index_config import load_params
+    return load_params().get("version") or f"mtime-{(RAG_DIR / 'index.faiss').stat().st_mtime_ns}"
+
+def get_answer_cache():
+    """The process-wide answer cache, or None when disabled (RAG_ANSWER_CACHE=0)."""
+    global _answer_cache
+    from rag.answer_cache import ENABLED, AnswerCache
+
+    if not ENABLED:
+        return None
+    with _lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache(index_version())
+        return _answer_cache
+
+def answer_cache_stats():
+    """Hit/miss stats of the answer cache, or None if it isn't in use yet."""
+    return _answer_cache.stats() if _answer_cache is not None else None
+
+def _encode(texts: list) -> np.ndarray:
+    return _emb.encode(texts)
+
+def encode_if_loaded(texts: list):
+    """Normalized embeddings if the model is already loaded, None otherwise (never loads it)."""
+    emb = _resources.peek("embedder")
+    if emb is None:
+        return None
+    return emb.encode(texts)
+
+def _add_live(overlay, docs: list, vectors: np.ndarray):
+    """Add (or replace, by document id) documents in the live overlay. Caller holds _lock."""
+    global _next_live_vid
+    from rag.live_index import LIVE_ID_BASE
+
+    if _next_live_vid is None:
+        _next_live_vid = LIVE_ID_BASE
+    replaced = [_live_vids.pop(d["id"]) for d in docs if d["id"] in _live_vids]
+    if replaced:
+        overlay.remove_ids(np.array(replaced, dtype="int64"))
+        for vid in replaced:
+            _live_chunks.pop(vid, None)
+
+    vids = np.arange(_next_live_vid, _next_live_vid + len(docs), dtype="int64")
+    _next_live_vid += len(docs)
+    overlay.add_with_ids(vectors, vids)
+    for doc, vid in zip(docs, vids):
+        _live_vids[doc["id"]] = int(vid)
+        _live_chunks[int(vid)] = {"id": doc["id"], "source": doc["source"], "text": doc["text"]}
+
+def add_live_documents(docs: list):
+    """Embed documents and make them searchable by retrieve() right away."""
+    init()
+    vectors = _encode([d["text"] for d in docs])
+    with _lock:
+        _add_live(_live, docs, vectors)
+    if _answer_cache is not None:
+        # Replaced documents may have changed under answers that cite them
+        _answer_cache.invalidate_chunks([d["id"] for d in docs])
+
+def _search(q_vecs: np.ndarray, k: int) -> list:
+    """Top-k chunks (main index + live overlay) for each row of q_vecs."""
+    with _lock:
+        scores, idxs = _index.search(q_vecs, k)
+        live_scores = live_idxs = None
+        if _live.ntotal:
+            live_scores, live_idxs = _live.search(q_vecs, min(k, _live.ntotal))
+
+    out = []
+    for row in range(len(q_vecs)):
+        hits = list(zip(scores[row], idxs[row]))
+        if live_scores is not None:
+            hits += zip(live_scores[row], live_idxs[row])
+        hits.sort(key=lambda h: h[0], reverse=True)
+
+        results = []
+        for score, idx in hits:
+            if idx < 0:
+                continue
+            # Only the top-k hits are materialized (and decoded) as dicts
+            c = _live_chunks.get(int(idx)) or _chunks.get(int(idx))
+            if c is None:
+                # id removed by a concurrent re-ingest
+                continue
+            c = dict(c)
+            c["score"] = float(score)
+            results.append(c)
+            if len(results) == k:
+                break
+        out.append(results)
+    return out
+
+def retrieve(query: str, k=TOP_K, q_vec: np.ndarray = None):
     init()
-    q_vec = _emb.encode([query], normalize_embeddings=True).astype("float32")
-    scores, idxs = _index.search(q_vec, k)
+    if q_vec is None:
+        q_vec = _encode([query])
+    return _search(q_vec, k)[0]
 
-    results = []
-    for score, idx in zip(scores[0], idxs[0]):
-        if idx < 0:
-            continue
-        c = _chunks[int(idx)].copy()
-        c["score"] = float(score)
-        results.append(c)
-    return results
+def retrieve_batch(queries: list, k=TOP_K):
+    """One batched encode and one batched search for many queries; returns (results, q_vecs)."""
+    init()
+    q_vecs = _encode(list(queries))
+    return _search(q_vecs, k), q_vecs
 
 
-def answer(query: str):
-    # retrieval
-    contexts = retrieve(query)
+SYSTEM_PROMPT = (
+    "You are a marketplace analytics assistant. "
+    "Answer using ONLY the provided sources. "
+    "If the sources do not contain the answer, say you don't have enough info. "
+    "Always include citations like [1], [2] referencing the source chunks."
+)
 
+def _messages(query: str, contexts: list) -> list:
     # build prompt with citations
     context_text = "\n\n".join(
         [f"[{i+1}] Source: {c['source']}\n{c['text']}" for i, c in enumerate(contexts)]
     )
 
-    system = (
-        "You are a marketplace analytics assistant. "
-        "Answer using ONLY the provided sources. "
-        "If the sources do not contain the answer, say you don't have enough info. "
-        "Always include citations like [1], [2] referencing the source chunks."
-    )
-
     user = f"""
 Question: {query}
 
@@ -71,34 +249,148 @@ Sources:
 
 Write a concise, management-friendly answer with bullet points and citations.
 """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
+
+def _rate_limited_message(contexts: list) -> str:
+    # ✅ App should not crash — return a helpful message + sources
+    return (
+        "I’m currently rate-limited and can’t generate an OpenAI answer right now.\n\n"
+        "Here are the most relevant sources I found so you can still inspect them:\n"
+        + "\n".join([f"- [{i+1}] {c['source']} (score={c['score']:.3f})" for i, c in enumerate(contexts)])
+    )
+
+def _error_message(e: Exception, contexts: list) -> str:
+    return (
+        f"An error occurred while generating the answer: {type(e).__name__}.\n\n"
+        "Here are the most relevant sources I found:\n"
+        + "\n".join([f"- [{i+1}] {c['source']} (score={c['score']:.3f})" for i, c in enumerate(contexts)])
+    )
+
+def prepare(query: str):
+    """
+    Retrieval + answer-cache lookup shared by answer() and answer_stream().
+    Returns (contexts, cached_answer_or_None, store_fn); can run ahead of time on another
+    thread and be passed back in as prepared= (see rag/turn.py).
+    """
+    from rag import retrieval_client
+
+    # retrieval service (rag/retrieval_server.py) when configured, in-process otherwise
+    remote = retrieval_client.retrieve(query) if retrieval_client.enabled() else None
+    if remote is not None:
+        contexts, q_vec = remote
+    else:
+        init()
+        q_vec = _encode([query])
+        contexts = retrieve(query, q_vec=q_vec)
+
+    # semantic cache: a close paraphrase that retrieved the same chunks
+    cache = get_answer_cache()
+    chunk_ids = [c["id"] for c in contexts]
+    cached = cache.get(q_vec[0], chunk_ids) if cache is not None else None
+    store = (lambda out: cache.put(query, q_vec[0], chunk_ids, out)) if cache is not None else (lambda out: None)
+    return contexts, cached, store
+
+def answer(query: str, prepared=None):
+    contexts, cached, store = prepared or prepare(query)
+    if cached is not None:
+        return cached, contexts
 
     # LLM (OpenAI) with safe fallback
+    from openai import OpenAI, RateLimitError
     client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
     try:
         resp = client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
+            messages=_messages(query, contexts),
             temperature=0.2,
         )
-        return resp.choices[0].message.content, contexts
+        out = resp.choices[0].message.content
+        store(out)
+        return out, contexts
 
     except RateLimitError:
-        # ✅ App should not crash — return a helpful message + sources
-        fallback = (
-            "I’m currently rate-limited and can’t generate an OpenAI answer right now.\n\n"
-            "Here are the most relevant sources I found so you can still inspect them:\n"
-            + "\n".join([f"- [{i+1}] {c['source']} (score={c['score']:.3f})" for i, c in enumerate(contexts)])
-        )
-        return fallback, contexts
+        return _rate_limited_message(contexts), contexts
 
     except Exception as e:
-        fallback = (
-            f"An error occurred while generating the answer: {type(e).__name__}.\n\n"
-            "Here are the most relevant sources I found:\n"
-            + "\n".join([f"- [{i+1}] {c['source']} (score={c['score']:.3f})" for i, c in enumerate(contexts)])
-        )
-        return fallback, contexts
\ No newline at end of file
+        return _error_message(e, contexts), contexts
+
+# Time to first token (ms) from the start of the turn, newest last: answers streamed by
+# the model, and answer-cache hits (kept apart so they don't flatter the model numbers)
+_ttft_ms = deque(maxlen=200)
+_ttft_cached_ms = deque(maxlen=200)
+
+def answer_stream(query: str, prepared=None, t_start: float = None):
+    """
+    Streaming variant of answer(): returns (tokens, contexts), where tokens is a generator
+    of text pieces as the model produces them (suitable for st.write_stream). Retrieval
+    runs before this returns, so sources are known up front; the full answer is cached
+    once the stream completes. Failures are streamed as the same fallback messages.
+
+    Time to first token is measured from t_start (a time.perf_counter() value; pass the
+    turn's start when retrieval was prepared earlier), or from this call.
+    """
+    t0 = time.perf_counter() if t_start is None else t_start
+    contexts, cached, store = prepared or prepare(query)
+
+    def tokens():
+        if cached is not None:
+            _ttft_cached_ms.append((time.perf_counter() - t0) * 1000)
+            yield cached
+            return
+
+        from openai import OpenAI, RateLimitError
+        client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+        parts = []
+        try:
+            stream = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=_messages(query, contexts),
+                temperature=0.2,
+                stream=True,
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not parts:
+                    _ttft_ms.append((time.perf_counter() - t0) * 1000)
+                parts.append(delta)
+                yield delta
+
+        except RateLimitError:
+            yield ("\n\n" if parts else "") + _rate_limited_message(contexts)
+            return
+
+        except Exception as e:
+            yield ("\n\n" if parts else "") + _error_message(e, contexts)
+            return
+
+        if parts:
+            store("".join(parts))
+
+    return tokens(), contexts
+
+def _ttft_summary(samples) -> dict:
+    values = np.array(samples)
+    return {
+        "count": len(values),
+        "last_ms": float(values[-1]),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+    }
+
+def stream_stats():
+    """
+    Time-to-first-token of recent answers streamed by the model, or None before the first
+    one; "cached" summarises answer-cache hits the same way (None without any).
+    """
+    if not _ttft_ms:
+        return None
+    return {**_ttft_summary(_ttft_ms), "cached": _ttft_summary(_ttft_cached_ms) if _ttft_cached_ms else None}
@@ -0,0 +1,109 @@
+"""
+Process-wide registry of the heavy RAG resources (embedding model, FAISS index, chunks).
+
+Each resource is loaded at most once per process: concurrent callers of get() wait on
+that resource's lock instead of loading a second copy. preload() loads everything on a
+background thread at process start, so the first question doesn't pay model-load
+time, and status() reports readiness, load time and memory per resource for the UI.
+"""
+import os
+import threading
+import time
+
+NOT_LOADED, LOADING, READY, FAILED = "not_loaded", "loading", "ready", "failed"
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (None where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ResourceManager:
+    """Lock-protected, load-once resources with optional background preload."""
+
+    def __init__(self):
+        self._specs = {}
+        self._lock = threading.Lock()
+        self._preload_thread = None
+
+    def register(self, name: str, loader, size=None):
+        """loader() builds the resource; size(value) estimates its memory in bytes."""
+        self._specs[name] = {
+            "loader": loader,
+            "size": size,
+            "lock": threading.Lock(),
+            "value": None,
+            "state": NOT_LOADED,
+            "error": None,
+            "load_s": None,
+            "bytes": None,
+            "rss_delta_mb": None,
+        }
+
+    def get(self, name: str):
+        """The resource, loading it first if needed (exactly once across threads)."""
+        spec = self._specs[name]
+        if spec["state"] == READY:
+            return spec["value"]
+        with spec["lock"]:
+            if spec["state"] != READY:
+                spec["state"], spec["error"] = LOADING, None
+                rss0, t0 = current_rss_mb(), time.perf_counter()
+                try:
+                    value = spec["loader"]()
+                except Exception as e:
+                    spec["state"], spec["error"] = FAILED, f"{type(e).__name__}: {e}"
+                    raise
+                rss1 = current_rss_mb()
+                spec.update(
+                    value=value,
+                    load_s=time.perf_counter() - t0,
+                    bytes=spec["size"](value) if spec["size"] else None,
+                    rss_delta_mb=(rss1 - rss0) if rss0 is not None and rss1 is not None else None,
+                    state=READY,
+                )
+        return spec["value"]
+
+    def peek(self, name: str):
+        """The resource if it is already loaded, else None (never loads)."""
+        spec = self._specs[name]
+        return spec["value"] if spec["state"] == READY else None
+
+    def ready(self) -> bool:
+        return all(spec["state"] == READY for spec in self._specs.values())
+
+    def preload(self, then=None):
+        """Load every registered resource on a daemon thread (once); then() runs afterwards."""
+        with self._lock:
+            if self._preload_thread is not None:
+                return self._preload_thread
+
+            def run():
+                try:
+                    for name in self._specs:
+                        self.get(name)
+                    if then is not None:
+                        then()
+                except Exception as e:
+                    print(f"[WARN] RAG preload failed: {type(e).__name__}: {e}")
+
+            self._preload_thread = threading.Thread(target=run, name="rag-preload", daemon=True)
+            self._preload_thread.start()
+            return self._preload_thread
+
+    def status(self) -> dict:
+        resources = {
+            name: {
+                "state": spec["state"],
+                "load_s": spec["load_s"],
+                "mb": spec["bytes"] / 2**20 if spec["bytes"] is not None else None,
+                "rss_delta_mb": spec["rss_delta_mb"],
+                "error": spec["error"],
+            }
+            for name, spec in self._specs.items()
+        }
+        return {"ready": self.ready(), "rss_mb": current_rss_mb(), "resources": resources}
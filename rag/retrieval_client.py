@@ -0,0 +1,79 @@
+"""
+Thin client for rag/retrieval_server.py.
+
+Enabled by RAG_RETRIEVAL_URL (e.g. http://127.0.0.1:8601). When the service can't be
+reached the caller falls back to in-process retrieval, and the service is not retried
+for RAG_RETRIEVAL_RETRY_S seconds so a dead server doesn't add a timeout to every turn.
+"""
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+RETRIEVAL_URL = os.getenv("RAG_RETRIEVAL_URL", "").rstrip("/")
+TIMEOUT_S = float(os.getenv("RAG_RETRIEVAL_CLIENT_TIMEOUT", "10"))
+HEALTH_TIMEOUT_S = 2.0
+RETRY_S = float(os.getenv("RAG_RETRIEVAL_RETRY_S", "30"))
+
+_down_until = 0.0
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(RETRIEVAL_URL) and time.monotonic() >= _down_until
+
+
+def _mark_down(reason: str):
+    global _down_until
+    with _lock:
+        _down_until = time.monotonic() + RETRY_S
+    print(f"[WARN] Retrieval service unavailable ({reason}); using in-process retrieval for {RETRY_S:.0f}s")
+
+
+def _post(path: str, body: dict) -> dict:
+    req = urllib.request.Request(
+        RETRIEVAL_URL + path,
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(req, timeout=TIMEOUT_S) as resp:
+        return json.loads(resp.read())
+
+
+def retrieve(query: str, k: int = None):
+    """(contexts, q_vec[1, dim]) from the service, or None if it isn't available."""
+    body = {"query": query}
+    if k is not None:
+        body["k"] = k
+    try:
+        out = _post("/retrieve", body)
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        _mark_down(f"{type(e).__name__}: {e}")
+        return None
+    return out["contexts"], np.asarray([out["vector"]], dtype="float32")
+
+
+def add_live(docs: list) -> bool:
+    """Forward live documents to the service's overlay; False if it isn't reachable."""
+    try:
+        _post("/live", {"docs": docs})
+        return True
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        _mark_down(f"{type(e).__name__}: {e}")
+        return False
+
+
+def health():
+    """The service's /health (readiness + batching stats), or None if it isn't reachable."""
+    if not enabled():
+        return None
+    try:
+        with urllib.request.urlopen(RETRIEVAL_URL + "/health", timeout=HEALTH_TIMEOUT_S) as resp:
+            return json.loads(resp.read())
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        _mark_down(f"{type(e).__name__}: {e}")
+        return None
@@ -0,0 +1,144 @@
+"""
+Standalone retrieval service: one copy of the embedding model and FAISS index shared by
+every Streamlit worker, with dynamic micro-batching.
+
+Requests that arrive within RAG_BATCH_WAIT_MS of each other (up to RAG_BATCH_MAX) are
+coalesced into one batched encode and one batched index.search via
+rag_core.retrieve_batch(), which is far cheaper per query than encoding one at a time.
+
+Endpoints (JSON over HTTP, localhost):
+    POST /retrieve   {"query": "...", "k": 5}  -> {"contexts": [...], "vector": [...]}
+    POST /live       {"docs": [...]}           -> add live documents (rag/live_index.py)
+    GET  /health                               -> readiness + batching stats
+
+Usage:
+    python -m rag.retrieval_server --port 8601
+    RAG_RETRIEVAL_URL=http://127.0.0.1:8601 streamlit run app.py
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag import rag_core
+
+BATCH_WAIT_MS = float(os.getenv("RAG_BATCH_WAIT_MS", "5"))
+BATCH_MAX = int(os.getenv("RAG_BATCH_MAX", "64"))
+
+
+class MicroBatcher:
+    """Collects concurrent queries and answers them with one retrieve_batch() call."""
+
+    def __init__(self, wait_ms: float = BATCH_WAIT_MS, max_batch: int = BATCH_MAX):
+        self.wait_ms = wait_ms
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self.max_seen = 0
+        threading.Thread(target=self._run, name="retrieval-batcher", daemon=True).start()
+
+    def submit(self, query: str, k: int) -> Future:
+        fut = Future()
+        self._queue.put((query, k, fut))
+        return fut
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.wait_ms / 1000
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            k = max(item[1] for item in batch)
+            try:
+                results, q_vecs = rag_core.retrieve_batch([item[0] for item in batch], k=k)
+            except Exception as e:
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, item_k, fut), contexts, vec in zip(batch, results, q_vecs):
+                fut.set_result((contexts[:item_k], vec))
+            with self._stats_lock:
+                self.batches += 1
+                self.queries += len(batch)
+                self.max_seen = max(self.max_seen, len(batch))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "mean_batch": (self.queries / self.batches) if self.batches else 0.0,
+                "max_batch": self.max_seen,
+                "queued": self._queue.qsize(),
+            }
+
+
+class Handler(BaseHTTPRequestHandler):
+    batcher = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._json(404, {"error": f"unknown path {self.path}"})
+        self._json(200, {"ready": rag_core.is_ready(), **self.batcher.stats()})
+
+    def do_POST(self):
+        try:
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            return self._json(400, {"error": "invalid JSON"})
+
+        try:
+            if self.path == "/retrieve":
+                contexts, vec = self.batcher.submit(req["query"], int(req.get("k", rag_core.TOP_K))).result()
+                return self._json(200, {"contexts": contexts, "vector": [float(x) for x in vec]})
+            if self.path == "/live":
+                rag_core.add_live_documents(req["docs"])
+                return self._json(200, {"added": len(req["docs"])})
+        except KeyError as e:
+            return self._json(400, {"error": f"missing field {e}"})
+        except Exception as e:
+            return self._json(500, {"error": f"{type(e).__name__}: {e}"})
+        self._json(404, {"error": f"unknown path {self.path}"})
+
+
+def serve(host: str = "127.0.0.1", port: int = 8601) -> ThreadingHTTPServer:
+    rag_core.init()
+    Handler.batcher = MicroBatcher()
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"✅ Retrieval server on http://{host}:{server.server_port} (batch wait {BATCH_WAIT_MS} ms, max {BATCH_MAX})")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8601)
+    args = parser.parse_args()
+    serve(args.host, args.port).serve_forever()
@@ -0,0 +1,83 @@
+"""
+Per-turn orchestration for the chat box: intent detection and retrieval run concurrently.
+
+Most prompts are questions, so retrieval (query embedding, FAISS search, answer-cache
+lookup) starts speculatively on a worker thread while the intent is being classified
+instead of after it. If the intent turns out to be add_vendor / add_product / ambiguous
+the speculative result is discarded. When the local intent tiers are already confident
+there is no LLM call and nothing to overlap; retrieval is skipped entirely for forms.
+
+Both waits are bounded: an intent call slower than RAG_INTENT_TIMEOUT falls back to the
+local guess, and retrieval slower than RAG_RETRIEVAL_TIMEOUT answers with a notice.
+Timed-out work can't be interrupted mid-call; its result is simply dropped.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from rag import rag_core
+from rag.intent import LOCAL_THRESHOLD, classify_local, detect_intent
+
+INTENT_TIMEOUT = float(os.getenv("RAG_INTENT_TIMEOUT", "8"))
+RETRIEVAL_TIMEOUT = float(os.getenv("RAG_RETRIEVAL_TIMEOUT", "30"))
+
+# Shared by all sessions of the process; each turn uses at most two workers
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_TURN_WORKERS", "8")), thread_name_prefix="rag-turn")
+
+
+class ChatTurn:
+    """One chat prompt: intent and (speculative) retrieval in flight together."""
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.t0 = time.perf_counter()  # time to first token counts from here
+        self.local = classify_local(prompt)
+        self._intent = None
+        self._intent_future = None
+        self._retrieval = None
+
+        if self.local["confidence"] >= LOCAL_THRESHOLD:
+            self._intent = self.local
+        else:
+            self._intent_future = _executor.submit(detect_intent, prompt)
+
+        # Speculate unless the local tier already knows this is a form request
+        if self._intent is None or self._intent["intent"] == "qa":
+            self._retrieval = _executor.submit(rag_core.prepare, prompt)
+
+    def intent(self, timeout: float = INTENT_TIMEOUT) -> dict:
+        """Intent result (see rag.intent.detect_intent); discards retrieval if not qa."""
+        if self._intent is None:
+            try:
+                self._intent = self._intent_future.result(timeout=timeout)
+            except TimeoutError:
+                self._intent_future.cancel()
+                self._intent = {**self.local, "reason": f"{self.local['reason']} (intent timed out after {timeout:.0f}s)"}
+            except Exception as e:
+                self._intent = {**self.local, "reason": f"{self.local['reason']} (intent failed: {type(e).__name__})"}
+
+        if self._intent.get("intent", "qa") != "qa":
+            self.discard()
+        return self._intent
+
+    def discard(self):
+        """Drop the speculative retrieval (cancelled if it hasn't started yet)."""
+        if self._retrieval is not None:
+            self._retrieval.cancel()
+            self._retrieval = None
+
+    def answer_stream(self, timeout: float = RETRIEVAL_TIMEOUT):
+        """(tokens, contexts) like rag_core.answer_stream, reusing the speculative retrieval."""
+        if self._retrieval is None:
+            return rag_core.answer_stream(self.prompt, t_start=self.t0)
+        try:
+            prepared = self._retrieval.result(timeout=timeout)
+        except TimeoutError:
+            self.discard()
+            notice = f"Retrieval took longer than {timeout:.0f}s, so no answer was generated. Please try again."
+            return iter([notice]), []
+        return rag_core.answer_stream(self.prompt, prepared=prepared, t_start=self.t0)
+
+
+def start_turn(prompt: str) -> ChatTurn:
+    return ChatTurn(prompt)
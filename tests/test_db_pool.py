@@ -0,0 +1,109 @@
+"""
+rag/db_pool.py against a real Postgres. Skips without psycopg2 or DATABASE_URL, e.g.:
+
+    DATABASE_URL=postgresql://postgres@localhost/postgres DB_SSLMODE=disable python -m pytest tests/test_db_pool.py
+"""
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("psycopg2")
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from rag import db_config  # noqa: E402
+from rag.db_pool import ConnectionPool, PooledConnection, PoolTimeout  # noqa: E402
+
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool(db_config.connect_new, minconn=2, maxconn=3, timeout=5)
+    yield pool
+    pool.closeall()
+
+
+def test_prefill_opens_minconn(pool):
+    pool.prefill()
+    stats = pool.stats()
+    assert stats["size"] == stats["idle"] == 2
+    assert stats["created"] == 2
+
+
+def test_connections_are_reused(pool):
+    for _ in range(5):
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                assert cur.fetchone() == (1,)
+    stats = pool.stats()
+    assert stats["created"] == 1
+    assert stats["checkouts"] == 5
+    assert stats["in_use"] == 0
+
+
+def test_open_transaction_is_rolled_back_on_return(pool):
+    import psycopg2.extensions
+
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        assert conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    assert conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+def test_closed_connection_is_discarded(pool):
+    conn = pool.getconn()
+    conn.close()
+    pool.putconn(conn)
+    assert pool.stats()["size"] == 0
+    with pool.connection() as conn:
+        assert not conn.closed
+
+
+def test_timeout_when_exhausted(pool):
+    held = [pool.getconn() for _ in range(pool.maxconn)]
+    with pytest.raises(PoolTimeout):
+        pool.getconn(timeout=0.2)
+    for conn in held:
+        pool.putconn(conn)
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_gets_returned_connection(pool):
+    held = [pool.getconn() for _ in range(pool.maxconn)]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn(timeout=5)))
+    waiter.start()
+    pool.putconn(held.pop())
+    waiter.join(5)
+    assert got and pool.stats()["created"] == pool.maxconn
+    for conn in held + got:
+        pool.putconn(conn)
+
+
+def test_proxy_close_returns_to_pool(pool):
+    proxy = PooledConnection(pool, pool.getconn())
+    with proxy.cursor() as cur:
+        cur.execute("SELECT 1")
+    proxy.close()
+    assert pool.stats()["in_use"] == 0
+    proxy.close()  # a second close is a no-op
+    assert pool.stats()["in_use"] == 0
+
+
+def test_get_connection_uses_process_pool():
+    from rag.db_pool import get_pool
+
+    before = get_pool().stats()
+    for _ in range(3):
+        conn = db_config.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+        finally:
+            conn.close()
+    after = get_pool().stats()
+    assert after["in_use"] == before["in_use"]
+    assert after["created"] - before["created"] <= 1
@@ -0,0 +1,48 @@
+"""
+The ONNX backends must embed like the torch backend they replace (rag/embeddings.py).
+
+Skipped unless torch / sentence-transformers, onnxruntime / tokenizers and the exported
+model files (python -m rag.embeddings export) are all available.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+for module in ("torch", "sentence_transformers", "onnxruntime", "tokenizers"):
+    pytest.importorskip(module)
+
+from rag.bench_embeddings import corpus_texts, query_texts, topk_agreement  # noqa: E402
+from rag.embeddings import ONNX_DIR, load_embedder  # noqa: E402
+
+MIN_COSINE = 0.98   # per text, as rag/bench_embeddings.py --min-cosine
+MIN_TOPK = 0.9      # top-5 retrieval agreement, as --min-topk
+MODEL_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+
+
+@pytest.fixture(scope="module")
+def texts():
+    corpus, queries = corpus_texts(), query_texts()
+    if not corpus:
+        pytest.skip("no chunks to embed (run python -m rag.ingest)")
+    return corpus, queries
+
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    emb = load_embedder("torch")
+    return emb.encode(texts[0]), emb.encode(texts[1])
+
+
+@pytest.mark.parametrize("backend", list(MODEL_FILES))
+def test_backend_matches_torch(backend, texts, reference):
+    if not (ONNX_DIR / MODEL_FILES[backend]).exists() or not (ONNX_DIR / "tokenizer.json").exists():
+        pytest.skip(f"{backend} model not exported (python -m rag.embeddings export)")
+    emb = load_embedder(backend)
+    corpus, queries = emb.encode(texts[0]), emb.encode(texts[1])
+    ref_corpus, ref_queries = reference
+
+    assert corpus.shape == ref_corpus.shape and corpus.dtype == np.float32
+    assert np.allclose(np.linalg.norm(corpus, axis=1), 1.0, atol=1e-3)
+    cos = np.concatenate([np.sum(ref_corpus * corpus, axis=1), np.sum(ref_queries * queries, axis=1)])
+    assert cos.min() >= MIN_COSINE, f"{backend}: min cosine {cos.min():.4f} vs torch"
+    agree = topk_agreement(ref_corpus, ref_queries, corpus, queries, 5)
+    assert agree >= MIN_TOPK, f"{backend}: top-5 agreement {agree:.2f} vs torch"
@@ -0,0 +1,76 @@
+"""
+rag_core.answer_stream against rag/fake_openai_server.py (started on a free port).
+
+Retrieval is skipped by passing a fixed context as prepared=, so neither the index nor
+the embedding model is needed; the openai client is.
+"""
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("openai")
+
+from rag import rag_core  # noqa: E402
+from rag.check_streaming import CONTEXTS, QUERY, stream  # noqa: E402
+from rag.fake_openai_server import Handler, serve, tokenize  # noqa: E402
+
+FIRST_TOKEN_MS = 200
+TOKEN_MS = 10
+SLACK_MS = 1500
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    server = serve(0, FIRST_TOKEN_MS, TOKEN_MS)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    import openai  # noqa: F401  (imported before timing, so it isn't counted as TTFT)
+    yield server
+    Handler.rate_limit = False
+    server.shutdown()
+    server.server_close()
+
+
+def test_answer_is_streamed_in_chunks_with_measured_ttft(fake_openai):
+    stored = []
+    chunks, at = stream(QUERY, (CONTEXTS, None, stored.append))
+    answer = "".join(chunks)
+
+    assert len(chunks) > 1
+    assert len(chunks) == len(tokenize(answer))
+    # chunks arrive spread over the server's per-token delays, not in one burst
+    assert (at[-1] - at[0]) * 1000 >= 0.5 * TOKEN_MS * (len(chunks) - 1)
+
+    ttft_ms = at[0] * 1000
+    assert FIRST_TOKEN_MS <= ttft_ms <= FIRST_TOKEN_MS + SLACK_MS
+    stats = rag_core.stream_stats()
+    assert stats is not None and stats["last_ms"] >= FIRST_TOKEN_MS
+    assert abs(stats["last_ms"] - ttft_ms) <= max(50.0, 0.1 * ttft_ms)
+    assert stored == [answer]
+
+
+def test_cache_hit_is_kept_out_of_model_ttft(fake_openai):
+    stream(QUERY, (CONTEXTS, None, lambda out: None))
+    model_samples = rag_core.stream_stats()["count"]
+    cached_before = len(rag_core._ttft_cached_ms)
+
+    chunks, _ = stream(QUERY, (CONTEXTS, "cached answer", lambda out: None))
+
+    assert chunks == ["cached answer"]
+    stats = rag_core.stream_stats()
+    assert stats["count"] == model_samples
+    assert len(rag_core._ttft_cached_ms) == cached_before + 1
+    assert stats["cached"] is not None
+
+
+def test_rate_limit_streams_the_fallback(fake_openai):
+    Handler.rate_limit = True
+    stored = []
+    chunks, _ = stream(QUERY, (CONTEXTS, None, stored.append))
+
+    text = "".join(chunks)
+    assert "rate-limited" in text
+    assert CONTEXTS[0]["source"] in text
+    assert stored == []  # fallbacks are never cached